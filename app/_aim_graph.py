@@ -39,7 +39,7 @@ class AimGraph(QtGui.QWidget):
 
         self.setWindowTitle('Aim visualization')
         self.setSizePolicy(QtGui.QSizePolicy.Policy.Maximum, QtGui.QSizePolicy.Policy.Maximum)
-        self.setMaximumSize(QtCore.QSize(AimGraph.SIZE + DEV_GRAPH_HEIGHT, AimGraph.SIZE + DEV_GRAPH_HEIGHT))
+        self.setMaximumSize(QtCore.QSize(int(AimGraph.SIZE + DEV_GRAPH_HEIGHT), int(AimGraph.SIZE + DEV_GRAPH_HEIGHT)))
 
         self.main_layout = QtGui.QGridLayout(self)
         self.main_layout.setContentsMargins(0, 0, 0, 0)
@@ -47,7 +47,7 @@ class AimGraph(QtGui.QWidget):
         
         self.win_hits = pyqtgraph.PlotWidget(show=False, title='Hit visualization')
         self.win_hits.setWindowTitle('osu! Aim Tool Hit Visualization')
-        self.win_hits.setFixedSize(AimGraph.SIZE, AimGraph.SIZE)
+        self.win_hits.setFixedSize(int(AimGraph.SIZE), int(AimGraph.SIZE))
 
         # Scatter plot for aim data
         self.plot_hits = self.win_hits.plot(title='Hit scatter')
@@ -70,7 +70,7 @@ class AimGraph(QtGui.QWidget):
         self.dev_x.enableAutoRange(axis='y', enable=True)
         self.dev_x.hideAxis('left')
         self.dev_x.showAxis('bottom')
-        self.dev_x.setFixedHeight(64 + 4*AimGraph.SCALE)
+        self.dev_x.setFixedHeight(int(64 + 4*AimGraph.SCALE))
         self.dev_x.setXRange(-AimGraph.SIZE/2, AimGraph.SIZE/2)
 
         # Y-axis deviation histogram
@@ -81,7 +81,7 @@ class AimGraph(QtGui.QWidget):
         self.dev_y.hideAxis('bottom')
         self.dev_y.hideAxis('left')
         self.dev_y.showAxis('right')
-        self.dev_y.setFixedWidth(64 + 4*AimGraph.SCALE)
+        self.dev_y.setFixedWidth(int(64 + 4*AimGraph.SCALE))
         self.dev_y.setYRange(-AimGraph.SIZE/2, AimGraph.SIZE/2 + TITLE_PADDING)
 
         # Cov area metrics
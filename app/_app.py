@@ -0,0 +1,302 @@
+import io
+import os
+import sys
+import math
+import importlib
+import time
+import contextlib
+import numpy as np
+
+from pyqtgraph.Qt import QtGui
+from pyqtgraph.Qt import QtCore
+from pyqtgraph.Qt import QtWidgets
+
+from ._player_simulator import PlayerSimulator
+from ._data_cor import DataOsu, DataDev
+from ._data_proc import DataProc
+from ._lazy_tab import LazyTab
+from .misc._osu_utils import OsuUtils
+
+np.set_printoptions(suppress=True)
+
+
+def lazy_widget(module, name):
+    # Widget modules are only imported when their tab is first opened
+    def factory():
+        return getattr(importlib.import_module(module, __package__), name)()
+
+    return factory
+
+
+
+class App(QtGui.QMainWindow):
+
+    # Emitted with the angle once a simulation of `__run_one_simulation` is shown
+    angle_shown = QtCore.Signal(int)
+
+    # Pattern angles (deg) that get a pattern and aim graph tab by default
+    ANGLES = [ 30, 180 ]
+
+    # Notes in each angle's pattern as (RECORD_HITS, other modes). The 30 deg stream is
+    # long when only hits are recorded and the 180 deg jumps when whole replays are
+    N_POINTS = {
+        30  : (1000, 200),
+        180 : (200, 1000),
+    }
+    N_POINTS_DEFAULT = (1000, 200)
+
+    # Simulations of each angle run concurrently on `n_workers` processes; by default
+    # one per cpu
+    def __init__(self, startup_simulation=True, angles=None, n_workers=None):
+        QtGui.QMainWindow.__init__(self)
+
+        self.angles    = list(App.ANGLES if angles is None else angles)
+        self.n_workers = os.cpu_count() if n_workers is None else n_workers
+
+        # Worker processes of `__run_one_simulation`, started on first use
+        self.__angle_pool = None
+
+        self.__init_gui()
+        self.__run(startup_simulation)
+
+
+    def __init_gui(self):
+        self.main_widget = QtGui.QTabWidget()
+
+        # Pattern visual and aim graph of each angle
+        self.map_visuals = { angle : LazyTab(lazy_widget('._pattern_visual', 'PatternVisual')) for angle in self.angles }
+        self.aim_graphs  = { angle : LazyTab(lazy_widget('._aim_graph', 'AimGraph')) for angle in self.angles }
+
+        self.dev_graph = LazyTab(lazy_widget('._data_graph', 'DataGraph'))
+        self.skill_graph = LazyTab(lazy_widget('._graph_skill', 'GraphSkill'))
+        
+        for angle in self.angles:
+            self.main_widget.addTab(self.map_visuals[angle], f'{angle} deg')
+
+        for angle in self.angles:
+            self.main_widget.addTab(self.aim_graphs[angle], f'Aim graph {angle} deg')
+
+        self.main_widget.addTab(self.dev_graph, 'Deviation scatter')
+        self.main_widget.addTab(self.skill_graph, 'Skill graph')
+
+        self.main_widget.currentChanged.connect(self.__tab_changed_event)
+        self.setCentralWidget(self.main_widget)
+
+
+    def __run(self, startup_simulation):
+        self.show()
+
+        if not startup_simulation:
+            return
+
+        # Let the window paint before doing any simulation work
+        #QtCore.QTimer.singleShot(0, lambda: self.__run_one_simulation(mode=PlayerSimulator.RECORD_HITS))
+        QtCore.QTimer.singleShot(0, lambda: self.__run_one_simulation(mode=PlayerSimulator.RECORD_REPLAY))
+        #QtCore.QTimer.singleShot(0, self.__run_full_simulation)
+
+
+    def closeEvent(self, event):
+        # Simulations not yet started are dropped; running ones finish in the background
+        if self.__angle_pool is not None:
+            self.__angle_pool.shutdown(wait=False, cancel_futures=True)
+            self.__angle_pool = None
+
+        QtGui.QMainWindow.closeEvent(self, event)
+
+
+    def showEvent(self, event):
+        QtGui.QMainWindow.showEvent(self, event)
+        self.__tab_changed_event(self.main_widget.currentIndex())
+
+
+    def __tab_changed_event(self, idx):
+        tab = self.main_widget.widget(idx)
+        if isinstance(tab, LazyTab):
+            tab.widget()
+
+
+    # Simulates the pattern of every angle. With more than one worker the simulations
+    # run concurrently and each angle's tabs are filled in as its result arrives
+    def __run_one_simulation(self, mode=PlayerSimulator.RECORD_HITS):
+        # Map wide data
+        bpm = 400
+        dx  = 100  # distance
+        cs  = 6
+        ar  = 8
+
+        # Player wide data
+        hit_dev       = 10    # Hit deviation (in ms @ 95% confidence interval))
+        avg_read_time = 1     # Human update interval mean (in ms)
+        dev_read_time = 0     # Human update interval deviation (in ms)
+        vel_dev       = 0     # Velocity deviation (in osu!px / ms)
+        
+        # Player to simulate
+        player_data = {
+            'cs'             : cs,
+            'hit_dev'        : hit_dev,
+            'avg_read_time'  : avg_read_time,
+            'dev_read_time'  : dev_read_time,
+            'player_vel_dev' : vel_dev,
+        }
+
+        for angle in self.angles:
+            self.map_visuals[angle].set_ar(ar)
+            self.map_visuals[angle].set_cs(cs)
+            self.aim_graphs[angle].set_cs(cs)
+
+        mode_idx = 0 if (mode == PlayerSimulator.RECORD_HITS) else 1
+        args = [ (player_data, bpm, dx, angle, App.N_POINTS.get(angle, App.N_POINTS_DEFAULT)[mode_idx], mode) for angle in self.angles ]
+
+        if self.n_workers <= 1 or len(self.angles) <= 1:
+            for arg in args:
+                # PlayerSimulator prints its parameters on construction
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = _simulate_angle(*arg)
+
+                self.__show_angle_result(result)
+                QtWidgets.QApplication.processEvents()
+
+            return
+
+        # Not imported at module level, so starting the app doesn't pay for it
+        from concurrent.futures import ProcessPoolExecutor
+
+        if self.__angle_pool is None:
+            self.__angle_pool = ProcessPoolExecutor(min(self.n_workers, len(self.angles)), initializer=_init_angle_worker)
+
+        futures = { self.__angle_pool.submit(_simulate_angle, *arg) : arg[3] for arg in args }
+        self.__poll_angle_results(futures)
+
+
+    # Shows the results that arrived and checks back for the rest without blocking the GUI
+    # `futures` maps each simulation's future to its angle
+    def __poll_angle_results(self, futures):
+        pending = {}
+
+        for future, angle in futures.items():
+            if not future.done():
+                pending[future] = angle
+                continue
+
+            # A failed angle is reported and leaves its tabs empty; the others still show
+            try:
+                result = future.result()
+            except Exception as e:
+                self.statusBar().showMessage(f'Simulation of {angle} deg failed: {e!r}')
+                continue
+
+            self.__show_angle_result(result)
+
+        if len(pending) > 0:
+            QtCore.QTimer.singleShot(10, lambda: self.__poll_angle_results(pending))
+
+
+    def __show_angle_result(self, result):
+        angle = result['angle']
+
+        self.map_visuals[angle].set_map(result['map_data'])
+        self.map_visuals[angle].set_replay(result['replay_data'])
+        self.aim_graphs[angle].plot_data(result['aim_x_offsets'], result['aim_y_offsets'])
+
+        self.angle_shown.emit(angle)
+
+
+    # Progress telemetry is appended to `telemetry_path` as JSON lines, if given
+    # Results are saved to the `ResultStore` at `store_path`, if given
+    def __run_full_simulation(self, n_workers=1, telemetry_path=None, show_status=True, store_path=None):
+        # Sweep pulls in the hit judge and shared memory pool, and ResultStore sqlite3;
+        # none of which are needed to start the app
+        from ._sweep import Sweep
+        from ._sweep_telemetry import SweepTelemetry
+        from .misc._result_store import ResultStore
+
+        # Map wide data
+        cs  = 6
+        ar  = 8
+
+        # Player wide data
+        '''
+        hit_dev       = 18   # Hit deviation (in ms @ 95% confidence interval))
+        avg_read_time = 140   # Human update interval mean (in ms)
+        dev_read_time = 10    # Human update interval deviation (in ms)
+        vel_dev       = 10    # Velocity deviation (in osu!px / ms)
+        '''
+
+        hit_dev       = 10    # Hit deviation (in ms @ 95% confidence interval))
+        avg_read_time = 1    # Human update interval mean (in ms)
+        dev_read_time = 0    # Human update interval deviation (in ms)
+        vel_dev       = 0    # Velocity deviation (in osu!px / ms)
+        
+        # Player to simulate
+        player_data = {
+            'cs'             : cs,
+            'hit_dev'        : hit_dev,
+            'avg_read_time'  : avg_read_time,
+            'dev_read_time'  : dev_read_time,
+            'player_vel_dev' : vel_dev,
+        }
+
+        for angle in self.angles:
+            self.map_visuals[angle].set_ar(ar)
+            self.map_visuals[angle].set_cs(cs)
+
+        note_bpms = list(range(60, 600, 10))
+        note_dists = list(range(40, 500, 10))
+        note_angles = [ 0, 10, 30, 90, 180]
+
+        sweep = Sweep(player_data, note_bpms, note_dists, note_angles)
+        telemetry = SweepTelemetry(len(sweep.points), path=telemetry_path)
+
+        for i in sweep.run(n_workers, telemetry):
+            dev_data = sweep.dev_data[sweep.done]
+
+            self.dev_graph.plot_data(dev_data, model=True)
+            self.skill_graph.plot_data(dev_data, error_bars=False)
+
+            if show_status:
+                self.statusBar().showMessage(telemetry.status_text())
+
+            QtWidgets.QApplication.processEvents()
+
+        telemetry.close()
+
+        self.dev_graph.plot_data(sweep.dev_data[sweep.done], model=True, softplus=True)
+        self.skill_graph.plot_data(sweep.dev_data[sweep.done])
+
+        if store_path is not None:
+            with ResultStore(store_path) as store:
+                store.insert(sweep.dev_data[sweep.done], player_data, seed=sweep.seeds[sweep.done])
+
+
+def _init_angle_worker():
+    # Forked workers start with the same random state; reseed so each angle gets its own noise
+    np.random.seed()
+
+    # PlayerSimulator prints its parameters on construction, which would end up on the
+    # app's stdout
+    sys.stdout = open(os.devnull, 'w')
+
+
+def _simulate_angle(player_data, bpm, dx, angle, n_points, mode):
+    # Generate stream pattern
+    map_data = OsuUtils.generate_pattern(
+        initial_angle = 0,
+        distance      = dx,
+        time          = 60/bpm, 
+        angle         = angle * math.pi/180, 
+        n_points      = n_points,
+        n_repeats     = 1
+    )
+
+    replay_data = PlayerSimulator(player_data).run_simulation(map_data, mode=mode)
+
+    hit_select = (replay_data[:, DataOsu.IDX_K] > PlayerSimulator.KEY_NONE)
+    aim_x_offsets, aim_y_offsets = DataProc.process_data(map_data, replay_data[hit_select])
+
+    return {
+        'angle'         : angle,
+        'map_data'      : map_data,
+        'replay_data'   : replay_data,
+        'aim_x_offsets' : aim_x_offsets,
+        'aim_y_offsets' : aim_y_offsets,
+    }
@@ -0,0 +1,114 @@
+import numpy as np
+
+from app._data_cor import DataOsu
+
+
+class CursorQuery():
+    """
+    Cursor position and velocity at arbitrary times, from replays in `DataOsu` layout.
+
+    The cursor is taken to move in a straight line between consecutive frames, so
+    its position at a time is interpolated between the frames around it and its
+    velocity is the slope of that segment (osu!px per unit of replay time). Frames
+    are found with `np.searchsorted`, so k queries into a replay of n frames cost
+    O(k log n) however dense the replay is. Frames have to be in time order.
+
+    Times before a replay's first frame or after its last give nan.
+    """
+
+    @staticmethod
+    def at(replay_data, times):
+        """
+        Returns (positions, velocities), each (n_times, 2), of the cursor of one
+        replay at `times`.
+        """
+        times = np.asarray(times, dtype=float)
+
+        # Need at least one segment to interpolate on
+        if len(replay_data) < 2:
+            return np.full(times.shape + (2,), np.nan), np.full(times.shape + (2,), np.nan)
+
+        frame_t = replay_data[:, DataOsu.IDX_T]
+
+        # Left frame of the segment each time falls in. Times past either end are
+        # clipped onto the first or last segment here, and set to nan below
+        left = np.clip(np.searchsorted(frame_t, times, side='right') - 1, 0, len(replay_data) - 2)
+
+        in_range = (times >= frame_t[0]) & (times <= frame_t[-1])
+
+        return CursorQuery.__interpolate(replay_data[left], replay_data[left + 1], times, in_range)
+
+
+    @staticmethod
+    def at_notes(map_data, replay_data):
+        """
+        `at` the time of each note of `map_data`.
+        """
+        return CursorQuery.at(replay_data, map_data[:, DataOsu.IDX_T])
+
+
+    @staticmethod
+    def at_batch(replays, times):
+        """
+        `at` for each of `replays`, a list of replay arrays or an `ArrayStore` of them.
+        `times` is (n_times,), asked of every replay, or (n_replays, n_times). Returns
+        (positions, velocities), each (n_replays, n_times, 2).
+
+        Each replay is searched on its own frames, so the cost stays O(k log n) per
+        replay. Only the frames around the queried times are read, which for an
+        `ArrayStore` means only the pages they are on. The interpolation of all
+        replays is done together.
+        """
+        n_replays = len(replays)
+        n_times   = np.shape(times)[-1]
+        times = np.broadcast_to(np.asarray(times, dtype=float), (n_replays, n_times))
+
+        # Frames on either side of each time, and whether the time is within its replay
+        frames_0 = np.zeros((n_replays, n_times, 3))
+        frames_1 = np.zeros((n_replays, n_times, 3))
+        in_range = np.zeros((n_replays, n_times), dtype=bool)
+
+        cols = [ DataOsu.IDX_T, DataOsu.IDX_X, DataOsu.IDX_Y ]
+
+        for i in range(n_replays):
+            replay_data = replays[i]
+
+            # Need at least one segment to interpolate on
+            if len(replay_data) < 2:
+                continue
+
+            frame_t = replay_data[:, DataOsu.IDX_T]
+            left = np.clip(np.searchsorted(frame_t, times[i], side='right') - 1, 0, len(replay_data) - 2)
+
+            frames_0[i] = replay_data[left][:, cols]
+            frames_1[i] = replay_data[left + 1][:, cols]
+            in_range[i] = (times[i] >= frame_t[0]) & (times[i] <= frame_t[-1])
+
+        return CursorQuery.__interpolate(frames_0, frames_1, times, in_range, cols=(0, 1, 2))
+
+
+    @staticmethod
+    def __interpolate(frames_0, frames_1, times, in_range, cols=(DataOsu.IDX_T, DataOsu.IDX_X, DataOsu.IDX_Y)):
+        # Position and velocity at `times` on the segments from frames `frames_0` to `frames_1`,
+        # nan where not `in_range`. `cols` are the t, x and y columns of the frames
+        idx_t, idx_x, idx_y = cols
+
+        positions  = np.full(times.shape + (2,), np.nan)
+        velocities = np.full(times.shape + (2,), np.nan)
+
+        t0 = np.asarray(frames_0[..., idx_t], dtype=float)
+        t1 = np.asarray(frames_1[..., idx_t], dtype=float)
+        dt = t1 - t0
+
+        xy0 = np.stack([ frames_0[..., idx_x], frames_0[..., idx_y] ], axis=-1).astype(float)
+        xy1 = np.stack([ frames_1[..., idx_x], frames_1[..., idx_y] ], axis=-1).astype(float)
+
+        # Frames sharing a time have no slope; the position is the later frame's
+        with np.errstate(invalid='ignore', divide='ignore'):
+            w   = np.where(dt > 0, (times - t0)/dt, 1)
+            vel = np.where(dt[..., None] > 0, (xy1 - xy0)/dt[..., None], np.nan)
+
+        positions[in_range]  = (xy0 + w[..., None]*(xy1 - xy0))[in_range]
+        velocities[in_range] = vel[in_range]
+
+        return positions, velocities
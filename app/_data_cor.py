@@ -12,4 +12,28 @@ class DataDev():
     COL_BPM     = 1  # BPM of the pattern (60/s)
     COL_PX      = 2  # Distance between notes in the pattern (osu!px)
     COL_ANGLE   = 3  # Angle between notes in the pattern (deg)
-    NUM_COLS    = 4
\ No newline at end of file
+    NUM_COLS    = 4
+
+class DataPlayer():
+
+    COL_HIT_DEV       = 0  # Tap deviation (ms @ 95% confidence interval)
+    COL_AVG_READ_TIME = 1  # Average read time (ms)
+    COL_DEV_READ_TIME = 2  # Deviation of read time (ms)
+    COL_VEL_DEV       = 3  # Deviation of applied velocity (osu!px/ms @ 95% confidence interval)
+    NUM_COLS          = 4
+
+    # `PlayerSimulator` parameter names, in column order
+    KEYS = [ 'hit_dev', 'avg_read_time', 'dev_read_time', 'player_vel_dev' ]
+
+
+class DataPop():
+
+    COL_DEV           = 0  # Aim deviation (osu!px)
+    COL_DEV_X         = 1  # Aim deviation along the incoming direction (osu!px)
+    COL_DEV_Y         = 2  # Aim deviation perpendicular to the incoming direction (osu!px)
+    COL_MISSES        = 3  # Number of taps >100 ms late
+    COL_HIT_DEV       = 4  # Player parameters, same meaning as the `DataPlayer` columns
+    COL_AVG_READ_TIME = 5
+    COL_DEV_READ_TIME = 6
+    COL_VEL_DEV       = 7
+    NUM_COLS          = 8
@@ -3,8 +3,10 @@ import math
 
 import pyqtgraph
 from pyqtgraph.Qt import QtGui
+from pyqtgraph.Qt import QtCore
 
 from app.misc._utils import Utils
+from app.misc._softplus_fit import SoftplusFit
 from app._data_cor import DataDev
 
 
@@ -36,13 +38,16 @@ class DataGraph(QtGui.QWidget):
         self.__layout.addWidget(self.__graph)
 
 
-    def plot_data(self, data, model=False):
+    def plot_data(self, data, model=False, softplus=False):
         if data.shape[0] == 0:
             return
 
         # Clear plots for redraw
         self.__graph.clearPlots()
 
+        # Softplus fits of every angle, done in one batch
+        softplus_fits = SoftplusFit.fit_dev_data(data) if softplus else {}
+
         unique_angs = np.unique(data[:, DataDev.COL_ANGLE])
 
         angle_lut = pyqtgraph.ColorMap(
@@ -86,3 +91,15 @@ class DataGraph(QtGui.QWidget):
             self.__graph.plot(x=vels, y=devs, pen=None, symbol='o', symbolPen=None, symbolSize=5, symbolBrush=color, name=label)
             self.__graph.plot(x=[0, max(vels)], y=[b, m*max(vels) + b], pen=(100, 100, 0, 150))  
 
+            if angle in softplus_fits:
+                fit = softplus_fits[angle]
+
+                # Median absolute residual; runaway deviations would swamp a mean
+                sp_err = np.median(np.abs(fit['residuals']))
+
+                x_fit = np.linspace(0, max(vels), 200)
+                y_fit = SoftplusFit.model(x_fit, fit['r'], fit['t_min'], fit['y'])
+
+                label = f'∠={angle:.2f}  softplus  r={fit["r"]:.5f}  t={fit["t_min"]:.2f}  y={fit["y"]:.2f}  |ε|={sp_err:.2f}'
+                self.__graph.plot(x=x_fit, y=y_fit, pen=pyqtgraph.mkPen(color, width=2, style=QtCore.Qt.DashLine), name=label)
+
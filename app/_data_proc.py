@@ -0,0 +1,63 @@
+import numpy as np
+
+from app._data_cor import DataOsu
+
+
+class DataProc():
+
+    @staticmethod
+    def process_data(map_data, replay_data):
+        # Process data
+        tap_offsets   = map_data[:, DataOsu.IDX_T] - replay_data[:, DataOsu.IDX_T]
+        aim_x_offsets = map_data[:, DataOsu.IDX_X] - replay_data[:, DataOsu.IDX_X]
+        aim_y_offsets = map_data[:, DataOsu.IDX_Y] - replay_data[:, DataOsu.IDX_Y]
+        
+        # Correct for incoming direction
+        x_map_vecs = map_data[1:, DataOsu.IDX_X] - map_data[:-1, DataOsu.IDX_X]
+        y_map_vecs = map_data[1:, DataOsu.IDX_Y] - map_data[:-1, DataOsu.IDX_Y]
+
+        map_thetas = np.arctan2(y_map_vecs, x_map_vecs)
+        hit_thetas = np.arctan2(aim_y_offsets, aim_x_offsets)
+        mags = (aim_x_offsets**2 + aim_y_offsets**2)**0.5
+
+        aim_x_offsets = mags[1:]*np.cos(map_thetas - hit_thetas[1:])
+        aim_y_offsets = mags[1:]*np.sin(map_thetas - hit_thetas[1:])
+
+        # Filter out nans that happen due to misc reasons (usually due to empty slices or div by zero)
+        nan_filter = ~np.isnan(aim_x_offsets) & ~np.isnan(aim_y_offsets)
+
+        aim_x_offsets = aim_x_offsets[nan_filter]
+        aim_y_offsets = aim_y_offsets[nan_filter]
+        #tap_offsets   = tap_offsets[nan_filter]
+
+        return aim_x_offsets, aim_y_offsets
+
+
+    @staticmethod
+    def process_data_batch(map_data, replay_data):
+        """
+        Same as `process_data`, but for a batch of replays of the same map.
+
+        `replay_data` is (n_replays, n_notes, 4) with one hit per note. Returns
+        (n_replays, n_notes - 1) arrays of aim offsets. Entries `process_data` would
+        filter out are nan instead so rows keep the same length.
+        """
+        aim_x_offsets = map_data[None, :, DataOsu.IDX_X] - replay_data[:, :, DataOsu.IDX_X]
+        aim_y_offsets = map_data[None, :, DataOsu.IDX_Y] - replay_data[:, :, DataOsu.IDX_Y]
+
+        # Correct for incoming direction
+        x_map_vecs = map_data[1:, DataOsu.IDX_X] - map_data[:-1, DataOsu.IDX_X]
+        y_map_vecs = map_data[1:, DataOsu.IDX_Y] - map_data[:-1, DataOsu.IDX_Y]
+
+        map_thetas = np.arctan2(y_map_vecs, x_map_vecs)[None, :]
+        hit_thetas = np.arctan2(aim_y_offsets, aim_x_offsets)
+        mags = (aim_x_offsets**2 + aim_y_offsets**2)**0.5
+
+        aim_x_offsets = mags[:, 1:]*np.cos(map_thetas - hit_thetas[:, 1:])
+        aim_y_offsets = mags[:, 1:]*np.sin(map_thetas - hit_thetas[:, 1:])
+
+        nan_filter = np.isnan(aim_x_offsets) | np.isnan(aim_y_offsets)
+        aim_x_offsets[nan_filter] = np.nan
+        aim_y_offsets[nan_filter] = np.nan
+
+        return aim_x_offsets, aim_y_offsets
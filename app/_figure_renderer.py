@@ -0,0 +1,134 @@
+import os
+import multiprocessing
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+class FigureRenderer():
+    """
+    Renders `AimGraph` and `PatternVisual` figures to PNG files without a display.
+
+    Each job is a dict naming the figure, the output path and what to pass to the
+    widget's setters:
+        { 'figure' : 'aim', 'path' : ..., 'cs' : ..., 'aim_x_offsets' : ..., 'aim_y_offsets' : ... }
+        { 'figure' : 'pattern', 'path' : ..., 'cs' : ..., 'ar' : ..., 't' : ...,
+          'map_data' : ..., 'replay_data' : ... (optional) }
+    and optionally a 'size' (width, height) overriding the figure's size in `SIZES`.
+
+    Workers run Qt on the offscreen platform and keep one widget of each kind, so
+    after startup a job only costs setting the data and painting. Workers are spawned
+    rather than forked, so it's safe to use from a process that already runs Qt.
+    """
+
+    # Output image size (px) of each figure
+    SIZES = {
+        'aim'     : (496, 496),
+        'pattern' : (640, 640),
+    }
+
+    def __init__(self, n_workers=1, chunk_size=16):
+        self.n_workers  = n_workers
+        self.chunk_size = chunk_size
+
+
+    def render(self, jobs):
+        """
+        Renders `jobs`, yielding the path of each image as it's written.
+        """
+        jobs   = list(jobs)
+        chunks = [ jobs[start:start + self.chunk_size] for start in range(0, len(jobs), self.chunk_size) ]
+
+        if self.n_workers <= 1:
+            _init_worker()
+
+            for chunk in chunks:
+                yield from _render_jobs(chunk)
+
+            return
+
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(self.n_workers, mp_context=context, initializer=_init_worker) as pool:
+            futures = [ pool.submit(_render_jobs, chunk) for chunk in chunks ]
+
+            for future in as_completed(futures):
+                yield from future.result()
+
+
+# Per-process Qt application and widgets, created once by the pool initializer
+_worker = None
+
+
+def _init_worker():
+    global _worker
+    if _worker is not None:
+        return
+
+    # Only takes effect if Qt hasn't started yet in this process
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    from pyqtgraph.Qt import QtCore
+    from pyqtgraph.Qt import QtWidgets
+
+    from app._aim_graph import AimGraph
+    from app._pattern_visual import PatternVisual
+
+    qt_app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+    widgets = {
+        'aim'     : AimGraph(),
+        'pattern' : PatternVisual(),
+    }
+
+    # Lay the widgets out and paint them as if shown, without putting them on screen.
+    # The widgets' own show() is for embedding, so go through setVisible
+    for widget in widgets.values():
+        widget.setAttribute(QtCore.Qt.WA_DontShowOnScreen)
+        widget.setVisible(True)
+
+    _worker = {
+        'qt_app'  : qt_app,
+        'QtCore'  : QtCore,
+        'widgets' : widgets,
+    }
+
+
+def _render_jobs(jobs):
+    return [ _render_job(job) for job in jobs ]
+
+
+def _render_job(job):
+    QtCore = _worker['QtCore']
+
+    figure = job['figure']
+    widget = _worker['widgets'][figure]
+
+    if figure == 'aim':
+        widget.set_cs(job['cs'])
+        widget.plot_data(job['aim_x_offsets'], job['aim_y_offsets'])
+    elif figure == 'pattern':
+        widget.set_cs(job['cs'])
+        widget.set_ar(job['ar'])
+        widget.set_map(job['map_data'])
+
+        # An empty replay clears the cursor left from the previous job
+        replay_data = job.get('replay_data')
+        widget.set_replay(replay_data if replay_data is not None else np.zeros((0, 4)))
+        widget.set_time(job['t'])
+    else:
+        raise ValueError(f'Unknown figure: {figure}')
+
+    width, height = job.get('size', FigureRenderer.SIZES[figure])
+    widget.resize(width, height)
+    _worker['qt_app'].processEvents()
+
+    pixmap = widget.grab()
+
+    # Widgets with a maximum size can come out smaller than asked for
+    if pixmap.width() != width or pixmap.height() != height:
+        pixmap = pixmap.scaled(width, height, QtCore.Qt.IgnoreAspectRatio, QtCore.Qt.SmoothTransformation)
+
+    if not pixmap.save(job['path'], 'PNG'):
+        raise IOError(f'Unable to write {job["path"]}')
+
+    return job['path']
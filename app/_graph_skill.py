@@ -1,18 +1,22 @@
 import pyqtgraph
 from pyqtgraph.Qt import QtGui
 
-import math
 import numpy as np
 
 from app.misc._utils import Utils
+from app.misc._bootstrap import Bootstrap
 from app._data_cor import DataDev
 
 
 class GraphSkill(QtGui.QWidget):
 
-    def __init__(self):
+    def __init__(self, n_resamples=1000, n_workers=1):
         QtGui.QWidget.__init__(self)
 
+        # Slope confidence intervals are bootstrapped from this many resamples per angle
+        self.n_resamples = n_resamples
+        self.n_workers   = n_workers
+
         # Main graph
         self.__graph = pyqtgraph.PlotWidget(title='Aim dev-x (skill)')
         self.__graph.getPlotItem().getAxis('left').enableAutoSIPrefix(False)
@@ -34,7 +38,9 @@ class GraphSkill(QtGui.QWidget):
         self.__layout.addWidget(self.__graph)
 
 
-    def plot_data(self, data):
+    # Bootstrapping the error bars takes a while on a full sweep, so they can be skipped
+    # while a sweep is still filling in
+    def plot_data(self, data, error_bars=True):
         if data.shape[0] == 0:
             return
 
@@ -48,7 +54,10 @@ class GraphSkill(QtGui.QWidget):
             return
 
         unique_angs = np.sort(unique_angs)
-        plot_data = np.zeros((unique_angs.shape[0], 3))
+        plot_data = np.zeros((unique_angs.shape[0], 4))
+
+        # Points of each plotted angle, for the confidence intervals
+        groups = []
 
         # Adds a plot for every unique BPM recorded
         for angle, i in zip(unique_angs, range(data.shape[0])):
@@ -77,24 +86,15 @@ class GraphSkill(QtGui.QWidget):
             plot_data[i, 0] = angle
             plot_data[i, 1] = m*2*1000
 
-            if devs.shape[0] < 2:
-                plot_data[i, 2] = np.nan
-                continue
-
-            # Calc and record standard error
-            y_model = m*vels + b                # model: y = mx + b
-            x_model = (devs - b)/m            # model: x = (y - b)/m
-
-            m_dev_y = np.std(devs - y_model)  # deviation of y from model
-            m_dev_x = np.std(vels - x_model)    # deviation of x from model
-
-            if m_dev_x == 0:
-                plot_data[i, 2] = np.nan
-                continue
+            groups.append((i, vels, devs))
 
-            # Standard error of slope @ 95% confidence interval
-            m_se_95 = (m_dev_y/m_dev_x)/math.sqrt(devs.shape[0] - 2)*1.96
-            plot_data[i, 2] = m_se_95*2*1000
+        # Bootstrap 95% confidence interval of the slopes, as distances below and above the slope
+        plot_data[:, 2:] = np.nan
+        if error_bars and len(groups) > 0:
+            cis = Bootstrap.slope_cis([ (vels, devs) for _, vels, devs in groups ], self.n_resamples, seed=0, n_workers=self.n_workers)
+            for (i, _, _), (m_low, m_high) in zip(groups, cis):
+                plot_data[i, 2] = plot_data[i, 1] - m_low*2*1000
+                plot_data[i, 3] = m_high*2*1000 - plot_data[i, 1]
 
         # Plot slope vs angle
         plot_data = plot_data[~np.isnan(plot_data[:, 0])]  # Remove nan
@@ -106,6 +106,7 @@ class GraphSkill(QtGui.QWidget):
         # Plot error bars
         plot_data = plot_data[~np.isnan(plot_data[:, 2])]  # Remove nan
         if plot_data.shape[0] == 0:
+            self.__error_bars.setData(x=np.zeros(0), y=np.zeros(0), top=np.zeros(0), bottom=np.zeros(0))
             return
 
-        self.__error_bars.setData(x=plot_data[:, 0], y=plot_data[:, 1], top=plot_data[:, 2], bottom=plot_data[:, 2]) 
\ No newline at end of file
+        self.__error_bars.setData(x=plot_data[:, 0], y=plot_data[:, 1], top=plot_data[:, 3], bottom=plot_data[:, 2]) 
\ No newline at end of file
@@ -0,0 +1,128 @@
+import numpy as np
+
+from app._data_cor import DataOsu
+from app._player_simulator import PlayerSimulator
+from app.misc._osu_utils import OsuUtils
+
+
+class HitJudge():
+    """
+    osu!standard hit judgement of simulated or recorded hits.
+
+    Hits are in the `RECORD_HITS` layout: one [t, x, y, k] row per note, where k is
+    `KEY_HIT` or `KEY_MISS` if the note was tapped and t, x, y are the time and cursor
+    position of the tap. A note gets a 300, 100 or 50 if the tap is inside the circle
+    and within that hit window of the note, else it's a miss. Everything is computed
+    with array ops, and a batch of replays of one map (n_replays, n_notes, 4) is judged
+    the same way as a single replay (n_notes, 4).
+
+    Full replays (`RECORD_REPLAY` layout, or loaded .osr files) are turned into hits
+    with `extract_hits` first.
+    """
+
+    MISS = 0
+    HIT_50  = 50
+    HIT_100 = 100
+    HIT_300 = 300
+
+    @staticmethod
+    def judge(map_data, hit_data, cs, od):
+        """
+        Returns (judgements, tap_offsets), both shaped like `hit_data` without the last axis.
+
+        judgements   `HIT_300`, `HIT_100`, `HIT_50` or `MISS` per note
+        tap_offsets  tap time - note time (ms), positive when late; nan for missed notes
+        """
+        w300, w100, w50 = OsuUtils.od_to_ms(od)
+        radius = OsuUtils.cs_to_px(cs)/2
+
+        tap_offsets = 1000*(hit_data[..., DataOsu.IDX_T] - map_data[:, DataOsu.IDX_T])
+        aim_x_offsets = hit_data[..., DataOsu.IDX_X] - map_data[:, DataOsu.IDX_X]
+        aim_y_offsets = hit_data[..., DataOsu.IDX_Y] - map_data[:, DataOsu.IDX_Y]
+
+        is_tapped = (hit_data[..., DataOsu.IDX_K] == PlayerSimulator.KEY_HIT) | (hit_data[..., DataOsu.IDX_K] == PlayerSimulator.KEY_MISS)
+
+        with np.errstate(invalid='ignore'):
+            abs_offsets = np.abs(tap_offsets)
+            is_hit = is_tapped & (aim_x_offsets**2 + aim_y_offsets**2 <= radius**2) & (abs_offsets <= w50)
+
+            judgements = np.select(
+                [ is_hit & (abs_offsets <= w300), is_hit & (abs_offsets <= w100), is_hit ],
+                [ HitJudge.HIT_300, HitJudge.HIT_100, HitJudge.HIT_50 ],
+                HitJudge.MISS
+            )
+
+        tap_offsets = np.where(is_hit, tap_offsets, np.nan)
+        return judgements, tap_offsets
+
+
+    @staticmethod
+    def score(map_data, hit_data, cs, od):
+        """
+        Judges `hit_data` and summarizes it per replay. Returns a dict of:
+            'judgements'     per note, as returned by `judge`
+            'tap_offsets'    per note, as returned by `judge`
+            'n_300', 'n_100', 'n_50', 'n_miss'
+            'accuracy'       osu! accuracy (0 to 1)
+            'tap_mean'       mean tap offset of hit notes (ms)
+            'tap_dev'        standard deviation of tap offsets of hit notes (ms)
+            'unstable_rate'  10*tap_dev, as shown in game
+        Summaries are scalars for a single replay and (n_replays,) arrays for a batch.
+        """
+        judgements, tap_offsets = HitJudge.judge(map_data, hit_data, cs, od)
+        n_notes = judgements.shape[-1]
+
+        # Replays with no hit notes have no tap offset statistics
+        n_hits = np.sum(judgements != HitJudge.MISS, axis=-1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            tap_mean = np.nansum(tap_offsets, axis=-1)/n_hits
+            tap_dev  = np.sqrt(np.nansum((tap_offsets - tap_mean[..., None])**2, axis=-1)/n_hits)
+
+        return {
+            'judgements'    : judgements,
+            'tap_offsets'   : tap_offsets,
+            'n_300'         : np.sum(judgements == HitJudge.HIT_300, axis=-1),
+            'n_100'         : np.sum(judgements == HitJudge.HIT_100, axis=-1),
+            'n_50'          : np.sum(judgements == HitJudge.HIT_50, axis=-1),
+            'n_miss'        : n_notes - n_hits,
+            'accuracy'      : np.sum(judgements, axis=-1)/(HitJudge.HIT_300*n_notes),
+            'tap_mean'      : tap_mean,
+            'tap_dev'       : tap_dev,
+            'unstable_rate' : 10*tap_dev,
+        }
+
+
+    @staticmethod
+    def extract_hits(map_data, replay_data, od):
+        """
+        Turns a full replay into one hit row per note for `judge`.
+
+        Presses are the frames where a key goes down (k is `KEY_HIT` or `KEY_MISS`).
+        Each note takes the first unused press within its 50 window; presses outside
+        every window are ignored. Notes without a press get a `KEY_NONE` row of nan.
+        """
+        w50 = OsuUtils.od_to_ms(od)[2]/1000
+
+        is_press = (replay_data[:, DataOsu.IDX_K] == PlayerSimulator.KEY_HIT) | (replay_data[:, DataOsu.IDX_K] == PlayerSimulator.KEY_MISS)
+        presses = replay_data[is_press]
+        press_times = presses[:, DataOsu.IDX_T]
+
+        note_times = map_data[:, DataOsu.IDX_T]
+
+        # First press at or after the start of each note's window
+        candidates = np.searchsorted(press_times, note_times - w50, side='left')
+
+        hit_data = np.full((map_data.shape[0], 4), np.nan)
+        hit_data[:, DataOsu.IDX_K] = PlayerSimulator.KEY_NONE
+
+        # A press can't be used by two notes, so when windows overlap a note has to take
+        # the press after the one the previous note used
+        next_press = 0
+        for i, candidate in enumerate(candidates):
+            press_idx = max(candidate, next_press)
+
+            if press_idx < press_times.shape[0] and press_times[press_idx] <= note_times[i] + w50:
+                hit_data[i] = presses[press_idx]
+                next_press  = press_idx + 1
+
+        return hit_data
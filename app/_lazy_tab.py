@@ -0,0 +1,53 @@
+from pyqtgraph.Qt import QtGui
+
+
+class LazyTab(QtGui.QWidget):
+    """
+    Placeholder tab that constructs the real widget the first time it's needed.
+
+    Method calls made before the widget exists are recorded and replayed once it's
+    built. Only the latest call per method is kept, so feeding plot data into a tab
+    that's never opened doesn't accumulate anything.
+    """
+
+    def __init__(self, factory):
+        QtGui.QWidget.__init__(self)
+
+        self.__factory = factory
+        self.__widget  = None
+        self.__pending = {}
+
+        self.__layout = QtGui.QVBoxLayout(self)
+        self.__layout.setContentsMargins(0, 0, 0, 0)
+
+
+    def is_built(self):
+        return self.__widget is not None
+
+
+    def widget(self):
+        if self.__widget is None:
+            self.__widget = self.__factory()
+            self.__layout.addWidget(self.__widget)
+
+            for name, (args, kwargs) in self.__pending.items():
+                getattr(self.__widget, name)(*args, **kwargs)
+
+            self.__pending = {}
+
+        return self.__widget
+
+
+    def __getattr__(self, name):
+        # Only reached for attributes not defined on the placeholder itself
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            if self.__widget is not None:
+                return getattr(self.__widget, name)(*args, **kwargs)
+
+            # Latest call wins, but keep the order the methods were first called in
+            self.__pending[name] = (args, kwargs)
+
+        return call
@@ -0,0 +1,266 @@
+import math
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+
+from app._data_cor import DataDev, DataPlayer, DataPop
+from app._population_simulator import PopulationSimulator
+from app.misc._osu_utils import OsuUtils
+
+
+class ParamFitter():
+    """
+    Estimates the player parameters that best reproduce observed aim deviations.
+
+    Observations are rows in `DataDev` layout: the measured deviation of a player on a
+    stream pattern of the given bpm, distance and angle. Each candidate parameter set is
+    simulated on every observed pattern with the same fixed seeds (common random numbers),
+    so differences in the objective between candidates come from their parameters rather
+    than from the noise. Candidates are searched with the cross-entropy method: sample a
+    generation (uniformly over the bounds at first), keep the best fraction, and fit the
+    normal distribution the next generation is sampled from to them.
+
+    The uncertainty of the fit comes from the data: the simulated deviations are
+    linearized around the best fit with finite differences, and the spread of the
+    residuals is propagated through them (Gauss-Newton covariance). A parameter the
+    observations don't constrain gets an infinite std.
+
+    Candidate batches are split across a process pool when `n_workers` > 1.
+    """
+
+    # Search range of each parameter
+    BOUNDS = {
+        'hit_dev'        : (1, 50),
+        'avg_read_time'  : (1, 300),
+        'dev_read_time'  : (0, 50),
+        'player_vel_dev' : (0, 20),
+    }
+
+    # Finite difference step of each parameter for the uncertainty, as a fraction of its bounds
+    DIFF_STEP = 0.02
+
+    def __init__(self, cs, fixed=None, bounds=None, n_points=15, n_seeds=4, n_candidates=128, n_elite=16, n_iters=12, n_workers=1, seed=0):
+        self.cs = cs
+
+        # Parameters held at a given value instead of being fit
+        self.fixed = dict(fixed or {})
+
+        self.bounds = dict(ParamFitter.BOUNDS)
+        self.bounds.update(bounds or {})
+
+        # Number of notes in each simulated pattern
+        self.n_points = n_points
+
+        # Number of simulations per candidate and pattern; their deviations are averaged
+        self.n_seeds = n_seeds
+
+        # Cross-entropy search settings
+        self.n_candidates = n_candidates
+        self.n_elite      = n_elite
+        self.n_iters      = n_iters
+
+        self.n_workers = n_workers
+        self.seed      = seed
+
+        self.__pool = None
+
+        # Generated patterns by (bpm, px, angle); each observed pattern is only generated once
+        self.__patterns = {}
+
+
+    def fit(self, dev_data):
+        """
+        Fits player parameters to `dev_data` (`DataDev` layout).
+
+        Returns a dict with:
+            'params'  best-fit parameters, keyed by `DataPlayer.KEYS`
+            'std'     standard error of each parameter, 0 for fixed ones
+            'err'     mean squared deviation error of the best fit (osu!px^2)
+            'evals'   number of candidates evaluated
+        """
+        with self:
+            return self.__fit(dev_data)
+
+
+    def fit_many(self, dev_datas):
+        """
+        Fits each of `dev_datas` in turn, reusing the same worker pool.
+        """
+        with self:
+            return [ self.__fit(dev_data) for dev_data in dev_datas ]
+
+
+    def evaluate(self, dev_data, players):
+        """
+        Mean squared error between simulated and observed deviations for each row of `players`
+        (`DataPlayer` layout). Candidates whose simulation diverges get an infinite error.
+        """
+        with np.errstate(over='ignore', invalid='ignore'):
+            errs = np.mean((self.simulate(dev_data, players) - dev_data[:, DataDev.COL_DEV])**2, axis=1)
+
+        errs[~np.isfinite(errs)] = math.inf
+        return errs
+
+
+    def simulate(self, dev_data, players):
+        """
+        Simulated deviation of each row of `players` on each pattern of `dev_data`,
+        as (n_players, n_patterns), averaged over the fitter's seeds.
+        """
+        patterns = [ self.__pattern(row) for row in dev_data ]
+
+        if self.__pool is None or players.shape[0] < 2:
+            return simulate_players(self.cs, patterns, players, self.__seeds())
+
+        chunks  = np.array_split(players, min(self.n_workers, players.shape[0]))
+        futures = [ self.__pool.submit(simulate_players, self.cs, patterns, chunk, self.__seeds()) for chunk in chunks ]
+
+        return np.concatenate([ future.result() for future in futures ])
+
+
+    def __enter__(self):
+        if self.n_workers > 1 and self.__pool is None:
+            self.__pool = ProcessPoolExecutor(self.n_workers)
+
+        return self
+
+
+    def __exit__(self, *args):
+        if self.__pool is not None:
+            self.__pool.shutdown()
+            self.__pool = None
+
+
+    def __fit(self, dev_data):
+        rng = np.random.default_rng(self.seed)
+
+        free_keys = [ key for key in DataPlayer.KEYS if key not in self.fixed ]
+        free_cols = [ DataPlayer.KEYS.index(key) for key in free_keys ]
+
+        low  = np.array([ self.bounds[key][0] for key in free_keys ], dtype=float)
+        high = np.array([ self.bounds[key][1] for key in free_keys ], dtype=float)
+
+        mean = None
+        std  = None
+
+        best_err    = math.inf
+        best_player = None
+        elite       = None
+        n_evals     = 0
+
+        for _ in range(self.n_iters):
+            players = np.zeros((self.n_candidates, DataPlayer.NUM_COLS))
+            for key, value in self.fixed.items():
+                players[:, DataPlayer.KEYS.index(key)] = value
+
+            # The first generation covers the whole search range
+            if elite is None:
+                players[:, free_cols] = rng.uniform(low, high, (self.n_candidates, len(free_cols)))
+            else:
+                players[:, free_cols] = np.clip(rng.normal(mean, std, (self.n_candidates, len(free_cols))), low, high)
+
+            # Keep the best candidate so far in the generation so it isn't lost to sampling
+            if best_player is not None:
+                players[0] = best_player
+
+            errs = self.evaluate(dev_data, players)
+            n_evals += players.shape[0]
+
+            order = np.argsort(errs)
+            if errs[order[0]] < best_err:
+                best_err    = errs[order[0]]
+                best_player = players[order[0]].copy()
+
+            elite = players[order[:self.n_elite]][:, free_cols]
+            mean  = elite.mean(axis=0)
+            std   = np.maximum(elite.std(axis=0), 1e-3*(high - low))
+
+        param_std, n_diff = self.__param_std(dev_data, best_player, free_cols, low, high)
+        n_evals += n_diff
+
+        return {
+            'params' : { key : best_player[col] for col, key in enumerate(DataPlayer.KEYS) },
+            'std'    : { key : (param_std[free_keys.index(key)] if key in free_keys else 0.0) for key in DataPlayer.KEYS },
+            'err'    : best_err,
+            'evals'  : n_evals,
+        }
+
+
+    def __param_std(self, dev_data, best_player, free_cols, low, high):
+        # Standard errors of the free parameters from the residuals and the Jacobian of
+        # the simulated deviations at the best fit. Returns them along with the number
+        # of candidates evaluated for the Jacobian
+        n_obs  = dev_data.shape[0]
+        n_free = len(free_cols)
+
+        if n_free == 0:
+            return np.zeros(0), 0
+
+        # Central differences, one sided where a step would leave the bounds
+        step    = ParamFitter.DIFF_STEP*(high - low)
+        players = np.repeat(best_player[None, :], 2*n_free, axis=0)
+
+        for j, col in enumerate(free_cols):
+            players[2*j,     col] = min(best_player[col] + step[j], high[j])
+            players[2*j + 1, col] = max(best_player[col] - step[j], low[j])
+
+        devs = self.simulate(dev_data, np.vstack([ best_player[None, :], players ]))
+        residuals = devs[0] - dev_data[:, DataDev.COL_DEV]
+
+        jacobian = np.zeros((n_obs, n_free))
+        for j, col in enumerate(free_cols):
+            jacobian[:, j] = (devs[1 + 2*j] - devs[2 + 2*j]) / (players[2*j, col] - players[2*j + 1, col])
+
+        # Too few observations or a diverged simulation leave the parameters unconstrained
+        if n_obs <= n_free or not (np.all(np.isfinite(jacobian)) and np.all(np.isfinite(residuals))):
+            return np.full(n_free, math.inf), players.shape[0] + 1
+
+        sigma_sq = np.sum(residuals**2) / (n_obs - n_free)
+
+        try:
+            cov = sigma_sq*np.linalg.inv(jacobian.T @ jacobian)
+        except np.linalg.LinAlgError:
+            return np.full(n_free, math.inf), players.shape[0] + 1
+
+        return np.sqrt(np.maximum(np.diag(cov), 0)), players.shape[0] + 1
+
+
+    def __seeds(self):
+        return self.seed + np.arange(self.n_seeds)
+
+
+    def __pattern(self, row):
+        key = (row[DataDev.COL_BPM], row[DataDev.COL_PX], row[DataDev.COL_ANGLE])
+
+        if key not in self.__patterns:
+            self.__patterns[key] = OsuUtils.generate_pattern(
+                initial_angle = 0,
+                distance      = row[DataDev.COL_PX],
+                time          = 60/row[DataDev.COL_BPM],
+                angle         = row[DataDev.COL_ANGLE]*math.pi/180,
+                n_points      = self.n_points,
+                n_repeats     = 1
+            )
+
+        return self.__patterns[key]
+
+
+def simulate_players(cs, patterns, players, seeds):
+    simulator = PopulationSimulator(cs)
+
+    n_players = players.shape[0]
+    n_seeds   = seeds.shape[0]
+
+    # Every candidate gets the same seeds
+    batch_players = np.repeat(players, n_seeds, axis=0)
+    devs = np.zeros((n_players, len(patterns)))
+
+    for i, map_data in enumerate(patterns):
+        # Different, but still common, seeds for each pattern
+        batch_seeds = np.tile(seeds + i*n_seeds, n_players)
+
+        replay_data = simulator.run_simulation(map_data, batch_players, seeds=batch_seeds)
+        pattern_devs = PopulationSimulator.summarize(map_data, replay_data, batch_players)[:, DataPop.COL_DEV]
+        devs[:, i] = pattern_devs.reshape(n_players, n_seeds).mean(axis=1)
+
+    return devs
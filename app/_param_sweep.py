@@ -0,0 +1,141 @@
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from app._player_simulator import PlayerSimulator
+from app._data_cor import DataDev
+from app._sweep import Sweep
+from app._sweep_config import SweepConfig
+from app.misc._result_cube import ResultCube
+
+
+class ParamSweep():
+    """
+    Runs a `SweepConfig` over any map and player parameters, storing the results in a
+    `ResultCube` at `path` with one axis per swept parameter.
+
+    The cube holds a 'dev' metric (aim deviation, osu!px) and, if the config has an od,
+    'accuracy' and 'tap_dev' from `HitJudge`. The config, seed included, is kept in
+    the cube's attrs.
+    Deviation vs velocity at hit_dev=10, for example, is then
+
+        ParamSweep.dev_data(cube, hit_dev=10)
+
+    which only loads the chunks with hit_dev=10 cells.
+    """
+
+    def __init__(self, config, path):
+        self.config = config
+
+        metrics = [ 'dev' ] + ([ 'accuracy', 'tap_dev' ] if config.judged() else [])
+
+        self.cube = ResultCube.create(
+            path,
+            [ (name, config.axes[name]) for name in config.names ],
+            metrics,
+            chunks = config.chunks or None,
+            attrs  = { 'config' : config.to_dict() },
+        )
+
+
+    def run(self, n_workers=1, telemetry=None, chunk_size=64):
+        """
+        Runs the sweep, yielding the flat index of each point as it finishes. Points
+        are handed to a process pool `chunk_size` at a time when `n_workers` > 1.
+        `telemetry` is an optional `SweepTelemetry` to report progress to.
+        """
+        n_points = self.config.size()
+
+        try:
+            if n_workers <= 1:
+                simulators = {}
+
+                for i in range(n_points):
+                    self.__record(i, ParamSweep.run_point(simulators, self.config, i), telemetry)
+                    yield i
+
+                return
+
+            with ProcessPoolExecutor(n_workers, initializer=_init_worker, initargs=(self.config.to_dict(),)) as pool:
+                futures = [ pool.submit(_run_worker_points, start, min(start + chunk_size, n_points)) for start in range(0, n_points, chunk_size) ]
+
+                for future in as_completed(futures):
+                    start, results = future.result()
+
+                    for i, result in enumerate(results, start):
+                        self.__record(i, result, telemetry)
+                        yield i
+        finally:
+            self.cube.flush()
+
+
+    @staticmethod
+    def run_point(simulators, config, i):
+        params = config.params(i)
+
+        # One simulator per distinct player, reused across its points
+        player_data = SweepConfig.player_data(params)
+        key = tuple(player_data.values())
+
+        if key not in simulators:
+            simulators[key] = PlayerSimulator(player_data)
+
+        map_data = Sweep.generate_pattern(SweepConfig.point(params), config.n_points)
+        return Sweep.run_pattern(simulators[key], map_data, params.get('od'), config.point_seed(i))
+
+
+    @staticmethod
+    def dev_data(cube, reduce='mean', **selectors):
+        """
+        Cells of `cube` at `selectors` as `DataDev` rows, for the deviation graphs.
+
+        Axes other than bpm, dist and angle that aren't selected down to one value are
+        reduced with `reduce`. Pattern parameters that aren't axes are taken from the
+        cube's config.
+        """
+        fixed = cube.attrs['config']['fixed']
+        over  = [ name for name in cube.axes if name not in ('bpm', 'dist', 'angle') and np.ndim(selectors.get(name, [])) > 0 ]
+
+        if len(over) > 0:
+            devs, coords = cube.reduce('dev', over, reduce, **selectors)
+        else:
+            devs, coords = cube.sel('dev', **selectors)
+
+        grids = np.meshgrid(*coords.values(), indexing='ij')
+        cols  = { name : grid.ravel() for name, grid in zip(coords, grids) }
+
+        data = np.zeros((devs.size, DataDev.NUM_COLS))
+        data[:, DataDev.COL_DEV]   = devs.ravel()
+        data[:, DataDev.COL_BPM]   = cols.get('bpm', selectors.get('bpm', fixed.get('bpm')))
+        data[:, DataDev.COL_PX]    = cols.get('dist', selectors.get('dist', fixed.get('dist')))
+        data[:, DataDev.COL_ANGLE] = cols.get('angle', selectors.get('angle', fixed.get('angle')))
+
+        return data
+
+
+    def __record(self, i, result, telemetry):
+        values = { 'dev' : result['dev'] }
+        if 'accuracy' in result:
+            values['accuracy'] = result['accuracy']
+            values['tap_dev']  = result['tap_dev']
+
+        self.cube.write(self.config.index(i), values)
+
+        if telemetry is not None:
+            telemetry.record(self.config.params(i), result['worker'], result['t_start'], result['t_end'], result['ticks'])
+
+
+# Per-process sweep config and simulators of pool workers, set up by the pool initializer
+_worker = None
+
+
+def _init_worker(config):
+    global _worker
+    _worker = {
+        'config'     : SweepConfig.from_dict(config),
+        'simulators' : {},
+    }
+
+
+def _run_worker_points(start, end):
+    return start, [ ParamSweep.run_point(_worker['simulators'], _worker['config'], i) for i in range(start, end) ]
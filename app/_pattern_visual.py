@@ -93,6 +93,11 @@ class PatternVisual(QtGui.QWidget):
         self.cs = cs
         self.__draw_map_data()
         self.visual.update()
+
+
+    def set_time(self, t):
+        # Moves the timeline marker, which redraws the frame at `t`
+        self.timeline_marker.setValue(t)
                 
 
     def __draw_map_data(self):
@@ -3,20 +3,30 @@ import math
 import time
 
 from app._data_cor import DataOsu
+from app._sim_stats import SimStats
 from app.misc._osu_utils import OsuUtils
 
 
 class PlayerSimulator():
 
-    RECORD_HITS   = 0
-    RECORD_REPLAY = 1
+    RECORD_HITS     = 0
+    RECORD_REPLAY   = 1
+    RECORD_ADAPTIVE = 2
 
     KEY_NONE = 0
     KEY_HIT  = 1
     KEY_MISS = 2
 
+    # Tick time of simulation in ms
+    SIMULATION_STEP = 3
+
+    # Shortest and longest time between RECORD_ADAPTIVE ticks in ms
+    ADAPTIVE_MIN_STEP = 1
+    ADAPTIVE_MAX_STEP = 50
+
     def __init__(self, data):
-        # Hitcircle diameter (osu!px)
+        # Circle size and hitcircle diameter (osu!px)
+        self.cs    = data['cs']
         self.cs_px = OsuUtils.cs_to_px(data['cs'])
 
         # Player tap deviation (ms @ 95% confidence interval)
@@ -34,25 +44,41 @@ class PlayerSimulator():
         print(self.hit_dev, self.avg_read_time, self.dev_read_time, self.player_vel_dev)
 
 
+    # Simulation tick timings (ms) `run_simulation` goes through for the given map
+    def get_sim_timing_steps(self, map_data):
+        simulation_step = PlayerSimulator.SIMULATION_STEP
+
+        # Timing of the first and last note in the map
+        first_note_timing = int(1000*map_data[0, DataOsu.IDX_T])
+        last_note_timing = int(1000*map_data[-1, DataOsu.IDX_T])
+
+        # Margin for taps up to 6 deviations early or late; hit_dev can be fractional
+        hit_margin = math.ceil(6*self.hit_dev)
+
+        return range(
+            first_note_timing - hit_margin - simulation_step, 
+            last_note_timing  + hit_margin + simulation_step, 
+            simulation_step
+        )
+
+
     # If mode is 0, record just hits scoring, if it's 1 record as if replay
-    def run_simulation(self, map_data, mode=RECORD_HITS):
+    # If mode is 2, record a replay with adaptive tick times, see `__run_adaptive`;
+    # max_error (osu!px) is the most the cursor moves between its ticks
+    # If profile is True, returns (replay_data, SimStats) instead of just replay_data
+    def run_simulation(self, map_data, mode=RECORD_HITS, profile=False, max_error=2.0):
+        if mode == PlayerSimulator.RECORD_ADAPTIVE:
+            return self.__run_adaptive(map_data, max_error, profile)
+
         ###
         ### Parameters related to replay recording
         ###
 
         # Tick time of simulation in ms
-        simulation_step = 3     
-
-        # Timing of the last note in the map
-        first_note_timing = int(1000*map_data[0, DataOsu.IDX_T])
-        last_note_timing = int(1000*map_data[-1, DataOsu.IDX_T])
+        simulation_step = PlayerSimulator.SIMULATION_STEP
 
         # List of timings to be processed
-        sim_timing_steps = range(
-            first_note_timing - 6*self.hit_dev - simulation_step, 
-            last_note_timing  + 6*self.hit_dev + simulation_step, 
-            simulation_step
-        )
+        sim_timing_steps = self.get_sim_timing_steps(map_data)
         
         if mode == PlayerSimulator.RECORD_HITS:
             replay_data = np.zeros((len(map_data), 4))
@@ -95,120 +121,39 @@ class PlayerSimulator():
         ###
 
         # Timings when player hits key to tap the note
-        hit_timings = (np.random.normal(0, self.hit_dev, len(map_data)) + 1000*map_data[:, DataOsu.IDX_T]).astype(np.int)
+        hit_timings = (np.random.normal(0, self.hit_dev, len(map_data)) + 1000*map_data[:, DataOsu.IDX_T]).astype(int)
         hit_timings = np.sort(hit_timings)
 
         # Index of the note being tapped
         note_tap_idx = 0
 
-        def get_act_params(note_act_idx):
-            # Time of active note
-            note_timing = 1000*map_data[note_act_idx, DataOsu.IDX_T]
-
-            # Time of active hit timing
-            hit_timing = int(hit_timings[note_act_idx])
-
-            # Flag indicating whether the generated hit timing is >100 ms late
-            is_late_timing = note_timing < (hit_timing - 100)
-
-            return hit_timing, is_late_timing
-
-        hit_timing, is_late_timing = get_act_params(note_tap_idx)
+        hit_timing, is_late_timing = PlayerSimulator.__hit_params(map_data, hit_timings, note_tap_idx)
 
-        #time_start = time.time()
+        # Timers and counters are only touched when profiling
+        if profile:
+            stats = SimStats()
+            time_start = time.perf_counter()
 
         # For each simulations step
         for t in sim_timing_steps:
+            if profile:
+                time_phase = time.perf_counter()
+
             # If enough time has passed since the player last processed visual information
             if t - last_read_time >= read_period:
-                # Generate next time period it would take to process visual information
-                if self.dev_read_time == 0:
-                    read_period = self.avg_read_time
-                else:
-                    read_period = int(np.random.normal(self.avg_read_time, self.dev_read_time, None))
+                read_period, note_read_idx, cursor_vel_x, cursor_vel_y, num_scan_iters = \
+                    self.__read(map_data, t, note_read_idx, note_aim_idx, cursor_pos_x, cursor_pos_y, cursor_vel_x, cursor_vel_y)
 
                 last_read_time = t
 
-                # Loop until reached a note that can be read in adequate time
-                while True:
-                    read_note_pos_x = map_data[note_read_idx, DataOsu.IDX_X]
-                    read_note_pos_y = map_data[note_read_idx, DataOsu.IDX_Y]
-                    read_time_to_note = 1000*map_data[note_read_idx, DataOsu.IDX_T] - t
-
-                    # If the note can be read within adequate time, break out of the loop
-                    if read_time_to_note >= read_period:
-                        break
-
-                    # Make sure it's not the last note
-                    if note_read_idx >= len(map_data) - 1:
-                        break
-
-                    # Check if still focused on note being aimed, 
-                    # no need to start reading next note if not finished aiming this one
-                    if note_read_idx >= note_aim_idx:
-                        break
-
-                    # Read the next note
-                    note_read_idx += 1
-
-                # Judge whether current velocity is sufficient to hit the note
-                # Reading precision of note's center is depenent on how fast the pattern is
-                read_future_pos_x = cursor_pos_x + (cursor_vel_x * read_time_to_note)
-                read_is_undershoot_x = (read_future_pos_x < (read_note_pos_x - self.cs_px/4 * 4*cursor_vel_x))
-                read_is_overshoot_x  = (read_future_pos_x > (read_note_pos_x + self.cs_px/4 * 4*cursor_vel_x))
-
-                read_future_pos_y = cursor_pos_y + (cursor_vel_y * read_time_to_note)
-                read_is_undershoot_y = (read_future_pos_y < (read_note_pos_y - self.cs_px/4 * 4*cursor_vel_y))
-                read_is_overshoot_y  = (read_future_pos_y > (read_note_pos_y + self.cs_px/4 * 4*cursor_vel_y))
-
-                '''
-                \FIXME: For low enough distances, back-and-forth jumps break due to `4*cursor_vel` increasing
-                        perceived circle center area large enough for simulation to think it can continue and
-                        not reverse direction.
-                '''
-
-                #print(t, time_to_note, read_period, int(cursor_pos), read_future_pos, read_note_pos)
-                #input()
-                
-                if read_is_undershoot_x or read_is_overshoot_x or read_is_undershoot_y or read_is_overshoot_y:
-                    # If the player perceived the trajectory to miss aim, simulate a
-                    # trajectory correction by the player
-                    if read_time_to_note == 0:
-                        # Avoid division by zero
-                        target_vel_x = 0
-                        target_vel_y = 0
-                    else:
-                        # Calculate target velocity
-                        target_vel_x = (read_note_pos_x - cursor_pos_x) / read_time_to_note
-                        target_vel_y = (read_note_pos_y - cursor_pos_y) / read_time_to_note
-                else:
-                    # Player perceives current velocity as sufficient to hit the note
-                    target_vel_x = cursor_vel_x
-                    target_vel_y = cursor_vel_y
-
-                '''
-                \FIXME: The `vel_dev` is needed to kinda simulate the player's misjudgment of
-                        how much force is needed to be applied to cursor/stylus when moving the 
-                        cursor to the note. However, this causes back and forth jump cursor behavior
-                        to be a lot more erradic then in reality, often overaiming in unrealistic amounts.
-                '''
-
-                '''
-                \FIXME: The cursor is allowed to change velocity an arbitrarily high number. This
-                        occurs when some distance away from note, but there is very short time to
-                        hit it. This undermines momentum such that the player cannot accelerate the
-                        cursor faster than a certain amount. This is probably irrelevent for the purpose
-                        of this project, but it does ruin the simulation under certain conditions, causing
-                        the cursor to fly off.
-                '''
-
-                # Update velocity; The player iteratively corrects their velocity when aim for note +/- some error'
-                if self.player_vel_dev == 0:
-                    cursor_vel_x = target_vel_x
-                    cursor_vel_y = target_vel_y
-                else:
-                    cursor_vel_x = np.random.normal(target_vel_x, abs(target_vel_x)*0.05*self.player_vel_dev, None)
-                    cursor_vel_y = np.random.normal(target_vel_y, abs(target_vel_y)*0.05*self.player_vel_dev, None)
+                if profile:
+                    stats.read_events += 1
+                    stats.scan_iters  += num_scan_iters
+
+            if profile:
+                time_now = time.perf_counter()
+                stats.time_read += time_now - time_phase
+                time_phase = time_now
 
             # Aim processing
             if t > 1000*map_data[note_aim_idx, DataOsu.IDX_T]:
@@ -228,6 +173,11 @@ class PlayerSimulator():
             cursor_pos_x += cursor_vel_x*simulation_step
             cursor_pos_y += cursor_vel_y*simulation_step
 
+            if profile:
+                time_now = time.perf_counter()
+                stats.time_aim += time_now - time_phase
+                time_phase = time_now
+
             # Tap processing
             is_within_hit_timing = \
                 (t >= hit_timing - simulation_step/2) and \
@@ -238,30 +188,325 @@ class PlayerSimulator():
                 #input()
 
                 # Simulate hit and record position
-                replay_data[replay_idx, DataOsu.IDX_T] = t/1000
-                replay_data[replay_idx, DataOsu.IDX_X] = int(cursor_pos_x)
-                replay_data[replay_idx, DataOsu.IDX_Y] = int(cursor_pos_y)
+                key = PlayerSimulator.KEY_MISS if is_late_timing else PlayerSimulator.KEY_HIT
+                PlayerSimulator.__record(replay_data, replay_idx, t, cursor_pos_x, cursor_pos_y, key)
 
-                if is_late_timing:
-                    replay_data[replay_idx, DataOsu.IDX_K] = PlayerSimulator.KEY_MISS
-                else:
-                    replay_data[replay_idx, DataOsu.IDX_K] = PlayerSimulator.KEY_HIT
+                if profile:
+                    stats.hits   += 1
+                    stats.misses += int(is_late_timing)
 
                 # If within the note, update note
                 if note_tap_idx < len(map_data) - 1:
                     note_tap_idx += 1
-                    hit_timing, is_late_timing = get_act_params(note_tap_idx)
+                    hit_timing, is_late_timing = PlayerSimulator.__hit_params(map_data, hit_timings, note_tap_idx)
 
                 replay_idx += 1
 
+                if profile:
+                    stats.time_tap += time.perf_counter() - time_phase
+
             elif mode == PlayerSimulator.RECORD_REPLAY:
-                replay_data[replay_idx, DataOsu.IDX_T] = t/1000
-                replay_data[replay_idx, DataOsu.IDX_X] = int(cursor_pos_x)
-                replay_data[replay_idx, DataOsu.IDX_Y] = int(cursor_pos_y)
+                if profile:
+                    time_now = time.perf_counter()
+                    stats.time_tap += time_now - time_phase
+                    time_phase = time_now
 
+                PlayerSimulator.__record(replay_data, replay_idx, t, cursor_pos_x, cursor_pos_y, PlayerSimulator.KEY_NONE)
                 replay_idx += 1
 
-            
-        #print(f'elapsed: {time.time() - time_start}')
+                if profile:
+                    stats.time_record += time.perf_counter() - time_phase
+
+            elif profile:
+                stats.time_tap += time.perf_counter() - time_phase
+
+        if not profile:
+            return replay_data
+
+        stats.time_total = time.perf_counter() - time_start
+        stats.ticks      = len(sim_timing_steps)
+        stats.frames     = replay_idx
+
+        return replay_data, stats
+
+
+    def __read(self, map_data, t, note_read_idx, note_aim_idx, cursor_pos_x, cursor_pos_y, cursor_vel_x, cursor_vel_y):
+        """
+        Read event at time `t`: the player processes visual information and corrects the
+        cursor's velocity. Returns (read_period, note_read_idx, cursor_vel_x, cursor_vel_y,
+        num_scan_iters) after the read.
+        """
+        # Generate next time period it would take to process visual information
+        if self.dev_read_time == 0:
+            read_period = self.avg_read_time
+        else:
+            read_period = int(np.random.normal(self.avg_read_time, self.dev_read_time, None))
+
+        num_scan_iters = 0
+
+        # Loop until reached a note that can be read in adequate time
+        while True:
+            num_scan_iters += 1
+
+            read_note_pos_x = map_data[note_read_idx, DataOsu.IDX_X]
+            read_note_pos_y = map_data[note_read_idx, DataOsu.IDX_Y]
+            read_time_to_note = 1000*map_data[note_read_idx, DataOsu.IDX_T] - t
+
+            # If the note can be read within adequate time, break out of the loop
+            if read_time_to_note >= read_period:
+                break
+
+            # Make sure it's not the last note
+            if note_read_idx >= len(map_data) - 1:
+                break
+
+            # Check if still focused on note being aimed, 
+            # no need to start reading next note if not finished aiming this one
+            if note_read_idx >= note_aim_idx:
+                break
+
+            # Read the next note
+            note_read_idx += 1
+
+        # Judge whether current velocity is sufficient to hit the note
+        # Reading precision of note's center is depenent on how fast the pattern is
+        read_future_pos_x = cursor_pos_x + (cursor_vel_x * read_time_to_note)
+        read_is_undershoot_x = (read_future_pos_x < (read_note_pos_x - self.cs_px/4 * 4*cursor_vel_x))
+        read_is_overshoot_x  = (read_future_pos_x > (read_note_pos_x + self.cs_px/4 * 4*cursor_vel_x))
+
+        read_future_pos_y = cursor_pos_y + (cursor_vel_y * read_time_to_note)
+        read_is_undershoot_y = (read_future_pos_y < (read_note_pos_y - self.cs_px/4 * 4*cursor_vel_y))
+        read_is_overshoot_y  = (read_future_pos_y > (read_note_pos_y + self.cs_px/4 * 4*cursor_vel_y))
+
+        '''
+        \FIXME: For low enough distances, back-and-forth jumps break due to `4*cursor_vel` increasing
+                perceived circle center area large enough for simulation to think it can continue and
+                not reverse direction.
+        '''
+
+        #print(t, time_to_note, read_period, int(cursor_pos), read_future_pos, read_note_pos)
+        #input()
+        
+        if read_is_undershoot_x or read_is_overshoot_x or read_is_undershoot_y or read_is_overshoot_y:
+            # If the player perceived the trajectory to miss aim, simulate a
+            # trajectory correction by the player
+            if read_time_to_note == 0:
+                # Avoid division by zero
+                target_vel_x = 0
+                target_vel_y = 0
+            else:
+                # Calculate target velocity
+                target_vel_x = (read_note_pos_x - cursor_pos_x) / read_time_to_note
+                target_vel_y = (read_note_pos_y - cursor_pos_y) / read_time_to_note
+        else:
+            # Player perceives current velocity as sufficient to hit the note
+            target_vel_x = cursor_vel_x
+            target_vel_y = cursor_vel_y
+
+        '''
+        \FIXME: The `vel_dev` is needed to kinda simulate the player's misjudgment of
+                how much force is needed to be applied to cursor/stylus when moving the 
+                cursor to the note. However, this causes back and forth jump cursor behavior
+                to be a lot more erradic then in reality, often overaiming in unrealistic amounts.
+        '''
+
+        '''
+        \FIXME: The cursor is allowed to change velocity an arbitrarily high number. This
+                occurs when some distance away from note, but there is very short time to
+                hit it. This undermines momentum such that the player cannot accelerate the
+                cursor faster than a certain amount. This is probably irrelevent for the purpose
+                of this project, but it does ruin the simulation under certain conditions, causing
+                the cursor to fly off.
+        '''
+
+        # Update velocity; The player iteratively corrects their velocity when aim for note +/- some error'
+        if self.player_vel_dev == 0:
+            cursor_vel_x = target_vel_x
+            cursor_vel_y = target_vel_y
+        else:
+            cursor_vel_x = np.random.normal(target_vel_x, abs(target_vel_x)*0.05*self.player_vel_dev, None)
+            cursor_vel_y = np.random.normal(target_vel_y, abs(target_vel_y)*0.05*self.player_vel_dev, None)
+
+        return read_period, note_read_idx, cursor_vel_x, cursor_vel_y, num_scan_iters
+
+
+    @staticmethod
+    def __hit_params(map_data, hit_timings, note_act_idx):
+        # Time of active note
+        note_timing = 1000*map_data[note_act_idx, DataOsu.IDX_T]
+
+        # Time of active hit timing
+        hit_timing = int(hit_timings[note_act_idx])
+
+        # Flag indicating whether the generated hit timing is >100 ms late
+        is_late_timing = note_timing < (hit_timing - 100)
+
+        return hit_timing, is_late_timing
+
+
+    @staticmethod
+    def __record(replay_data, replay_idx, t, cursor_pos_x, cursor_pos_y, key):
+        # Records the cursor at time `t` (ms) as row `replay_idx` of the replay
+        replay_data[replay_idx, DataOsu.IDX_T] = t/1000
+        replay_data[replay_idx, DataOsu.IDX_X] = int(cursor_pos_x)
+        replay_data[replay_idx, DataOsu.IDX_Y] = int(cursor_pos_y)
+        replay_data[replay_idx, DataOsu.IDX_K] = key
+
+
+    def __run_adaptive(self, map_data, max_error, profile):
+        """
+        Replay simulation where ticks are only as fine as needed.
+
+        The cursor moves in a straight line between read events, so the simulation
+        jumps from one event to the next instead of going through every 3 ms tick:
+            - Ticks land exactly on hit timings, and just past each note's time,
+              where the aimed note advances.
+            - Ticks land exactly on read events if read periods are at least
+              `SIMULATION_STEP`. Shorter read periods can't all be landed on without
+              ticking finer than the fixed step modes, so there the player reads
+              every tick, as in those modes.
+            - Elsewhere ticks are up to `ADAPTIVE_MAX_STEP` ms apart, and close enough
+              that the cursor moves at most `max_error` osu!px from one tick to the
+              next. Where that would need ticks finer than `SIMULATION_STEP`, ticks are
+              `SIMULATION_STEP` apart as in the fixed step modes.
+
+        Frames are recorded at hits and wherever the cursor's velocity changes, plus the
+        first and last tick, so interpolating linearly between frames gives the cursor
+        path. Positions are those at the frame's time, whereas the fixed step modes
+        record the position one tick ahead.
+
+        Player behavior on read events is the same as in `run_simulation`.
+        """
+        min_step = PlayerSimulator.ADAPTIVE_MIN_STEP
+        max_step = PlayerSimulator.ADAPTIVE_MAX_STEP
+
+        simulation_step = PlayerSimulator.SIMULATION_STEP
+
+        # Squared to compare against the cursor's squared speed without a sqrt per tick
+        max_step_sq  = max_step**2
+        max_error_sq = max_error**2
+
+        sim_timing_steps = self.get_sim_timing_steps(map_data)
+        t_start = sim_timing_steps.start
+        t_end   = sim_timing_steps.stop
+
+        # As a list; indexing it per tick is cheaper than indexing an array
+        note_timings = (1000*map_data[:, DataOsu.IDX_T]).tolist()
+        n_notes = len(map_data)
+
+        # Recorded frames as [t, x, y, k] rows
+        frames = []
+
+        # Read state, as in `run_simulation`
+        read_period    = int(np.random.normal(self.avg_read_time, self.dev_read_time, None))
+        last_read_time = 0
+        note_read_idx  = 0
+
+        # Aim state
+        cursor_pos_x = map_data[0, DataOsu.IDX_X]
+        cursor_pos_y = map_data[0, DataOsu.IDX_Y]
+        cursor_vel_x = 0
+        cursor_vel_y = 0
+        note_aim_idx = 0
+
+        # Tap state
+        hit_timings = (np.random.normal(0, self.hit_dev, n_notes) + 1000*map_data[:, DataOsu.IDX_T]).astype(int)
+        hit_timings = np.sort(hit_timings)
+
+        note_tap_idx = 0
+        taps_left    = n_notes
+
+        hit_timing, is_late_timing = PlayerSimulator.__hit_params(map_data, hit_timings, note_tap_idx)
+
+        if profile:
+            stats = SimStats()
+            time_start = time.perf_counter()
+
+        t      = t_start
+        t_prev = t_start
+
+        while t < t_end:
+            # Move along the current velocity up to this tick
+            cursor_pos_x += cursor_vel_x*(t - t_prev)
+            cursor_pos_y += cursor_vel_y*(t - t_prev)
+            t_prev = t
+
+            is_vel_changed = False
+
+            if t - last_read_time >= read_period:
+                prev_vel_x = cursor_vel_x
+                prev_vel_y = cursor_vel_y
+
+                read_period, note_read_idx, cursor_vel_x, cursor_vel_y, num_scan_iters = \
+                    self.__read(map_data, t, note_read_idx, note_aim_idx, cursor_pos_x, cursor_pos_y, cursor_vel_x, cursor_vel_y)
+
+                last_read_time = t
+                is_vel_changed = (cursor_vel_x != prev_vel_x) or (cursor_vel_y != prev_vel_y)
+
+                if profile:
+                    stats.read_events += 1
+                    stats.scan_iters  += num_scan_iters
+
+            # Aim processing
+            if t > note_timings[note_aim_idx]:
+                if note_aim_idx < n_notes - 1:
+                    note_aim_idx += 1
+
+            # Tap processing. Ticks land on hit timings, so this is the exact hit time
+            # unless several notes share a hit timing
+            if taps_left > 0 and t >= hit_timing:
+                key = PlayerSimulator.KEY_MISS if is_late_timing else PlayerSimulator.KEY_HIT
+                frames.append((t/1000, int(cursor_pos_x), int(cursor_pos_y), key))
+
+                if profile:
+                    stats.misses += int(is_late_timing)
+
+                taps_left -= 1
+                if note_tap_idx < n_notes - 1:
+                    note_tap_idx += 1
+                    hit_timing, is_late_timing = PlayerSimulator.__hit_params(map_data, hit_timings, note_tap_idx)
+
+            elif is_vel_changed or t == t_start:
+                frames.append((t/1000, int(cursor_pos_x), int(cursor_pos_y), PlayerSimulator.KEY_NONE))
+
+            if profile:
+                stats.ticks += 1
+
+            # Time to the next tick; the cursor moves at most `max_error` osu!px until
+            # then, unless that would tick finer than the fixed step modes
+            step = max_step
+
+            cursor_speed_sq = cursor_vel_x*cursor_vel_x + cursor_vel_y*cursor_vel_y
+            if cursor_speed_sq*max_step_sq > max_error_sq:
+                step = max(int(max_error/math.sqrt(cursor_speed_sq)), simulation_step)
+
+            # Land on the next read; the cursor moves in a straight line until then
+            if read_period >= simulation_step:
+                next_read_time = last_read_time + read_period
+                if next_read_time > t:
+                    step = min(step, next_read_time - t)
+
+            # Step just past the time the aimed note is passed
+            if note_timings[note_aim_idx] >= t:
+                step = min(step, int(note_timings[note_aim_idx]) + 1 - t)
+
+            # Land on the next hit timing
+            if taps_left > 0:
+                step = min(step, hit_timing - t)
+
+            t += max(step, min_step)
+
+        # End on the cursor's final position so the replay covers the whole map
+        if len(frames) == 0 or frames[-1][0] != t_prev/1000:
+            frames.append((t_prev/1000, int(cursor_pos_x), int(cursor_pos_y), PlayerSimulator.KEY_NONE))
+
+        replay_data = np.array(frames, dtype=float).reshape(-1, 4)
+
+        if not profile:
+            return replay_data
+
+        stats.time_total = time.perf_counter() - time_start
+        stats.hits       = n_notes - taps_left
+        stats.frames     = replay_data.shape[0]
 
-        return replay_data
\ No newline at end of file
+        return replay_data, stats
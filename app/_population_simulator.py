@@ -0,0 +1,365 @@
+import warnings
+import numpy as np
+
+from app._data_cor import DataOsu, DataPlayer, DataPop
+from app._data_proc import DataProc
+from app._player_simulator import PlayerSimulator
+from app.misc._osu_utils import OsuUtils
+
+
+class PopulationSimulator():
+    """
+    Simulates many players on the same map at once.
+
+    This follows `PlayerSimulator.run_simulation` in `RECORD_HITS` mode, on the same ticks,
+    but keeps the state of every player in arrays. Rather than going tick by tick, it steps
+    from one read of visual information to the next, since that is the only time a player's
+    velocity changes, and places taps in between. Each step is a handful of numpy operations
+    over the whole batch. Player parameters are rows in `DataPlayer` layout.
+    """
+
+    def __init__(self, cs):
+        # Hitcircle diameter (osu!px)
+        self.cs_px = OsuUtils.cs_to_px(cs)
+
+
+    @staticmethod
+    def sample_players(distributions, n_players, rng=None):
+        """
+        Samples player parameters into a (n_players, DataPlayer.NUM_COLS) array.
+
+        `distributions` maps each of `DataPlayer.KEYS` to one of:
+            a number                      every player gets this value
+            ('normal', mean, std)
+            ('lognormal', mean, sigma)    mean and sigma of the underlying normal
+            ('uniform', low, high)
+            ('choice', values)
+            callable(rng, n_players)      returns an array of n_players values
+
+        Sampled values are clipped to be non-negative.
+        """
+        rng = np.random.default_rng() if rng is None else rng
+        players = np.zeros((n_players, DataPlayer.NUM_COLS))
+
+        for col, key in enumerate(DataPlayer.KEYS):
+            distr = distributions[key]
+
+            if callable(distr):
+                values = distr(rng, n_players)
+            elif isinstance(distr, (tuple, list)):
+                if   distr[0] == 'normal':    values = rng.normal(distr[1], distr[2], n_players)
+                elif distr[0] == 'lognormal': values = rng.lognormal(distr[1], distr[2], n_players)
+                elif distr[0] == 'uniform':   values = rng.uniform(distr[1], distr[2], n_players)
+                elif distr[0] == 'choice':    values = rng.choice(distr[1], n_players)
+                else:
+                    raise ValueError(f'Unknown distribution for {key}: {distr[0]}')
+            else:
+                values = distr
+
+            players[:, col] = np.maximum(values, 0)
+
+        return players
+
+
+    def run_simulation(self, map_data, players, rng=None, seeds=None):
+        """
+        Simulates every player in `players` on `map_data`.
+
+        Returns (n_players, n_notes, 4) hit data, where each row is what
+        `PlayerSimulator.run_simulation(map_data, mode=RECORD_HITS)` would return for
+        that player.
+
+        Random draws come from `rng`, in batch order. If `seeds` (one per player) is given
+        instead, each player draws from its own generator, so a given seed produces the
+        same noise regardless of the player's parameters or what else is in the batch.
+        """
+        rng = np.random.default_rng() if rng is None else rng
+
+        players   = np.asarray(players, dtype=float)
+        n_players = players.shape[0]
+        n_notes   = map_data.shape[0]
+
+        hit_dev       = players[:, DataPlayer.COL_HIT_DEV]
+        avg_read_time = players[:, DataPlayer.COL_AVG_READ_TIME]
+        dev_read_time = players[:, DataPlayer.COL_DEV_READ_TIME]
+        vel_dev       = players[:, DataPlayer.COL_VEL_DEV]
+
+        is_read_dev = (dev_read_time != 0)
+        is_vel_dev  = (vel_dev != 0)
+
+        note_timings = 1000*map_data[:, DataOsu.IDX_T]
+        note_pos_x   = map_data[:, DataOsu.IDX_X]
+        note_pos_y   = map_data[:, DataOsu.IDX_Y]
+
+        ###
+        ### Parameters related to replay recording
+        ###
+
+        # Tick time of simulation in ms
+        simulation_step = PlayerSimulator.SIMULATION_STEP
+
+        first_note_timing = int(note_timings[0])
+        last_note_timing  = int(note_timings[-1])
+
+        # Each player's ticks are the ones `PlayerSimulator.get_sim_timing_steps` gives them
+        hit_margin = np.ceil(6*hit_dev)
+        t_first    = first_note_timing - hit_margin - simulation_step
+        t_end      = last_note_timing  + hit_margin + simulation_step
+
+        def next_tick(t_from, t_min):
+            # First tick at or after `t_min` of players whose ticks start at `t_from`
+            return t_from + np.ceil((t_min - t_from)/simulation_step)*simulation_step
+
+        replay_data = np.zeros((n_players, n_notes, 4))
+
+        ###
+        ### Per-player random streams
+        ###
+
+        if seeds is not None:
+            streams = [ np.random.default_rng(seed) for seed in seeds ]
+
+            # Each read takes a row of [ read time, x velocity, y velocity ] draws, so a player's
+            # n-th read gets the same draws whatever else is in the batch. Rows are drawn in
+            # blocks as the reads need them, starting with enough for reads at the average rate
+            noise_hit  = np.array([ stream.standard_normal(n_notes) for stream in streams ])
+            num_rows   = int(np.max((t_end - t_first)/np.maximum(avg_read_time, simulation_step))) + 2
+            noise_read = np.array([ stream.standard_normal((num_rows, 3)) for stream in streams ])
+
+        ###
+        ### Parameters related to note being tapped
+        ###
+
+        if seeds is None:
+            hit_offsets = rng.normal(0, hit_dev[:, None], (n_players, n_notes))
+        else:
+            hit_offsets = hit_dev[:, None]*noise_hit
+
+        hit_timings = (hit_offsets + note_timings[None, :]).astype(int)
+        hit_timings = np.sort(hit_timings, axis=1)
+
+        # Taps don't depend on aim, so the tick each note is tapped at is known up front: the
+        # one within half a step of its hit timing. Once a note's tick is out of the player's
+        # range, or no later than the previous note's, `PlayerSimulator` never gets past it,
+        # so only a prefix of the notes is tapped
+        tap_ticks = next_tick(t_first[:, None], hit_timings - simulation_step/2)
+        is_tapped = (tap_ticks >= t_first[:, None]) & (tap_ticks < t_end[:, None])
+        is_tapped[:, 1:] &= (tap_ticks[:, 1:] > tap_ticks[:, :-1])
+        num_taps = np.sum(np.logical_and.accumulate(is_tapped, axis=1), axis=1)
+
+        is_late_timing = note_timings[None, :] < (hit_timings - 100)
+
+        # Index of the next note each player taps
+        note_tap_idx = np.zeros(n_players, dtype=int)
+
+        ###
+        ### Parameters related to note being read
+        ###
+
+        if seeds is None:
+            read_period = np.trunc(rng.normal(avg_read_time, dev_read_time))
+        else:
+            read_period = np.trunc(avg_read_time + dev_read_time*noise_read[:, 0, 0])
+
+        note_read_idx = np.zeros(n_players, dtype=int)
+
+        ###
+        ### Parameters related to note being aimed
+        ###
+
+        # Cursor position at the start of the tick of the last read, and velocity since then.
+        # Before the first read the cursor rests on the first note
+        read_time  = np.copy(t_first)
+        read_pos_x = np.full(n_players, note_pos_x[0])
+        read_pos_y = np.full(n_players, note_pos_y[0])
+
+        cursor_vel_x = np.zeros(n_players)
+        cursor_vel_y = np.zeros(n_players)
+
+        # Visual information is first processed once `read_period` ms have passed since 0
+        next_read_time = next_tick(t_first, np.maximum(read_period, t_first))
+
+        # Steps from one read to the next rather than tick by tick, since velocity only changes
+        # on reads and the cursor moves in a straight line in between. The n-th step does
+        # the n-th read of every player that has one left
+        player_idxs = np.arange(n_players)
+        num_reads   = 0
+
+        while True:
+            # Taps before the next read are made at the velocity of the last one
+            PopulationSimulator.__record_taps(
+                replay_data, player_idxs, next_read_time[player_idxs], tap_ticks, num_taps, is_late_timing, note_tap_idx,
+                read_time[player_idxs], read_pos_x[player_idxs], read_pos_y[player_idxs], cursor_vel_x[player_idxs], cursor_vel_y[player_idxs]
+            )
+
+            player_idxs = player_idxs[next_read_time[player_idxs] < t_end[player_idxs]]
+            if player_idxs.shape[0] == 0:
+                break
+
+            num_reads += 1
+
+            t = next_read_time[player_idxs]
+
+            # Cursor position at the start of the read's tick
+            pos_x = read_pos_x[player_idxs] + cursor_vel_x[player_idxs]*(t - read_time[player_idxs])
+            pos_y = read_pos_y[player_idxs] + cursor_vel_y[player_idxs]*(t - read_time[player_idxs])
+            vel_x = cursor_vel_x[player_idxs]
+            vel_y = cursor_vel_y[player_idxs]
+
+            if seeds is not None and num_reads >= noise_read.shape[1]:
+                noise_read = np.concatenate([ noise_read, [ stream.standard_normal(noise_read.shape[1:]) for stream in streams ] ], axis=1)
+
+            # Generate next time period it would take to process visual information
+            period = avg_read_time[player_idxs]
+
+            read_dev = is_read_dev[player_idxs]
+            if np.any(read_dev):
+                dev_idxs = player_idxs[read_dev]
+
+                if seeds is None:
+                    period[read_dev] = np.trunc(rng.normal(period[read_dev], dev_read_time[dev_idxs]))
+                else:
+                    period[read_dev] = np.trunc(period[read_dev] + dev_read_time[dev_idxs]*noise_read[dev_idxs, num_reads, 0])
+
+            # Note being aimed, the first whose time hadn't passed by the previous tick. `PlayerSimulator`
+            # advances it one note per tick, which is the same for notes at least a tick apart
+            aim_idx = np.minimum(np.searchsorted(note_timings, t - simulation_step), n_notes - 1)
+
+            # Advance each player until reaching a note that can be read in adequate time,
+            # isn't the last note, and isn't past the note being aimed
+            note_idx = note_read_idx[player_idxs]
+            scanning = np.ones(player_idxs.shape[0], dtype=bool)
+
+            while True:
+                read_time_to_note = note_timings[note_idx] - t
+
+                scanning &= (read_time_to_note < period) & (note_idx < n_notes - 1) & (note_idx < aim_idx)
+                if not np.any(scanning):
+                    break
+
+                note_idx[scanning] += 1
+
+            note_read_idx[player_idxs] = note_idx
+
+            read_note_pos_x = note_pos_x[note_idx]
+            read_note_pos_y = note_pos_y[note_idx]
+
+            # Judge whether current velocity is sufficient to hit the note
+            read_future_pos_x = pos_x + (vel_x * read_time_to_note)
+            read_future_pos_y = pos_y + (vel_y * read_time_to_note)
+
+            read_is_off = \
+                (read_future_pos_x < (read_note_pos_x - self.cs_px/4 * 4*vel_x)) | \
+                (read_future_pos_x > (read_note_pos_x + self.cs_px/4 * 4*vel_x)) | \
+                (read_future_pos_y < (read_note_pos_y - self.cs_px/4 * 4*vel_y)) | \
+                (read_future_pos_y > (read_note_pos_y + self.cs_px/4 * 4*vel_y))
+
+            # Trajectory correction for players that perceive they'd miss, 0 if there's no time left
+            is_zero_time = (read_time_to_note == 0)
+            safe_time    = np.where(is_zero_time, 1, read_time_to_note)
+
+            target_vel_x = np.where(read_is_off, np.where(is_zero_time, 0, (read_note_pos_x - pos_x) / safe_time), vel_x)
+            target_vel_y = np.where(read_is_off, np.where(is_zero_time, 0, (read_note_pos_y - pos_y) / safe_time), vel_y)
+
+            # Update velocity +/- some error
+            vel_err = is_vel_dev[player_idxs]
+            if np.any(vel_err):
+                err_idxs    = player_idxs[vel_err]
+                err_vel_dev = vel_dev[err_idxs]
+                err_scale_x = np.abs(target_vel_x[vel_err])*0.05*err_vel_dev
+                err_scale_y = np.abs(target_vel_y[vel_err])*0.05*err_vel_dev
+
+                if seeds is None:
+                    target_vel_x[vel_err] = rng.normal(target_vel_x[vel_err], err_scale_x)
+                    target_vel_y[vel_err] = rng.normal(target_vel_y[vel_err], err_scale_y)
+                else:
+                    target_vel_x[vel_err] += err_scale_x*noise_read[err_idxs, num_reads, 1]
+                    target_vel_y[vel_err] += err_scale_y*noise_read[err_idxs, num_reads, 2]
+
+            cursor_vel_x[player_idxs] = target_vel_x
+            cursor_vel_y[player_idxs] = target_vel_y
+
+            read_time[player_idxs]  = t
+            read_pos_x[player_idxs] = pos_x
+            read_pos_y[player_idxs] = pos_y
+
+            # The next read is on the first tick at least `period` ms later
+            next_read_time[player_idxs] = next_tick(t_first[player_idxs], t + np.maximum(period, simulation_step))
+
+        return replay_data
+
+
+    @staticmethod
+    def __record_taps(replay_data, player_idxs, t_until, tap_ticks, num_taps, is_late_timing, note_tap_idx, read_time, read_pos_x, read_pos_y, vel_x, vel_y):
+        # Records the taps of `player_idxs` on ticks before `t_until`, with the cursor moving
+        # at (vel_x, vel_y) from its position at the start of tick `read_time`
+        tap_idx = note_tap_idx[player_idxs]
+
+        while True:
+            tapping = (tap_idx < num_taps[player_idxs])
+            tapping[tapping] = (tap_ticks[player_idxs[tapping], tap_idx[tapping]] < t_until[tapping])
+            if not np.any(tapping):
+                break
+
+            idxs     = player_idxs[tapping]
+            note_idx = tap_idx[tapping]
+            t        = tap_ticks[idxs, note_idx]
+
+            # The cursor moves a step on the tap's tick before the tap is recorded
+            elapsed = t - read_time[tapping] + PlayerSimulator.SIMULATION_STEP
+
+            replay_data[idxs, note_idx, DataOsu.IDX_T] = t/1000
+            replay_data[idxs, note_idx, DataOsu.IDX_X] = np.trunc(read_pos_x[tapping] + vel_x[tapping]*elapsed)
+            replay_data[idxs, note_idx, DataOsu.IDX_Y] = np.trunc(read_pos_y[tapping] + vel_y[tapping]*elapsed)
+            replay_data[idxs, note_idx, DataOsu.IDX_K] = np.where(is_late_timing[idxs, note_idx], PlayerSimulator.KEY_MISS, PlayerSimulator.KEY_HIT)
+
+            tap_idx[tapping] += 1
+
+        note_tap_idx[player_idxs] = tap_idx
+
+
+    def run_population(self, map_data, distributions, n_players, batch_size=1024, seed=None):
+        """
+        Samples `n_players` players from `distributions` (see `sample_players`) and
+        simulates them on `map_data`, `batch_size` players at a time so memory stays
+        bounded. Returns a (n_players, DataPop.NUM_COLS) array of per-player summaries.
+        """
+        rng = np.random.default_rng(seed)
+        pop_data = np.zeros((n_players, DataPop.NUM_COLS))
+
+        for batch_start in range(0, n_players, batch_size):
+            batch_end = min(batch_start + batch_size, n_players)
+
+            players     = PopulationSimulator.sample_players(distributions, batch_end - batch_start, rng)
+            replay_data = self.run_simulation(map_data, players, rng)
+
+            pop_data[batch_start:batch_end] = PopulationSimulator.summarize(map_data, replay_data, players)
+
+        return pop_data
+
+
+    @staticmethod
+    def summarize(map_data, replay_data, players):
+        """
+        Per-player deviation summary of batched hit data, in `DataPop` layout.
+        """
+        aim_x_offsets, aim_y_offsets = DataProc.process_data_batch(map_data, replay_data)
+
+        with warnings.catch_warnings():
+            # Players with no valid offsets get nan deviations
+            warnings.simplefilter('ignore', RuntimeWarning)
+            dev_x = np.nanstd(aim_x_offsets, axis=1)
+            dev_y = np.nanstd(aim_y_offsets, axis=1)
+
+        pop_data = np.zeros((replay_data.shape[0], DataPop.NUM_COLS))
+        pop_data[:, DataPop.COL_DEV]    = (dev_x**2 + dev_y**2)**0.5
+        pop_data[:, DataPop.COL_DEV_X]  = dev_x
+        pop_data[:, DataPop.COL_DEV_Y]  = dev_y
+        pop_data[:, DataPop.COL_MISSES] = np.sum(replay_data[:, :, DataOsu.IDX_K] == PlayerSimulator.KEY_MISS, axis=1)
+
+        pop_data[:, DataPop.COL_HIT_DEV]       = players[:, DataPlayer.COL_HIT_DEV]
+        pop_data[:, DataPop.COL_AVG_READ_TIME] = players[:, DataPlayer.COL_AVG_READ_TIME]
+        pop_data[:, DataPop.COL_DEV_READ_TIME] = players[:, DataPlayer.COL_DEV_READ_TIME]
+        pop_data[:, DataPop.COL_VEL_DEV]       = players[:, DataPlayer.COL_VEL_DEV]
+
+        return pop_data
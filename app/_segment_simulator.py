@@ -0,0 +1,200 @@
+import time
+import warnings
+import contextlib
+import io
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+
+from app._player_simulator import PlayerSimulator
+from app._data_cor import DataOsu
+
+
+class SegmentSimulator():
+    """
+    Simulates long maps by splitting them into segments of `segment_notes` notes and
+    simulating the segments in parallel.
+
+    The simulator carries state from note to note (cursor position and velocity, which
+    note is being read), so each segment is simulated starting `warmup_notes` notes
+    early for that state to settle, and runs `TAIL_NOTES` notes past its end so the
+    player is already reading ahead at its last notes, as in a full run. Only the
+    segment's own notes are kept:
+        RECORD_HITS    the hit rows of the segment's notes
+        RECORD_REPLAY  the frames from halfway between the note before the segment and
+                       its first note, up to the same point before the next segment
+
+    Segment k is seeded with `seed + k`, so results don't depend on the number of
+    workers. They aren't the same as a sequential `PlayerSimulator` run with the same
+    seed; `compare` measures how far the stitched result is from one.
+    """
+
+    # Notes simulated past the end of a segment
+    TAIL_NOTES = 2
+
+    # Notes after each seam `compare` measures the discontinuity over
+    SEAM_NOTES = 10
+
+    def __init__(self, player_data, n_workers=1, segment_notes=500, warmup_notes=20):
+        self.player_data   = player_data
+        self.n_workers     = n_workers
+        self.segment_notes = segment_notes
+        self.warmup_notes  = warmup_notes
+
+        self.__pool = None
+
+
+    def run_simulation(self, map_data, mode=PlayerSimulator.RECORD_HITS, seed=0):
+        with self:
+            return self.__run(map_data, mode, seed)
+
+
+    def compare(self, map_data, mode=PlayerSimulator.RECORD_HITS, seed=0):
+        """
+        Runs `map_data` both sequentially and segmented, and returns a dict of:
+            'time_sequential', 'time_segmented'   wall time of each (s)
+            'err_sequential', 'err_segmented'     aim error over the whole map
+            'seam_err_sequential'                 aim error over the first `SEAM_NOTES`
+            'seam_err_segmented'                  notes of every segment after the first
+            'discontinuity'                       seam_err_segmented - seam_err_sequential
+
+        Aim errors are the median distance (osu!px) between tap and note position. The
+        median is used because the simulated cursor occasionally runs away for a stretch
+        of a long map, which would swamp a mean. With a long enough warm-up, the seam
+        notes of the segmented run are as accurate as the same notes played sequentially
+        and the discontinuity is around 0.
+        """
+        with self:
+            t_start = time.perf_counter()
+            np.random.seed(seed)
+            with contextlib.redirect_stdout(io.StringIO()):
+                seq_data = PlayerSimulator(self.player_data).run_simulation(map_data, mode)
+            time_sequential = time.perf_counter() - t_start
+
+            t_start = time.perf_counter()
+            seg_data = self.__run(map_data, mode, seed)
+            time_segmented = time.perf_counter() - t_start
+
+        seq_errors = SegmentSimulator.__aim_errors(map_data, SegmentSimulator.__hit_rows(seq_data, mode))
+        seg_errors = SegmentSimulator.__aim_errors(map_data, SegmentSimulator.__hit_rows(seg_data, mode))
+
+        # Notes right after each seam, where a too short warm-up would show
+        seam_notes = [
+            np.arange(start, min(start + SegmentSimulator.SEAM_NOTES, map_data.shape[0]))
+            for start, _ in self.__segments(map_data)[1:]
+        ]
+        seam_notes = np.concatenate(seam_notes) if len(seam_notes) > 0 else np.zeros(0, dtype=int)
+
+        with warnings.catch_warnings():
+            # No seams if the map fits in one segment
+            warnings.simplefilter('ignore', RuntimeWarning)
+
+            seq_seam_err = np.nanmedian(seq_errors[seam_notes])
+            seg_seam_err = np.nanmedian(seg_errors[seam_notes])
+
+        return {
+            'time_sequential'     : time_sequential,
+            'time_segmented'      : time_segmented,
+            'err_sequential'      : np.nanmedian(seq_errors),
+            'err_segmented'       : np.nanmedian(seg_errors),
+            'seam_err_sequential' : seq_seam_err,
+            'seam_err_segmented'  : seg_seam_err,
+            'discontinuity'       : seg_seam_err - seq_seam_err,
+        }
+
+
+    def __enter__(self):
+        if self.n_workers > 1 and self.__pool is None:
+            self.__pool = ProcessPoolExecutor(self.n_workers, initializer=_init_worker, initargs=(self.player_data,))
+
+        return self
+
+
+    def __exit__(self, *args):
+        if self.__pool is not None:
+            self.__pool.shutdown()
+            self.__pool = None
+
+
+    def __run(self, map_data, mode, seed):
+        segments = self.__segments(map_data)
+        cuts     = self.__cut_times(map_data)
+
+        jobs = []
+        for k, (start, end) in enumerate(segments):
+            sim_start = max(start - self.warmup_notes, 0)
+            sim_end   = min(end + SegmentSimulator.TAIL_NOTES, map_data.shape[0])
+            jobs.append((map_data[sim_start:sim_end], mode, seed + k))
+
+        if self.__pool is None:
+            _init_worker(self.player_data)
+            parts = [ _run_segment(*job) for job in jobs ]
+        else:
+            parts = list(self.__pool.map(_run_segment, *zip(*jobs)))
+
+        blocks = []
+        for k, ((start, end), part) in enumerate(zip(segments, parts)):
+            if mode == PlayerSimulator.RECORD_HITS:
+                offset = start - max(start - self.warmup_notes, 0)
+                blocks.append(part[offset:offset + end - start])
+            else:
+                part_t = part[:, DataOsu.IDX_T]
+                blocks.append(part[(part_t >= cuts[k]) & (part_t < cuts[k + 1])])
+
+        return np.concatenate(blocks)
+
+
+    def __segments(self, map_data):
+        n_notes = map_data.shape[0]
+        return [ (start, min(start + self.segment_notes, n_notes)) for start in range(0, n_notes, self.segment_notes) ]
+
+
+    def __cut_times(self, map_data):
+        # Replay frames are split halfway between the last note of a segment and the first of the next
+        note_times = map_data[:, DataOsu.IDX_T]
+        starts = [ start for start, _ in self.__segments(map_data)[1:] ]
+
+        cuts = [ -np.inf ]
+        cuts += [ (note_times[start - 1] + note_times[start])/2 for start in starts ]
+        cuts += [ np.inf ]
+
+        return np.array(cuts)
+
+
+    @staticmethod
+    def __hit_rows(replay_data, mode):
+        if mode == PlayerSimulator.RECORD_HITS:
+            return replay_data
+
+        is_press = (replay_data[:, DataOsu.IDX_K] == PlayerSimulator.KEY_HIT) | (replay_data[:, DataOsu.IDX_K] == PlayerSimulator.KEY_MISS)
+        return replay_data[is_press]
+
+
+    @staticmethod
+    def __aim_errors(map_data, hit_data):
+        n_notes = min(map_data.shape[0], hit_data.shape[0])
+
+        errors = np.full(map_data.shape[0], np.nan)
+        errors[:n_notes] = np.hypot(
+            hit_data[:n_notes, DataOsu.IDX_X] - map_data[:n_notes, DataOsu.IDX_X],
+            hit_data[:n_notes, DataOsu.IDX_Y] - map_data[:n_notes, DataOsu.IDX_Y]
+        )
+
+        return errors
+
+
+# Per-process simulator used by pool workers, created once by the pool initializer
+_worker_simulator = None
+
+
+def _init_worker(player_data):
+    global _worker_simulator
+
+    # PlayerSimulator prints its parameters on construction
+    with contextlib.redirect_stdout(io.StringIO()):
+        _worker_simulator = PlayerSimulator(player_data)
+
+
+def _run_segment(map_data, mode, seed):
+    np.random.seed(seed)
+    return _worker_simulator.run_simulation(map_data, mode)
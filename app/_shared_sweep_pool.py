@@ -0,0 +1,132 @@
+import os
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from app._player_simulator import PlayerSimulator
+from app._data_cor import DataDev
+from app.misc._shared_array import SharedArray
+
+
+class SharedSweepPool():
+    """
+    Process pool that simulates a batch of same-length patterns for `Sweep`.
+
+    The patterns, the `DataDev` output and a per-pattern stats buffer live in shared
+    memory. Workers attach to them once when they start; after that a task is just a
+    (start, end) row range, and workers read their patterns and write their results in
+    place. Nothing but the row range and a completion signal passes through the pool's
+    pipes, so short patterns are limited by simulation time rather than pickling.
+    """
+
+    # Per-pattern stats written by the workers
+    COL_WORKER   = 0  # Worker pid
+    COL_T_START  = 1  # Wall time the simulation started (s since epoch)
+    COL_T_END    = 2  # Wall time the simulation ended (s since epoch)
+    COL_TICKS    = 3  # Number of simulation ticks
+    COL_ACCURACY = 4  # `HitJudge` accuracy, if od was given
+    COL_TAP_DEV  = 5  # `HitJudge` tap deviation (ms), if od was given
+    NUM_COLS     = 6
+
+    def __init__(self, player_data, n_workers, od=None, chunk_size=None):
+        self.player_data = player_data
+        self.n_workers   = n_workers
+        self.od          = od
+
+        # Patterns per task; by default each worker gets about 8 tasks
+        self.chunk_size = chunk_size
+
+
+    def run(self, map_batch, dev_data, seeds=None):
+        """
+        Simulates each pattern of `map_batch` (n_patterns, n_notes, 3), yielding
+        (start, results) as each chunk of rows finishes. `dev_data` rows of a finished
+        chunk have their deviation filled in; `results` are the result dicts of
+        `Sweep.run_pattern` for rows start, start + 1, ...
+
+        Row i is simulated with `seeds[i]`, so results don't depend on how rows are
+        chunked or which worker runs them. Fresh seeds are drawn if none are given.
+        """
+        n_patterns = map_batch.shape[0]
+        if n_patterns == 0:
+            return
+
+        if seeds is None:
+            seeds = np.random.SeedSequence().generate_state(n_patterns)
+
+        chunk_size = self.chunk_size or max(1, n_patterns//(8*self.n_workers))
+
+        with SharedArray.from_array(np.ascontiguousarray(map_batch, dtype=float)) as maps, \
+             SharedArray.from_array(np.ascontiguousarray(dev_data, dtype=float)) as devs, \
+             SharedArray.create((n_patterns, SharedSweepPool.NUM_COLS)) as stats:
+
+            stats.array[...] = np.nan
+            initargs = (self.player_data, self.od, seeds, maps.spec(), devs.spec(), stats.spec())
+
+            with ProcessPoolExecutor(self.n_workers, initializer=_init_worker, initargs=initargs) as pool:
+                futures = [ pool.submit(_run_chunk, start, min(start + chunk_size, n_patterns)) for start in range(0, n_patterns, chunk_size) ]
+
+                for future in as_completed(futures):
+                    start, end = future.result()
+                    dev_data[start:end, DataDev.COL_DEV] = devs.array[start:end, DataDev.COL_DEV]
+
+                    yield start, [ self.__result(devs.array[i], stats.array[i]) for i in range(start, end) ]
+
+
+    def __result(self, dev_row, stats_row):
+        result = {
+            'dev'     : dev_row[DataDev.COL_DEV],
+            'ticks'   : int(stats_row[SharedSweepPool.COL_TICKS]),
+            'worker'  : int(stats_row[SharedSweepPool.COL_WORKER]),
+            't_start' : stats_row[SharedSweepPool.COL_T_START],
+            't_end'   : stats_row[SharedSweepPool.COL_T_END],
+        }
+
+        if self.od is not None:
+            result['accuracy'] = stats_row[SharedSweepPool.COL_ACCURACY]
+            result['tap_dev']  = stats_row[SharedSweepPool.COL_TAP_DEV]
+
+        return result
+
+
+# Per-process state of pool workers, set up once by the pool initializer
+_worker = None
+
+
+def _init_worker(player_data, od, seeds, maps_spec, devs_spec, stats_spec):
+    global _worker
+
+    # Imported here since `_sweep` imports this module
+    from app._sweep import Sweep
+
+    _worker = {
+        'run_pattern' : Sweep.run_pattern,
+        'simulator'   : PlayerSimulator(player_data),
+        'od'          : od,
+        'seeds'       : seeds,
+        'maps'        : SharedArray.attach(maps_spec),
+        'devs'        : SharedArray.attach(devs_spec),
+        'stats'       : SharedArray.attach(stats_spec),
+    }
+
+
+def _run_chunk(start, end):
+    maps  = _worker['maps'].array
+    devs  = _worker['devs'].array
+    stats = _worker['stats'].array
+
+    for i in range(start, end):
+        result = _worker['run_pattern'](_worker['simulator'], maps[i], _worker['od'], _worker['seeds'][i])
+
+        devs[i, DataDev.COL_DEV] = result['dev']
+
+        stats[i, SharedSweepPool.COL_WORKER]  = os.getpid()
+        stats[i, SharedSweepPool.COL_T_START] = result['t_start']
+        stats[i, SharedSweepPool.COL_T_END]   = result['t_end']
+        stats[i, SharedSweepPool.COL_TICKS]   = result['ticks']
+
+        if 'accuracy' in result:
+            stats[i, SharedSweepPool.COL_ACCURACY] = result['accuracy']
+            stats[i, SharedSweepPool.COL_TAP_DEV]  = result['tap_dev']
+
+    return start, end
@@ -0,0 +1,407 @@
+import math
+import json
+import asyncio
+import collections
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+
+from app._data_cor import DataPlayer, DataPop
+from app._population_simulator import PopulationSimulator
+from app.misc._osu_utils import OsuUtils
+
+
+class SimService():
+    """
+    Local simulation server.
+
+    Clients send requests for the aim deviation of one player on one stream pattern.
+    Requests are coalesced: those for the same pattern (cs, bpm, px, angle, n_points)
+    that arrive within `batch_window` seconds of each other, or while every worker is
+    busy, are simulated together as one `PopulationSimulator` batch on a worker process,
+    each player with its own seed.
+    Every request is seeded (seed 0 if not given), so results are deterministic and
+    identical requests are answered from an LRU cache, or share the simulation already
+    running for them.
+
+    Protocol is newline-delimited JSON over a Unix socket (`address` is a path) or TCP
+    (`address` is a (host, port) tuple). Request:
+        { "id": 1, "cs": 4, "bpm": 180, "px": 100, "angle": 90, "n_points": 15, "seed": 0,
+          "player": { "hit_dev": 10, "avg_read_time": 100, "dev_read_time": 10, "player_vel_dev": 0 } }
+    Response:
+        { "id": 1, "dev": ..., "dev_x": ..., "dev_y": ..., "misses": ..., "cached": false }
+    or { "id": 1, "error": "..." } if the request is malformed or out of `RANGES`.
+    If a batch fails, its requests are retried one by one, so only the ones that
+    fail on their own get an error.
+    """
+
+    # Pattern fields of a request and their defaults (None = required)
+    PATTERN_FIELDS = { 'cs' : None, 'bpm' : None, 'px' : None, 'angle' : None, 'n_points' : 15 }
+
+    # Accepted (min, max) of request and player fields. Simulation time grows with
+    # n_points and hit_dev, so these keep one request from tying up a worker
+    RANGES = {
+        'cs'             : (0, 10),
+        'bpm'            : (1, 1000),
+        'px'             : (0, 1000),
+        'n_points'       : (3, 1000),
+        'hit_dev'        : (0, 200),
+        'avg_read_time'  : (0, 1000),
+        'dev_read_time'  : (0, 500),
+        'player_vel_dev' : (0, 10),
+    }
+
+    def __init__(self, n_workers=1, batch_window=0.005, max_batch=512, cache_size=65536):
+        self.n_workers    = n_workers
+        self.batch_window = batch_window
+        self.max_batch    = max_batch
+        self.cache_size   = cache_size
+
+        self.__pool    = None
+        self.__server  = None
+        self.__cache   = collections.OrderedDict()
+        self.__running = {}     # key -> future of a request being simulated
+        self.__queue   = []     # (key, request, future) waiting for the next batch
+        self.__flush   = None   # Timer handle of the pending batch flush
+
+        self.__n_batches = 0    # Batches running on the pool
+
+        self.__stats = { 'requests' : 0, 'cache_hits' : 0, 'coalesced' : 0, 'batches' : 0, 'simulated' : 0 }
+
+
+    async def start(self, address):
+        self.__pool = ProcessPoolExecutor(self.n_workers)
+
+        if isinstance(address, str):
+            self.__server = await asyncio.start_unix_server(self.__handle_client, path=address)
+        else:
+            self.__server = await asyncio.start_server(self.__handle_client, *address)
+
+        return self.__server
+
+
+    async def serve(self, address):
+        """
+        Runs the service until cancelled.
+        """
+        await self.start(address)
+
+        try:
+            async with self.__server:
+                await self.__server.serve_forever()
+        finally:
+            self.close()
+
+
+    def close(self):
+        if self.__server is not None:
+            self.__server.close()
+            self.__server = None
+
+        if self.__pool is not None:
+            self.__pool.shutdown()
+            self.__pool = None
+
+
+    def stats(self):
+        return dict(self.__stats)
+
+
+    async def simulate(self, request):
+        """
+        Answers one request dict. Used by client connections; can also be awaited
+        directly from the service's event loop.
+        """
+        key, request = SimService.__parse(request)
+        self.__stats['requests'] += 1
+
+        if key in self.__cache:
+            self.__cache.move_to_end(key)
+            self.__stats['cache_hits'] += 1
+            return dict(self.__cache[key], cached=True)
+
+        if key in self.__running:
+            self.__stats['coalesced'] += 1
+            return dict(await asyncio.shield(self.__running[key]), cached=False)
+
+        future = asyncio.get_running_loop().create_future()
+        self.__running[key] = future
+        self.__queue.append((key, request, future))
+
+        if len(self.__queue) >= self.max_batch:
+            self.__flush_queue()
+        elif self.__flush is None:
+            self.__flush = asyncio.get_running_loop().call_later(self.batch_window, self.__flush_queue)
+
+        return dict(await asyncio.shield(future), cached=False)
+
+
+    async def __handle_client(self, reader, writer):
+        tasks = set()
+
+        async def respond(line):
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                request  = {}
+                response = { 'error' : f'Invalid JSON: {e}' }
+            else:
+                try:
+                    response = await self.simulate(request)
+                except (AttributeError, KeyError, TypeError, ValueError) as e:
+                    response = { 'error' : f'Invalid request: {e!r}' }
+                except Exception as e:
+                    response = { 'error' : f'Simulation failed: {e!r}' }
+
+            response['id'] = request.get('id') if isinstance(request, dict) else None
+            writer.write((json.dumps(response) + '\n').encode())
+
+        try:
+            # Requests on one connection are answered as they finish, not in order
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                task = asyncio.create_task(respond(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+    def __flush_queue(self):
+        if self.__flush is not None:
+            self.__flush.cancel()
+            self.__flush = None
+
+        # Batches are only started when a worker is free, so requests arriving while the
+        # pool is busy pile up into larger batches instead of queueing behind it
+        while len(self.__queue) > 0 and self.__n_batches < self.n_workers:
+            pattern = SimService.__pattern_key(self.__queue[0][0])
+
+            # Oldest pattern first, along with every other queued request for it
+            entries = [ entry for entry in self.__queue if SimService.__pattern_key(entry[0]) == pattern ][:self.max_batch]
+            taken   = set(id(entry) for entry in entries)
+            self.__queue = [ entry for entry in self.__queue if id(entry) not in taken ]
+
+            self.__n_batches += 1
+            asyncio.ensure_future(self.__run_batch(pattern, entries))
+
+
+    async def __run_batch(self, pattern, entries):
+        self.__stats['batches']   += 1
+        self.__stats['simulated'] += len(entries)
+
+        players = np.array([ [ request['player'][key] for key in DataPlayer.KEYS ] for _, request, _ in entries ], dtype=float)
+        seeds   = np.array([ request['seed'] for _, request, _ in entries ], dtype=np.int64)
+
+        loop = asyncio.get_running_loop()
+
+        try:
+            try:
+                results = await loop.run_in_executor(self.__pool, simulate_batch, *pattern, players, seeds)
+            except Exception:
+                if len(entries) == 1:
+                    raise
+
+                # Players are seeded individually, so simulating them one by one gives
+                # the same results, and a failure only affects the request that caused it
+                for i, entry in enumerate(entries):
+                    try:
+                        results = await loop.run_in_executor(self.__pool, simulate_batch, *pattern, players[i:i + 1], seeds[i:i + 1])
+                    except Exception as e:
+                        self.__set_exception(entry, e)
+                    else:
+                        self.__set_result(entry, results[0])
+            else:
+                for entry, row in zip(entries, results):
+                    self.__set_result(entry, row)
+        except Exception as e:
+            for entry in entries:
+                self.__set_exception(entry, e)
+        finally:
+            self.__n_batches -= 1
+            self.__flush_queue()
+
+
+    def __set_result(self, entry, row):
+        key, _, future = entry
+
+        result = {
+            'dev'    : SimService.__to_json(row[DataPop.COL_DEV]),
+            'dev_x'  : SimService.__to_json(row[DataPop.COL_DEV_X]),
+            'dev_y'  : SimService.__to_json(row[DataPop.COL_DEV_Y]),
+            'misses' : int(row[DataPop.COL_MISSES]),
+        }
+
+        self.__cache[key] = result
+        if len(self.__cache) > self.cache_size:
+            self.__cache.popitem(last=False)
+
+        self.__running.pop(key, None)
+        future.set_result(result)
+
+
+    def __set_exception(self, entry, e):
+        key, _, future = entry
+
+        self.__running.pop(key, None)
+        if not future.done():
+            future.set_exception(e)
+
+
+    @staticmethod
+    def __pattern_key(key):
+        return key[:len(SimService.PATTERN_FIELDS)]
+
+
+    @staticmethod
+    def __parse(request):
+        parsed = {}
+
+        for field, default in SimService.PATTERN_FIELDS.items():
+            value = request.get(field, default)
+            if value is None:
+                raise KeyError(field)
+
+            parsed[field] = SimService.__check(field, float(value))
+
+        parsed['n_points'] = int(parsed['n_points'])
+
+        parsed['player'] = { key : SimService.__check(key, float(request['player'][key])) for key in DataPlayer.KEYS }
+        parsed['seed']   = int(request.get('seed', 0))
+
+        if parsed['seed'] < 0:
+            raise ValueError('seed must be non-negative')
+
+        key = tuple(parsed[field] for field in SimService.PATTERN_FIELDS) + tuple(parsed['player'].values()) + (parsed['seed'],)
+        return key, parsed
+
+
+    @staticmethod
+    def __check(field, value):
+        if not math.isfinite(value):
+            raise ValueError(f'{field} must be finite')
+
+        if field in SimService.RANGES:
+            low, high = SimService.RANGES[field]
+            if not (low <= value <= high):
+                raise ValueError(f'{field} must be within [{low}, {high}]')
+
+        return value
+
+
+    @staticmethod
+    def __to_json(value):
+        # nan/inf aren't valid JSON
+        return float(value) if math.isfinite(value) else None
+
+
+class SimClient():
+    """
+    Client for `SimService`. Many requests can be in flight on one connection at once.
+
+        client = await SimClient.connect('/tmp/osu_sim.sock')
+        result = await client.simulate(cs=4, bpm=180, px=100, angle=90, player={ ... })
+    """
+
+    def __init__(self, reader, writer):
+        self.__reader  = reader
+        self.__writer  = writer
+        self.__next_id = 0
+        self.__waiting = {}
+        self.__task    = asyncio.ensure_future(self.__read_responses())
+
+
+    @staticmethod
+    async def connect(address):
+        if isinstance(address, str):
+            reader, writer = await asyncio.open_unix_connection(address)
+        else:
+            reader, writer = await asyncio.open_connection(*address)
+
+        return SimClient(reader, writer)
+
+
+    async def simulate(self, **request):
+        """
+        Sends one request and waits for its response. Raises ValueError if the service
+        rejected it.
+        """
+        request_id = self.__next_id
+        self.__next_id += 1
+
+        future = asyncio.get_running_loop().create_future()
+        self.__waiting[request_id] = future
+
+        request['id'] = request_id
+        self.__writer.write((json.dumps(request) + '\n').encode())
+        await self.__writer.drain()
+
+        response = await future
+        if 'error' in response:
+            raise ValueError(response['error'])
+
+        return response
+
+
+    async def close(self):
+        self.__writer.close()
+        await self.__writer.wait_closed()
+        self.__task.cancel()
+
+
+    async def __read_responses(self):
+        while True:
+            line = await self.__reader.readline()
+            if not line:
+                break
+
+            response = json.loads(line)
+            future = self.__waiting.pop(response.get('id'), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+
+        for future in self.__waiting.values():
+            if not future.done():
+                future.set_exception(ConnectionError('Simulation service closed the connection'))
+
+
+def simulate_batch(cs, bpm, px, angle, n_points, players, seeds):
+    map_data = OsuUtils.generate_pattern(
+        initial_angle = 0,
+        distance      = px,
+        time          = 60/bpm,
+        angle         = angle*math.pi/180,
+        n_points      = n_points,
+        n_repeats     = 1
+    )
+
+    simulator   = PopulationSimulator(cs)
+    replay_data = simulator.run_simulation(map_data, players, seeds=seeds)
+
+    return PopulationSimulator.summarize(map_data, replay_data, players)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Local simulation service')
+    parser.add_argument('--socket', default=None, help='Unix socket path to listen on')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    address = args.socket if args.socket is not None else (args.host, args.port)
+
+    try:
+        asyncio.run(SimService(n_workers=args.workers).serve(address))
+    except KeyboardInterrupt:
+        pass
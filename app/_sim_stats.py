@@ -0,0 +1,56 @@
+class SimStats():
+    """
+    Per-phase counters and timers collected by `PlayerSimulator.run_simulation(..., profile=True)`.
+
+    Timers are in seconds of wall time. Stats from several runs can be summed with `+`.
+    """
+
+    COUNTERS = [ 'ticks', 'read_events', 'scan_iters', 'hits', 'misses', 'frames' ]
+    TIMERS   = [ 'time_read', 'time_aim', 'time_tap', 'time_record', 'time_total' ]
+
+    def __init__(self):
+        # Number of simulation steps processed
+        self.ticks = 0
+
+        # Number of times the player processed visual information
+        self.read_events = 0
+
+        # Iterations of the note-scan loop run during read events
+        self.scan_iters = 0
+
+        # Number of taps, and how many of those were >100 ms late
+        self.hits   = 0
+        self.misses = 0
+
+        # Number of rows written to the replay data
+        self.frames = 0
+
+        # Time spent in the read, aim, tap and replay recording phases, and overall
+        self.time_read   = 0.0
+        self.time_aim    = 0.0
+        self.time_tap    = 0.0
+        self.time_record = 0.0
+        self.time_total  = 0.0
+
+
+    def __add__(self, other):
+        stats = SimStats()
+        for name in SimStats.COUNTERS + SimStats.TIMERS:
+            setattr(stats, name, getattr(self, name) + getattr(other, name))
+
+        return stats
+
+
+    def as_dict(self):
+        return { name : getattr(self, name) for name in SimStats.COUNTERS + SimStats.TIMERS }
+
+
+    def __str__(self):
+        lines = [ f'{name:>12}: {getattr(self, name)}' for name in SimStats.COUNTERS ]
+
+        for name in SimStats.TIMERS:
+            secs = getattr(self, name)
+            frac = secs/self.time_total if self.time_total > 0 else 0
+            lines.append(f'{name:>12}: {secs*1000:.3f} ms ({100*frac:.1f}%)')
+
+        return '\n'.join(lines)
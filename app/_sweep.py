@@ -0,0 +1,180 @@
+import os
+import math
+import time
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from app._player_simulator import PlayerSimulator
+from app._data_cor import DataDev
+from app._data_proc import DataProc
+from app._hit_judge import HitJudge
+from app._shared_sweep_pool import SharedSweepPool
+from app.misc._osu_utils import OsuUtils
+
+
+class Sweep():
+    """
+    Sweep of pattern bpm, distance and angle for one set of player parameters.
+
+    Results are collected into `dev_data` (`DataDev` layout). Rows of points that
+    haven't finished yet have a nan deviation; `done` marks finished rows.
+
+    If `od` is given each point is also judged with `HitJudge`, and its accuracy and
+    tap deviation (ms) are collected into `accuracy` and `tap_dev`.
+
+    Each point's simulation is seeded from `seed`, so results don't depend on which
+    worker runs a point, and a sweep given the same `seed` gives the same results.
+    """
+
+    def __init__(self, player_data, note_bpms, note_dists, note_angles, n_points=15, od=None, seed=None):
+        self.player_data = player_data
+        self.n_points    = n_points
+        self.od          = od
+
+        self.points = [
+            (note_bpm, note_dist, note_angle)
+            for note_bpm in note_bpms
+            for note_dist in note_dists
+            for note_angle in note_angles
+        ]
+
+        self.dev_data = np.zeros((len(self.points), DataDev.NUM_COLS))
+        self.dev_data[:, DataDev.COL_DEV]   = np.nan
+        self.dev_data[:, DataDev.COL_BPM]   = [ point[0] for point in self.points ]
+        self.dev_data[:, DataDev.COL_PX]    = [ point[1] for point in self.points ]
+        self.dev_data[:, DataDev.COL_ANGLE] = [ point[2] for point in self.points ]
+
+        self.done = np.zeros(len(self.points), dtype=bool)
+
+        self.accuracy = np.full(len(self.points), np.nan)
+        self.tap_dev  = np.full(len(self.points), np.nan)
+
+        # Per point seeds; workers forked from one process would otherwise all draw the same noise
+        self.seeds = np.random.SeedSequence(seed).generate_state(len(self.points))
+
+
+    def run(self, n_workers=1, telemetry=None, shared=True):
+        """
+        Runs the sweep, yielding the row index of each point as it finishes.
+
+        With `n_workers` > 1 points are spread over a process pool and finish out
+        of order. `telemetry` is an optional `SweepTelemetry` to report progress to.
+        By default the pool is a `SharedSweepPool`, which hands patterns to workers and
+        results back through shared memory; `shared=False` pickles each point and
+        result instead.
+        """
+        if n_workers <= 1:
+            simulator = PlayerSimulator(self.player_data)
+
+            for i, point in enumerate(self.points):
+                self.__record(i, Sweep.run_point(simulator, point, self.n_points, self.od, self.seeds[i]), telemetry)
+                yield i
+
+            return
+
+        if shared:
+            map_batch = np.array([ Sweep.generate_pattern(point, self.n_points) for point in self.points ])
+
+            pool = SharedSweepPool(self.player_data, n_workers, self.od)
+
+            for start, results in pool.run(map_batch, self.dev_data, self.seeds):
+                for i, result in enumerate(results, start):
+                    self.__record(i, result, telemetry)
+                    yield i
+
+            return
+
+        with ProcessPoolExecutor(n_workers, initializer=_init_worker, initargs=(self.player_data,)) as pool:
+            futures = { pool.submit(_run_worker_point, point, self.n_points, self.od, self.seeds[i]) : i for i, point in enumerate(self.points) }
+
+            for future in as_completed(futures):
+                i = futures[future]
+                self.__record(i, future.result(), telemetry)
+                yield i
+
+
+    @staticmethod
+    def generate_pattern(point, n_points=15):
+        note_bpm, note_dist, note_angle = point
+
+        # Generate stream pattern
+        return OsuUtils.generate_pattern(
+            initial_angle = 0,
+            distance      = note_dist,
+            time          = 60/note_bpm, 
+            angle         = note_angle * math.pi/180, 
+            n_points      = n_points,
+            n_repeats     = 1
+        )
+
+
+    @staticmethod
+    def run_point(simulator, point, n_points=15, od=None, seed=None):
+        t_start = time.time()
+
+        result = Sweep.run_pattern(simulator, Sweep.generate_pattern(point, n_points), od, seed)
+        result['t_start'] = t_start
+
+        return result
+
+
+    @staticmethod
+    def run_pattern(simulator, map_data, od=None, seed=None):
+        t_start = time.time()
+
+        if seed is not None:
+            np.random.seed(seed)
+
+        replay_data = simulator.run_simulation(map_data)
+        aim_x_offsets, aim_y_offsets = DataProc.process_data(map_data, replay_data)
+        
+        dev_x = np.std(aim_x_offsets)
+        dev_y = np.std(aim_y_offsets)
+
+        result = {
+            'dev'     : math.sqrt(dev_x**2 + dev_y**2),
+            'ticks'   : len(simulator.get_sim_timing_steps(map_data)),
+            'worker'  : os.getpid(),
+        }
+
+        if od is not None:
+            score = HitJudge.score(map_data, replay_data, simulator.cs, od)
+            result['accuracy'] = score['accuracy']
+            result['tap_dev']  = score['tap_dev']
+
+        result['t_start'] = t_start
+        result['t_end']   = time.time()
+
+        return result
+
+
+    def __record(self, i, result, telemetry):
+        self.dev_data[i, DataDev.COL_DEV] = result['dev']
+        self.done[i] = True
+
+        if 'accuracy' in result:
+            self.accuracy[i] = result['accuracy']
+            self.tap_dev[i]  = result['tap_dev']
+
+        if telemetry is None:
+            return
+
+        note_bpm, note_dist, note_angle = self.points[i]
+        telemetry.record(
+            { 'bpm' : note_bpm, 'dist' : note_dist, 'angle' : note_angle },
+            result['worker'], result['t_start'], result['t_end'], result['ticks']
+        )
+
+
+# Per-process simulator used by pool workers, created once by the pool initializer
+_worker_simulator = None
+
+
+def _init_worker(player_data):
+    global _worker_simulator
+    _worker_simulator = PlayerSimulator(player_data)
+
+
+def _run_worker_point(point, n_points, od, seed):
+    return Sweep.run_point(_worker_simulator, point, n_points, od, seed)
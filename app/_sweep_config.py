@@ -0,0 +1,147 @@
+import json
+import numpy as np
+
+from app._data_cor import DataPlayer
+
+
+class SweepConfig():
+    """
+    Declarative description of an N-D parameter sweep.
+
+    Every simulation parameter is either an axis, swept over a list of values, or
+    fixed. Axes are swept in the order given, the last one varying fastest. As a
+    dict (or JSON file):
+
+        {
+            'axes' : {
+                'hit_dev' : [ 5, 10, 20 ],
+                'bpm'     : { 'start' : 60, 'stop' : 600, 'step' : 10 },
+                'dist'    : { 'start' : 40, 'stop' : 500, 'num' : 47 },
+                'angle'   : [ 0, 90, 180 ]
+            },
+            'fixed'    : { 'cs' : 6, 'avg_read_time' : 1, 'dev_read_time' : 0, 'player_vel_dev' : 0 },
+            'n_points' : 15,
+            'chunks'   : { 'bpm' : 16 },
+            'seed'     : 1234
+        }
+
+    Axis values are a list, a { start, stop, step } range (stop excluded) or a
+    { start, stop, num } evenly spaced range (stop included). 'chunks' optionally sets
+    the `ResultCube` chunk length of some axes. Each point is simulated with its own
+    seed derived from 'seed', which is drawn and kept in the config if not given, so a
+    sweep can be reproduced from its config.
+    """
+
+    # Pattern parameters; `od` is optional and enables hit judgement
+    MAP_PARAMS = [ 'bpm', 'dist', 'angle', 'od' ]
+
+    # `PlayerSimulator` parameters
+    PLAYER_PARAMS = [ 'cs' ] + DataPlayer.KEYS
+
+    REQUIRED = [ 'bpm', 'dist', 'angle' ] + PLAYER_PARAMS
+
+    def __init__(self, axes, fixed=None, n_points=15, chunks=None, seed=None):
+        self.axes     = { name : SweepConfig.__axis_values(name, values) for name, values in axes.items() }
+        self.fixed    = dict(fixed or {})
+        self.n_points = n_points
+        self.chunks   = dict(chunks or {})
+        self.seed     = int(np.random.SeedSequence().entropy) if seed is None else int(seed)
+
+        known = SweepConfig.MAP_PARAMS + SweepConfig.PLAYER_PARAMS
+        for name in list(self.axes) + list(self.fixed):
+            if name not in known:
+                raise ValueError(f'Unknown sweep parameter: {name}, expected one of {known}')
+
+        for name in self.axes:
+            if name in self.fixed:
+                raise ValueError(f'{name} is both an axis and fixed')
+
+        for name in SweepConfig.REQUIRED:
+            if name not in self.axes and name not in self.fixed:
+                raise ValueError(f'{name} has to be either an axis or fixed')
+
+        for name in self.chunks:
+            if name not in self.axes:
+                raise ValueError(f'Chunk length given for {name}, which is not an axis')
+
+        self.names = list(self.axes)
+        self.shape = tuple(len(self.axes[name]) for name in self.names)
+
+
+    @staticmethod
+    def from_dict(config):
+        return SweepConfig(config['axes'], config.get('fixed'), config.get('n_points', 15), config.get('chunks'), config.get('seed'))
+
+
+    @staticmethod
+    def load(path):
+        with open(path, 'r') as f:
+            return SweepConfig.from_dict(json.load(f))
+
+
+    def to_dict(self):
+        return {
+            'axes'     : { name : values.tolist() for name, values in self.axes.items() },
+            'fixed'    : self.fixed,
+            'n_points' : self.n_points,
+            'chunks'   : self.chunks,
+            'seed'     : self.seed,
+        }
+
+
+    def size(self):
+        return int(np.prod(self.shape))
+
+
+    def judged(self):
+        # Whether points get hit judgement, which needs an od
+        return 'od' in self.axes or 'od' in self.fixed
+
+
+    def index(self, i):
+        # Axis positions of the flat point index `i`
+        return np.unravel_index(i, self.shape)
+
+
+    def point_seed(self, i):
+        # Seed of the flat point index `i`, independent of which worker runs it
+        return np.random.SeedSequence([ self.seed, i ]).generate_state(1)[0]
+
+
+    def params(self, i):
+        """
+        All parameters of the flat point index `i`, as { name : value }.
+        """
+        params = dict(self.fixed)
+        for name, pos in zip(self.names, self.index(i)):
+            params[name] = self.axes[name][pos].item()
+
+        return params
+
+
+    @staticmethod
+    def player_data(params):
+        return { name : params[name] for name in SweepConfig.PLAYER_PARAMS }
+
+
+    @staticmethod
+    def point(params):
+        # (bpm, dist, angle) as taken by `Sweep.generate_pattern`
+        return (params['bpm'], params['dist'], params['angle'])
+
+
+    @staticmethod
+    def __axis_values(name, values):
+        if isinstance(values, dict):
+            if 'step' in values:
+                values = np.arange(values['start'], values['stop'], values['step'])
+            elif 'num' in values:
+                values = np.linspace(values['start'], values['stop'], values['num'])
+            else:
+                raise ValueError(f'Range of axis {name} needs either a step or a num')
+
+        values = np.asarray(values, dtype=float)
+        if values.ndim != 1 or values.shape[0] == 0:
+            raise ValueError(f'Axis {name} needs at least one value')
+
+        return values
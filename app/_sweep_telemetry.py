@@ -0,0 +1,126 @@
+import json
+import time
+import heapq
+
+
+class SweepTelemetry():
+    """
+    Progress telemetry for parameter sweeps.
+
+    Every finished point is appended to `path` as a JSON line of type "point", and
+    a "progress" line with throughput, ETA, per-worker utilization and the slowest
+    points so far is appended at most every `progress_interval` seconds. A final
+    "summary" line is written by `close()`.
+    """
+
+    def __init__(self, total, path=None, progress_interval=1.0, n_slowest=10):
+        self.total = total
+        self.done  = 0
+        self.ticks = 0
+
+        self.__n_slowest = n_slowest
+        self.__slowest   = []  # min-heap of (wall, seq, point)
+        self.__workers   = {}
+
+        self.__progress_interval = progress_interval
+        self.__last_progress     = 0
+
+        self.__time_start = time.time()
+        self.__file = open(path, 'a') if path is not None else None
+
+
+    def record(self, point, worker, t_start, t_end, ticks):
+        """
+        Record a finished point.
+
+        `point` is a dict of the point's parameters, `worker` identifies who ran it,
+        `t_start`/`t_end` are `time.time()` wall clock timestamps and `ticks` is the
+        number of simulation ticks it took.
+        """
+        wall = t_end - t_start
+
+        self.done  += 1
+        self.ticks += ticks
+
+        stats = self.__workers.setdefault(str(worker), { 'points' : 0, 'busy_s' : 0.0, 'ticks' : 0 })
+        stats['points'] += 1
+        stats['busy_s'] += wall
+        stats['ticks']  += ticks
+
+        entry = (wall, self.done, point)
+        if len(self.__slowest) < self.__n_slowest:
+            heapq.heappush(self.__slowest, entry)
+        elif wall > self.__slowest[0][0]:
+            heapq.heapreplace(self.__slowest, entry)
+
+        self.__write({ 'type' : 'point', 'point' : point, 'worker' : str(worker), 'wall_s' : wall, 'ticks' : ticks, 't_end' : t_end })
+
+        now = time.time()
+        if now - self.__last_progress >= self.__progress_interval or self.done == self.total:
+            self.__last_progress = now
+            self.__write(dict(type='progress', **self.summary()))
+
+
+    def summary(self):
+        elapsed = max(time.time() - self.__time_start, 1e-9)
+
+        points_per_s = self.done/elapsed
+        remaining    = self.total - self.done
+        eta_s        = remaining/points_per_s if points_per_s > 0 else None
+
+        workers = {
+            worker : {
+                'points'      : stats['points'],
+                'ticks'       : stats['ticks'],
+                'busy_s'      : stats['busy_s'],
+                'utilization' : stats['busy_s']/elapsed,
+            }
+            for worker, stats in self.__workers.items()
+        }
+
+        slowest = [ { 'point' : point, 'wall_s' : wall } for wall, _, point in sorted(self.__slowest, key=lambda entry: -entry[0]) ]
+
+        return {
+            'done'         : self.done,
+            'total'        : self.total,
+            'elapsed_s'    : elapsed,
+            'points_per_s' : points_per_s,
+            'ticks_per_s'  : self.ticks/elapsed,
+            'eta_s'        : eta_s,
+            'workers'      : workers,
+            'slowest'      : slowest,
+        }
+
+
+    def status_text(self):
+        summary = self.summary()
+
+        eta = summary['eta_s']
+        eta = '-' if eta is None else time.strftime('%H:%M:%S', time.gmtime(eta))
+
+        utilization = [ stats['utilization'] for stats in summary['workers'].values() ]
+        utilization = sum(utilization)/len(utilization) if len(utilization) > 0 else 0
+
+        return (
+            f'{summary["done"]}/{summary["total"]} points  '
+            f'{summary["points_per_s"]:.1f} pts/s  '
+            f'{summary["ticks_per_s"]/1000:.0f}k ticks/s  '
+            f'{len(summary["workers"])} workers @ {100*utilization:.0f}%  '
+            f'ETA {eta}'
+        )
+
+
+    def close(self):
+        self.__write(dict(type='summary', **self.summary()))
+
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+
+    def __write(self, data):
+        if self.__file is None:
+            return
+
+        self.__file.write(json.dumps(data) + '\n')
+        self.__file.flush()
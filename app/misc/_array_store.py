@@ -0,0 +1,131 @@
+import os
+import json
+import numpy as np
+
+
+class ArrayStore():
+    """
+    Read side of a flat binary store of many 2D arrays with the same number of columns.
+
+    All rows live back to back in one raw file that is memory-mapped on open, with an
+    offset index saying where each array starts. Indexing returns a view into the map,
+    so opening and slicing arrays doesn't copy or parse anything.
+
+    Layout of a store directory:
+        data.bin     rows of every array, back to back
+        offsets.npy  (n_arrays + 1) int64 row offsets
+        index.json   dtype, number of columns, array names and per-array metadata
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(os.path.join(path, 'index.json'), 'r') as f:
+            index = json.load(f)
+
+        self.dtype  = np.dtype(index['dtype'])
+        self.n_cols = index['n_cols']
+        self.names  = index['names']
+        self.metas  = index['metas']
+
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'))
+        n_rows = int(self.offsets[-1])
+
+        if n_rows == 0:
+            self.data = np.zeros((0, self.n_cols), dtype=self.dtype)
+        else:
+            self.data = np.memmap(os.path.join(path, 'data.bin'), dtype=self.dtype, mode='r', shape=(n_rows, self.n_cols))
+
+        self.__name_idxs = { name : i for i, name in enumerate(self.names) }
+
+
+    def __len__(self):
+        return len(self.names)
+
+
+    def __getitem__(self, idx):
+        if isinstance(idx, str):
+            idx = self.__name_idxs[idx]
+
+        return self.data[self.offsets[idx]:self.offsets[idx + 1]]
+
+
+    def index_of(self, name):
+        return self.__name_idxs[name]
+
+
+    def meta(self, idx):
+        if isinstance(idx, str):
+            idx = self.__name_idxs[idx]
+
+        return self.metas[idx]
+
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+
+    @staticmethod
+    def write(path, arrays, names, metas=None, dtype=np.float64):
+        with ArrayStoreWriter(path, arrays[0].shape[1] if len(arrays) > 0 else 0, dtype) as writer:
+            for i, (name, array) in enumerate(zip(names, arrays)):
+                writer.append(name, array, None if metas is None else metas[i])
+
+        return ArrayStore(path)
+
+
+class ArrayStoreWriter():
+    """
+    Appends arrays to a new `ArrayStore` directory. Use as a context manager, or call
+    `close()` to write the index once done.
+    """
+
+    def __init__(self, path, n_cols, dtype=np.float64):
+        os.makedirs(path, exist_ok=True)
+
+        self.path   = path
+        self.n_cols = n_cols
+        self.dtype  = np.dtype(dtype)
+
+        self.__file    = open(os.path.join(path, 'data.bin'), 'wb')
+        self.__offsets = [ 0 ]
+        self.__names   = []
+        self.__metas   = []
+
+
+    def append(self, name, array, meta=None):
+        array = np.ascontiguousarray(array, dtype=self.dtype)
+        if array.ndim != 2 or array.shape[1] != self.n_cols:
+            raise ValueError(f'Expected array of shape (n, {self.n_cols}), got {array.shape}')
+
+        self.__file.write(array.tobytes())
+
+        self.__offsets.append(self.__offsets[-1] + array.shape[0])
+        self.__names.append(name)
+        self.__metas.append(meta)
+
+
+    def close(self):
+        if self.__file is None:
+            return
+
+        self.__file.close()
+        self.__file = None
+
+        np.save(os.path.join(self.path, 'offsets.npy'), np.array(self.__offsets, dtype=np.int64))
+
+        with open(os.path.join(self.path, 'index.json'), 'w') as f:
+            json.dump({
+                'dtype'  : self.dtype.str,
+                'n_cols' : self.n_cols,
+                'names'  : self.__names,
+                'metas'  : self.__metas,
+            }, f)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
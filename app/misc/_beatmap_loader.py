@@ -0,0 +1,150 @@
+import os
+import hashlib
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+
+from app._data_cor import DataOsu
+from app.misc._array_store import ArrayStore, ArrayStoreWriter
+
+
+class BeatmapLoader():
+
+    # Hit object type bits
+    TYPE_CIRCLE  = 1 << 0
+    TYPE_SLIDER  = 1 << 1
+    TYPE_SPINNER = 1 << 3
+
+    # [Difficulty] entries kept as metadata
+    DIFFICULTY_KEYS = {
+        'CircleSize'        : 'cs',
+        'ApproachRate'      : 'ar',
+        'OverallDifficulty' : 'od',
+        'HPDrainRate'       : 'hp',
+    }
+
+    @staticmethod
+    def parse(text, spinners=False):
+        """
+        Parses the contents of an .osu file.
+
+        Returns (map_data, meta), where map_data is an array of [t, x, y] rows (`DataOsu`
+        layout, t in seconds) for each hit object's start, and meta is a dict of the
+        map's cs, ar, od and hp. Spinners are skipped unless `spinners` is set. Maps that
+        predate the ApproachRate setting use OverallDifficulty for ar, like the game does.
+        """
+        section = None
+        meta    = {}
+        objects = []
+
+        for line in text.splitlines():
+            line = line.strip()
+            if len(line) == 0 or line.startswith('//'):
+                continue
+
+            if line.startswith('[') and line.endswith(']'):
+                section = line[1:-1]
+                continue
+
+            if section == 'Difficulty':
+                key, _, value = line.partition(':')
+                key = BeatmapLoader.DIFFICULTY_KEYS.get(key.strip())
+                if key is not None:
+                    meta[key] = float(value)
+
+            elif section == 'HitObjects':
+                values = line.split(',')
+                if len(values) < 4:
+                    continue
+
+                obj_type = int(values[3])
+                if (obj_type & BeatmapLoader.TYPE_SPINNER) and not spinners:
+                    continue
+
+                # Positions and times are integers, but some old maps have decimal ones;
+                # times are truncated to whole ms as osu! does
+                objects.append((int(float(values[2]))/1000, float(values[0]), float(values[1])))
+
+        if 'ar' not in meta and 'od' in meta:
+            meta['ar'] = meta['od']
+
+        map_data = np.zeros((len(objects), 3))
+        if len(objects) > 0:
+            map_data[:, [ DataOsu.IDX_T, DataOsu.IDX_X, DataOsu.IDX_Y ]] = objects
+
+        # Hit objects are supposed to be in time order, but don't rely on it
+        map_data = map_data[np.argsort(map_data[:, DataOsu.IDX_T], kind='stable')]
+
+        return map_data, meta
+
+
+    @staticmethod
+    def load(path, spinners=False):
+        """
+        Loads an .osu file. Like `parse`, but meta also has the file's md5, which is
+        what replays use to refer to the map.
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        map_data, meta = BeatmapLoader.parse(data.decode('utf-8', errors='replace'), spinners)
+        meta['md5'] = hashlib.md5(data).hexdigest()
+
+        return map_data, meta
+
+
+    @staticmethod
+    def find_maps(directory):
+        paths = []
+        for root, _, files in os.walk(directory):
+            paths += [ os.path.join(root, name) for name in files if name.lower().endswith('.osu') ]
+
+        return sorted(paths)
+
+
+    @staticmethod
+    def load_dir(directory, n_workers=None, spinners=False):
+        """
+        Parses every .osu file under `directory` across a process pool.
+
+        Yields (path, map_data, meta) in path order. Files that fail to parse are skipped.
+        """
+        paths = BeatmapLoader.find_maps(directory)
+        chunksize = max(1, len(paths)//(4*(n_workers or os.cpu_count() or 1)))
+
+        with ProcessPoolExecutor(n_workers) as pool:
+            for path, result in zip(paths, pool.map(_load_safe, paths, [ spinners ]*len(paths), chunksize=chunksize)):
+                if result is None:
+                    continue
+
+                yield (path, *result)
+
+
+    @staticmethod
+    def build_cache(directory, cache_path, n_workers=None, spinners=False):
+        """
+        Parses every .osu file under `directory` and writes them to an `ArrayStore` at
+        `cache_path`. Maps are named by their path relative to `directory`, and each
+        one's metadata is its difficulty settings and md5.
+        """
+        with ArrayStoreWriter(cache_path, 3) as writer:
+            for path, map_data, meta in BeatmapLoader.load_dir(directory, n_workers, spinners):
+                writer.append(os.path.relpath(path, directory), map_data, meta)
+
+        return ArrayStore(cache_path)
+
+
+    @staticmethod
+    def load_cache(cache_path):
+        """
+        Opens a cache written by `build_cache`. `cache[i]` or `cache[name]` gives a
+        memory-mapped map_data view, `cache.meta(i)` its difficulty settings and md5.
+        """
+        return ArrayStore(cache_path)
+
+
+def _load_safe(path, spinners):
+    try:
+        return BeatmapLoader.load(path, spinners)
+    except (OSError, ValueError, IndexError):
+        return None
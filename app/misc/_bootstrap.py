@@ -0,0 +1,70 @@
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+
+from app.misc._utils import Utils
+
+
+class Bootstrap():
+    """
+    Bootstrap confidence intervals of `Utils.linear_regresion` slopes.
+
+    Each group of points is resampled with replacement `n_resamples` times and every
+    resample is fit at once with `Utils.linear_regresion_batch`. Resamples are fit in
+    float32 and in chunks of `CHUNK_RESAMPLES` to keep the arrays small; chunks can be
+    spread over a process pool. Every chunk gets its own seed spawned from `seed`, so
+    the intervals don't depend on the number of workers.
+    """
+
+    CHUNK_RESAMPLES = 250
+
+    @staticmethod
+    def slope_ci(x, y, n_resamples=1000, ci=0.95, seed=None, n_workers=1):
+        """
+        Returns the (low, high) bounds of the `ci` confidence interval of the slope
+        of `x`, `y`. Bounds are nan if too few resamples could be fit.
+        """
+        return Bootstrap.slope_cis([ (x, y) ], n_resamples, ci, seed, n_workers)[0]
+
+
+    @staticmethod
+    def slope_cis(groups, n_resamples=1000, ci=0.95, seed=None, n_workers=1):
+        """
+        `slope_ci` of each (x, y) in `groups`, as an (n_groups, 2) array.
+        """
+        tasks = []
+        for i, (x, y) in enumerate(groups):
+            if len(x) < 2:
+                continue
+
+            for start in range(0, n_resamples, Bootstrap.CHUNK_RESAMPLES):
+                tasks.append((i, np.asarray(x, dtype=np.float32), np.asarray(y, dtype=np.float32), min(Bootstrap.CHUNK_RESAMPLES, n_resamples - start)))
+
+        seeds = np.random.SeedSequence(seed).spawn(len(tasks))
+
+        if n_workers <= 1:
+            chunks = [ _fit_resamples(x, y, n, task_seed) for (_, x, y, n), task_seed in zip(tasks, seeds) ]
+        else:
+            with ProcessPoolExecutor(n_workers) as pool:
+                chunks = list(pool.map(_fit_resamples, *zip(*[ (x, y, n, task_seed) for (_, x, y, n), task_seed in zip(tasks, seeds) ])))
+
+        cis = np.full((len(groups), 2), np.nan)
+        for i in range(len(groups)):
+            slopes = np.concatenate([ chunk for (group, _, _, _), chunk in zip(tasks, chunks) if group == i ] + [ np.zeros(0) ])
+            slopes = slopes[~np.isnan(slopes)]
+
+            # Resamples that can't be fit are dropped; if most can't, there's no interval
+            if slopes.shape[0] < n_resamples/2:
+                continue
+
+            cis[i] = np.percentile(slopes, [ 50*(1 - ci), 50*(1 + ci) ])
+
+        return cis
+
+
+def _fit_resamples(x, y, n_resamples, seed):
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, x.shape[0], (n_resamples, x.shape[0]), dtype=np.int32)
+
+    m, b = Utils.linear_regresion_batch(x[idx], y[idx])
+    return m.astype(float)
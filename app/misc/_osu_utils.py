@@ -64,6 +64,12 @@ class OsuUtils():
         else:          return (1950 - ms)/150
 
     
+    @staticmethod
+    def od_to_ms(od: 'float') -> tuple:
+        # Hit windows for 300, 100 and 50 (+/- ms)
+        return (80 - 6*od, 140 - 8*od, 200 - 10*od)
+
+
     @staticmethod
     def cs_to_px(cs: 'float') -> float:
         # From https://github.com/ppy/osu/blob/master/osu.Game.Rulesets.Osu/Objects/OsuHitObject.cs#L137
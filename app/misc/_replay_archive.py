@@ -0,0 +1,256 @@
+import zlib
+import struct
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+
+from app._data_cor import DataOsu
+
+
+class ReplayArchive():
+    """
+    Chunked, compressed file format for [t, x, y, k] replay data.
+
+    Each replay is cut into chunks of at most `chunk_frames` frames. Within a chunk the
+    time (ms) and position columns are delta-encoded as int32 starting from zero, so a
+    chunk decodes on its own, and the key column is packed into two bit planes. The
+    chunk payload is then zlib-compressed. After the chunks comes an index with the
+    replay, time range, frame count and file location of every chunk, so a reader can
+    decode one replay, or the part of one replay overlapping a time range, by reading
+    only those chunks.
+
+    Positions are stored as integers after multiplying by `pos_scale`. Simulated replays
+    have integer positions, so the default of 1 is lossless for them; use e.g. 100 for
+    real replays with fractional positions.
+
+    File layout:
+        header   MAGIC, version, pos_scale
+        chunks   compressed payloads, back to back
+        index    INDEX_DTYPE entry per chunk
+        footer   index offset, number of chunks, number of replays, MAGIC
+    """
+
+    MAGIC   = b'OSIMRPLY'
+    VERSION = 1
+
+    HEADER = struct.Struct('<8sIf')
+    FOOTER = struct.Struct('<qqq8s')
+
+    INDEX_DTYPE = np.dtype([
+        ('replay',   '<i8'),  # Replay id
+        ('t_start',  '<i8'),  # Time of the first frame in the chunk (ms)
+        ('t_end',    '<i8'),  # Time of the last frame in the chunk (ms)
+        ('n_frames', '<i8'),
+        ('offset',   '<i8'),  # File offset of the compressed payload
+        ('size',     '<i8'),  # Size of the compressed payload
+    ])
+
+    @staticmethod
+    def encode_chunk(replay_data, pos_scale=1, level=1):
+        """
+        Encodes a block of [t, x, y, k] rows. Returns (payload, t_start_ms, t_end_ms).
+        """
+        t = np.round(replay_data[:, DataOsu.IDX_T]*1000).astype(np.int64)
+        x = np.round(replay_data[:, DataOsu.IDX_X]*pos_scale).astype(np.int64)
+        y = np.round(replay_data[:, DataOsu.IDX_Y]*pos_scale).astype(np.int64)
+        k = replay_data[:, DataOsu.IDX_K].astype(np.uint8)
+
+        deltas = np.empty((3, t.shape[0]), dtype=np.int32)
+        deltas[0] = np.diff(t, prepend=0)
+        deltas[1] = np.diff(x, prepend=0)
+        deltas[2] = np.diff(y, prepend=0)
+
+        keys = np.packbits(np.stack(((k & 1), (k >> 1) & 1)), axis=1)
+
+        payload = zlib.compress(deltas.tobytes() + keys.tobytes(), level)
+        return payload, int(t[0]), int(t[-1])
+
+
+    @staticmethod
+    def decode_chunk(payload, n_frames, pos_scale=1):
+        raw = zlib.decompress(payload)
+
+        deltas = np.frombuffer(raw, dtype=np.int32, count=3*n_frames).reshape(3, n_frames)
+        values = np.cumsum(deltas, axis=1, dtype=np.int64)
+
+        keys = np.frombuffer(raw, dtype=np.uint8, offset=3*n_frames*4).reshape(2, -1)
+        keys = np.unpackbits(keys, axis=1, count=n_frames)
+
+        replay_data = np.empty((n_frames, 4))
+        replay_data[:, DataOsu.IDX_T] = values[0]/1000
+        replay_data[:, DataOsu.IDX_X] = values[1]/pos_scale
+        replay_data[:, DataOsu.IDX_Y] = values[2]/pos_scale
+        replay_data[:, DataOsu.IDX_K] = keys[0] | (keys[1] << 1)
+
+        return replay_data
+
+
+class ReplayArchiveWriter():
+    """
+    Writes a `ReplayArchive` file. Use as a context manager, or call `close()` when done.
+
+    `n_threads` > 1 compresses the chunks of `write_batch` on a thread pool; zlib
+    releases the GIL while compressing.
+    """
+
+    def __init__(self, path, pos_scale=1, chunk_frames=4096, level=1, n_threads=1):
+        # The header stores the scale as float32; encode with that same value so the
+        # reader decodes with exactly the scale positions were quantized with
+        self.pos_scale    = float(np.float32(pos_scale))
+        self.chunk_frames = chunk_frames
+        self.level        = level
+
+        self.__file  = open(path, 'wb')
+        self.__file.write(ReplayArchive.HEADER.pack(ReplayArchive.MAGIC, ReplayArchive.VERSION, self.pos_scale))
+
+        self.__index    = []
+        self.__n_replay = 0
+        self.__pool     = ThreadPoolExecutor(n_threads) if n_threads > 1 else None
+
+
+    def write(self, replay_data):
+        """
+        Appends one replay and returns its id.
+        """
+        return self.write_batch([ replay_data ])[0]
+
+
+    def write_batch(self, replays):
+        """
+        Appends a list (or 3D array) of replays and returns their ids.
+        """
+        blocks = []
+        ids    = []
+
+        for replay_data in replays:
+            replay_id = self.__n_replay
+            self.__n_replay += 1
+            ids.append(replay_id)
+
+            for chunk_start in range(0, replay_data.shape[0], self.chunk_frames):
+                blocks.append((replay_id, replay_data[chunk_start:chunk_start + self.chunk_frames]))
+
+        encode = lambda block: ReplayArchive.encode_chunk(block[1], self.pos_scale, self.level)
+        if self.__pool is None:
+            encoded = map(encode, blocks)
+        else:
+            encoded = self.__pool.map(encode, blocks)
+
+        for (replay_id, block), (payload, t_start, t_end) in zip(blocks, encoded):
+            self.__index.append((replay_id, t_start, t_end, block.shape[0], self.__file.tell(), len(payload)))
+            self.__file.write(payload)
+
+        return ids
+
+
+    def close(self):
+        if self.__file is None:
+            return
+
+        index = np.array(self.__index, dtype=ReplayArchive.INDEX_DTYPE)
+        index_offset = self.__file.tell()
+
+        self.__file.write(index.tobytes())
+        self.__file.write(ReplayArchive.FOOTER.pack(index_offset, index.shape[0], self.__n_replay, ReplayArchive.MAGIC))
+        self.__file.close()
+        self.__file = None
+
+        if self.__pool is not None:
+            self.__pool.shutdown()
+            self.__pool = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ReplayArchiveReader():
+    """
+    Reads replays back out of a `ReplayArchive` file. Only the index is loaded on open;
+    chunk payloads are read as they're needed.
+    """
+
+    def __init__(self, path):
+        self.__file = open(path, 'rb')
+
+        magic, version, self.pos_scale = ReplayArchive.HEADER.unpack(self.__file.read(ReplayArchive.HEADER.size))
+        if magic != ReplayArchive.MAGIC:
+            raise ValueError(f'{path} is not a replay archive')
+
+        if version != ReplayArchive.VERSION:
+            raise ValueError(f'{path} has unsupported replay archive version {version}')
+
+        self.__file.seek(-ReplayArchive.FOOTER.size, 2)
+        index_offset, n_chunks, self.__n_replays, magic = ReplayArchive.FOOTER.unpack(self.__file.read(ReplayArchive.FOOTER.size))
+        if magic != ReplayArchive.MAGIC:
+            raise ValueError(f'{path} is truncated')
+
+        self.__file.seek(index_offset)
+        self.index = np.frombuffer(self.__file.read(n_chunks*ReplayArchive.INDEX_DTYPE.itemsize), dtype=ReplayArchive.INDEX_DTYPE)
+
+        # Chunks of a replay are contiguous in the index, in replay id order
+        self.__replay_starts = np.searchsorted(self.index['replay'], np.arange(self.n_replays() + 1))
+
+
+    def n_replays(self):
+        return self.__n_replays
+
+
+    def read(self, replay_id):
+        """
+        Decodes the whole of one replay.
+        """
+        return self.__read_chunks(self.__replay_chunks(replay_id))
+
+
+    def read_range(self, replay_id, t_start, t_end):
+        """
+        Decodes the frames of one replay with t_start <= t <= t_end (in seconds), only
+        reading the chunks that overlap that range.
+        """
+        chunks = self.__replay_chunks(replay_id)
+
+        entries = self.index[chunks]
+        overlap = (entries['t_end'] >= t_start*1000) & (entries['t_start'] <= t_end*1000)
+
+        replay_data = self.__read_chunks(chunks[overlap])
+        select = (replay_data[:, DataOsu.IDX_T] >= t_start) & (replay_data[:, DataOsu.IDX_T] <= t_end)
+
+        return replay_data[select]
+
+
+    def close(self):
+        self.__file.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def __replay_chunks(self, replay_id):
+        if not (0 <= replay_id < self.n_replays()):
+            raise IndexError(f'Replay {replay_id} is not in the archive')
+
+        return np.arange(self.__replay_starts[replay_id], self.__replay_starts[replay_id + 1])
+
+
+    def __read_chunks(self, chunks):
+        blocks = []
+
+        for entry in self.index[chunks]:
+            self.__file.seek(entry['offset'])
+            payload = self.__file.read(entry['size'])
+            blocks.append(ReplayArchive.decode_chunk(payload, int(entry['n_frames']), self.pos_scale))
+
+        if len(blocks) == 0:
+            return np.zeros((0, 4))
+
+        return np.concatenate(blocks)
@@ -0,0 +1,214 @@
+import os
+import lzma
+import struct
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+
+from app._data_cor import DataOsu
+from app._player_simulator import PlayerSimulator
+from app.misc._array_store import ArrayStore, ArrayStoreWriter
+
+
+class ReplayLoader():
+
+    # Key state bits of replay frames. K1/K2 also set M1/M2 respectively.
+    KEY_M1    = 1 << 0
+    KEY_M2    = 1 << 1
+    KEY_K1    = 1 << 2
+    KEY_K2    = 1 << 3
+    KEY_SMOKE = 1 << 4
+
+    # Frame time delta marking the trailing RNG seed frame
+    SEED_FRAME = -12345
+
+    # Position of the placeholder frames osu! writes at the start of a replay
+    DUMMY_FRAME_POS = (256, -500)
+
+    @staticmethod
+    def parse(data, frames=True):
+        """
+        Parses the contents of an .osr file.
+
+        Returns (replay_data, meta). replay_data has [t, x, y, k] rows in the same layout
+        as `PlayerSimulator.run_simulation` output in `RECORD_REPLAY` mode: t in seconds,
+        and k is `KEY_HIT` on frames where a key goes down and `KEY_NONE` otherwise. meta
+        has the replay header (mode, beatmap md5, player, mods, judgement counts, ...).
+        With `frames` False only the header is parsed and replay_data is None.
+        """
+        reader = _Reader(data)
+        meta = {}
+
+        meta['mode']         = reader.byte()
+        meta['version']      = reader.int()
+        meta['beatmap_md5']  = reader.string()
+        meta['player']       = reader.string()
+        meta['replay_md5']   = reader.string()
+        meta['n300']         = reader.short()
+        meta['n100']         = reader.short()
+        meta['n50']          = reader.short()
+        meta['ngeki']        = reader.short()
+        meta['nkatu']        = reader.short()
+        meta['nmiss']        = reader.short()
+        meta['score']        = reader.int()
+        meta['max_combo']    = reader.short()
+        meta['perfect']      = reader.byte()
+        meta['mods']         = reader.int()
+        reader.string()      # Life bar graph, not needed
+        meta['timestamp']    = reader.long()
+
+        data_len = reader.int()
+        if not frames:
+            return None, meta
+
+        text = lzma.decompress(reader.bytes(data_len)).decode('ascii')
+        return ReplayLoader.parse_frames(text), meta
+
+
+    @staticmethod
+    def parse_frames(text):
+        """
+        Converts decompressed `w|x|y|z` replay frames to [t, x, y, k] rows.
+        """
+        text = text.strip().strip(',')
+        if len(text) == 0:
+            return np.zeros((0, 4))
+
+        frames = np.fromstring(text.replace('|', ','), sep=',').reshape(-1, 4)
+
+        # The last frame can carry the RNG seed instead of a cursor position
+        frames = frames[frames[:, 0] != ReplayLoader.SEED_FRAME]
+
+        # Time deltas of every frame count towards the times of the frames after it
+        frame_t = np.cumsum(frames[:, 0])/1000
+
+        # osu! starts replays with up to two placeholder frames (w=0 and w=-1, the latter
+        # going back in time) off screen. They aren't cursor positions, so drop them
+        is_dummy = (frames[:, 1] == ReplayLoader.DUMMY_FRAME_POS[0]) & (frames[:, 2] == ReplayLoader.DUMMY_FRAME_POS[1])
+        is_dummy[2:] = False
+
+        frames  = frames[~is_dummy]
+        frame_t = frame_t[~is_dummy]
+
+        keys = frames[:, 3].astype(np.int64) & (ReplayLoader.KEY_M1 | ReplayLoader.KEY_M2)
+        prev_keys = np.concatenate(([ 0 ], keys[:-1]))
+        is_press  = (keys & ~prev_keys) != 0
+
+        replay_data = np.zeros((frames.shape[0], 4))
+        replay_data[:, DataOsu.IDX_T] = frame_t
+        replay_data[:, DataOsu.IDX_X] = frames[:, 1]
+        replay_data[:, DataOsu.IDX_Y] = frames[:, 2]
+        replay_data[:, DataOsu.IDX_K] = np.where(is_press, PlayerSimulator.KEY_HIT, PlayerSimulator.KEY_NONE)
+
+        return replay_data
+
+
+    @staticmethod
+    def load(path, frames=True):
+        with open(path, 'rb') as f:
+            return ReplayLoader.parse(f.read(), frames)
+
+
+    @staticmethod
+    def find_replays(directory):
+        paths = []
+        for root, _, files in os.walk(directory):
+            paths += [ os.path.join(root, name) for name in files if name.lower().endswith('.osr') ]
+
+        return sorted(paths)
+
+
+    @staticmethod
+    def load_dir(directory, n_workers=None):
+        """
+        Decompresses and parses every .osr file under `directory` across a process pool.
+
+        Yields (path, replay_data, meta) in path order. Files that fail to parse are skipped.
+        """
+        paths = ReplayLoader.find_replays(directory)
+        chunksize = max(1, len(paths)//(4*(n_workers or os.cpu_count() or 1)))
+
+        with ProcessPoolExecutor(n_workers) as pool:
+            for path, result in zip(paths, pool.map(_load_safe, paths, chunksize=chunksize)):
+                if result is None:
+                    continue
+
+                yield (path, *result)
+
+
+    @staticmethod
+    def build_store(directory, store_path, n_workers=None, modes=(0,)):
+        """
+        Parses every .osr file under `directory` and writes the frames to an `ArrayStore`
+        at `store_path`, named by path relative to `directory` with the replay header as
+        metadata. Only replays of the given game `modes` are kept (osu!standard by default).
+        """
+        with ArrayStoreWriter(store_path, 4) as writer:
+            for path, replay_data, meta in ReplayLoader.load_dir(directory, n_workers):
+                if meta['mode'] not in modes:
+                    continue
+
+                writer.append(os.path.relpath(path, directory), replay_data, meta)
+
+        return ArrayStore(store_path)
+
+
+    @staticmethod
+    def load_store(store_path):
+        """
+        Opens a store written by `build_store`. `store[i]` or `store[name]` gives a
+        memory-mapped [t, x, y, k] view, `store.meta(i)` the replay header.
+        """
+        return ArrayStore(store_path)
+
+
+class _Reader():
+
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.pos  = 0
+
+
+    def __unpack(self, fmt, size):
+        value = struct.unpack_from(fmt, self.data, self.pos)[0]
+        self.pos += size
+        return value
+
+
+    def byte(self):  return self.__unpack('<B', 1)
+    def short(self): return self.__unpack('<H', 2)
+    def int(self):   return self.__unpack('<i', 4)
+    def long(self):  return self.__unpack('<q', 8)
+
+
+    def bytes(self, n):
+        value = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return value
+
+
+    def uleb128(self):
+        value = 0
+        shift = 0
+
+        while True:
+            byte = self.byte()
+            value |= (byte & 0x7f) << shift
+            shift += 7
+
+            if byte & 0x80 == 0:
+                return value
+
+
+    def string(self):
+        if self.byte() == 0x00:
+            return ''
+
+        return bytes(self.bytes(self.uleb128())).decode('utf-8', errors='replace')
+
+
+def _load_safe(path):
+    try:
+        return ReplayLoader.load(path)
+    except (OSError, ValueError, struct.error, lzma.LZMAError):
+        return None
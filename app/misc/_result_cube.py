@@ -0,0 +1,308 @@
+import os
+import json
+import itertools
+import numpy as np
+
+
+class ResultCube():
+    """
+    Chunked N-D array store with named axes, holding one or more metrics per cell.
+
+    Every axis has a name and a list of coordinates. Each metric is split into chunks
+    of `chunks` cells along each axis, and every chunk is its own .npy file, so
+    writing a cell only touches its chunk and selections and reductions only load the
+    chunks they overlap. Chunks that were never written read as nan.
+
+    Layout of a cube directory:
+        index.json             axes and their coordinates, metrics, chunk shape, dtype, attrs
+        <metric>/<i>.<j>...npy one file per written chunk, named by its chunk index
+
+    Cells are addressed by axis coordinate in `sel` and `reduce`:
+
+        cube.sel('dev', hit_dev=10)                   # every other axis kept
+        cube.sel('dev', hit_dev=10, angle=[ 0, 90 ])  # angle kept, but only 0 and 90
+        cube.reduce('dev', over='angle', func='mean', hit_dev=10)
+
+    Both return (array, coords), where `coords` maps each remaining axis name to its
+    coordinates, in array axis order.
+    """
+
+    # Default max number of cells per chunk
+    CHUNK_CELLS = 1 << 16
+
+    REDUCE_FUNCS = [ 'mean', 'std', 'sum', 'min', 'max', 'count' ]
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(os.path.join(path, 'index.json'), 'r') as f:
+            index = json.load(f)
+
+        self.axes    = [ name for name, _ in index['axes'] ]
+        self.coords  = { name : np.array(coords) for name, coords in index['axes'] }
+        self.metrics = index['metrics']
+        self.chunks  = tuple(index['chunks'])
+        self.dtype   = np.dtype(index['dtype'])
+        self.attrs   = index['attrs']
+
+        self.shape = tuple(len(self.coords[name]) for name in self.axes)
+
+        # Chunks with unsaved writes, and how many of their cells were written
+        self.__dirty   = {}
+        self.__written = {}
+
+
+    @staticmethod
+    def create(path, axes, metrics, chunks=None, attrs=None, dtype=np.float64):
+        """
+        Creates an empty cube at `path`. `axes` is a list of (name, coords) in axis
+        order, `chunks` optionally maps axis names to their chunk length.
+        """
+        os.makedirs(path, exist_ok=True)
+
+        axes   = [ (name, np.asarray(coords).tolist()) for name, coords in axes ]
+        shape  = [ len(coords) for _, coords in axes ]
+        chunks = ResultCube.__default_chunks(shape) if chunks is None else [ chunks.get(name, n) for (name, _), n in zip(axes, shape) ]
+
+        for metric in metrics:
+            os.makedirs(os.path.join(path, metric), exist_ok=True)
+
+        with open(os.path.join(path, 'index.json'), 'w') as f:
+            json.dump({
+                'axes'    : axes,
+                'metrics' : list(metrics),
+                'chunks'  : [ max(1, min(c, n)) for c, n in zip(chunks, shape) ],
+                'dtype'   : np.dtype(dtype).str,
+                'attrs'   : attrs or {},
+            }, f)
+
+        return ResultCube(path)
+
+
+    def size(self):
+        return int(np.prod(self.shape))
+
+
+    def write(self, idx, values):
+        """
+        Writes the cell at `idx`, a tuple of axis positions, for each metric in
+        `values` { metric : value }. Chunks are saved once all their cells were
+        written, or on `flush()`.
+        """
+        chunk_id = tuple(i//c for i, c in zip(idx, self.chunks))
+        in_chunk = tuple(i%c for i, c in zip(idx, self.chunks))
+
+        for metric, value in values.items():
+            key = (metric, chunk_id)
+            if key not in self.__dirty:
+                self.__dirty[key]   = np.array(self.__load_chunk(metric, chunk_id))
+                self.__written[key] = 0
+
+            self.__dirty[key][in_chunk] = value
+            self.__written[key] += 1
+
+            if self.__written[key] >= self.__dirty[key].size:
+                self.__save_chunk(key)
+
+
+    def flush(self):
+        for key in list(self.__dirty):
+            self.__save_chunk(key)
+
+
+    def close(self):
+        self.flush()
+
+
+    def sel(self, metric, **selectors):
+        """
+        Cells of `metric` at the given axis coordinates. A scalar selects one
+        coordinate and drops the axis, a list keeps the axis with only those
+        coordinates, and axes without a selector are kept whole.
+        """
+        idxs, keep = self.__select(selectors)
+
+        out = np.full([ len(idx) for idx in idxs ], np.nan, dtype=self.dtype)
+
+        for chunk_id, out_pos, in_chunk in self.__chunk_blocks(idxs):
+            out[np.ix_(*out_pos)] = self.__load_chunk(metric, chunk_id)[np.ix_(*in_chunk)]
+
+        return self.__squeeze(out, idxs, keep)
+
+
+    def reduce(self, metric, over, func='mean', **selectors):
+        """
+        Reduces `metric` over the axes `over` (a name or list of names) with `func`,
+        one of `REDUCE_FUNCS`, after applying `selectors` as in `sel`. Reductions
+        ignore nan cells and run one chunk at a time, so only the result and a chunk
+        are ever in memory.
+        """
+        if func not in ResultCube.REDUCE_FUNCS:
+            raise ValueError(f'Unknown reduction: {func}, expected one of {ResultCube.REDUCE_FUNCS}')
+
+        over = [ over ] if isinstance(over, str) else list(over)
+        for name in over:
+            if name not in self.axes:
+                raise KeyError(f'Unknown axis: {name}')
+
+        idxs, keep = self.__select(selectors)
+
+        axes_over = tuple(self.axes.index(name) for name in over)
+        axes_kept = [ a for a in range(len(self.axes)) if a not in axes_over ]
+        out_shape = [ len(idxs[a]) for a in axes_kept ]
+
+        count = np.zeros(out_shape)
+        total = np.zeros(out_shape)
+        total_sq = np.zeros(out_shape)
+        low  = np.full(out_shape, np.inf)
+        high = np.full(out_shape, -np.inf)
+
+        for chunk_id, out_pos, in_chunk in self.__chunk_blocks(idxs):
+            block = self.__load_chunk(metric, chunk_id)[np.ix_(*in_chunk)].astype(float)
+            valid = ~np.isnan(block)
+
+            pos = np.ix_(*[ out_pos[a] for a in axes_kept ])
+
+            count[pos] += np.sum(valid, axis=axes_over)
+            total[pos] += np.nansum(block, axis=axes_over)
+
+            if func == 'std':
+                total_sq[pos] += np.nansum(block**2, axis=axes_over)
+            elif func == 'min':
+                low[pos] = np.fmin(low[pos], np.min(np.where(valid, block, np.inf), axis=axes_over))
+            elif func == 'max':
+                high[pos] = np.fmax(high[pos], np.max(np.where(valid, block, -np.inf), axis=axes_over))
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if func == 'count':
+                out = count
+            elif func == 'sum':
+                out = total
+            elif func == 'mean':
+                out = total/count
+            elif func == 'std':
+                mean = total/count
+                out  = np.sqrt(np.maximum(total_sq/count - mean**2, 0))
+            elif func == 'min':
+                out = np.where(count > 0, low, np.nan)
+            elif func == 'max':
+                out = np.where(count > 0, high, np.nan)
+
+        # Selector scalars drop their axes as in `sel`
+        kept_idxs = [ idxs[a] for a in axes_kept ]
+        kept_keep = [ keep[a] for a in axes_kept ]
+        kept_axes = [ self.axes[a] for a in axes_kept ]
+
+        squeeze = tuple(i for i, k in enumerate(kept_keep) if not k)
+        coords  = { name : self.coords[name][idx] for name, idx, k in zip(kept_axes, kept_idxs, kept_keep) if k }
+
+        return np.squeeze(out, axis=squeeze), coords
+
+
+    def __select(self, selectors):
+        # Positions along each axis selected by `selectors`, and whether the axis is kept
+        for name in selectors:
+            if name not in self.axes:
+                raise KeyError(f'Unknown axis: {name}')
+
+        idxs = []
+        keep = []
+
+        for name in self.axes:
+            coords = self.coords[name]
+
+            if name not in selectors:
+                idxs.append(np.arange(len(coords)))
+                keep.append(True)
+                continue
+
+            values = selectors[name]
+            scalar = np.ndim(values) == 0
+
+            idx = []
+            for value in np.atleast_1d(values):
+                match = np.flatnonzero(np.isclose(coords, value))
+                if match.shape[0] == 0:
+                    raise KeyError(f'{name}={value} is not a coordinate of axis {name}')
+
+                idx.append(match[0])
+
+            idxs.append(np.array(idx, dtype=int))
+            keep.append(not scalar)
+
+        return idxs, keep
+
+
+    def __chunk_blocks(self, idxs):
+        # For each chunk overlapping the selection, yields its chunk id, the positions
+        # it fills in the selection, and the matching positions within the chunk
+        per_axis = []
+
+        for idx, c in zip(idxs, self.chunks):
+            chunk_ids = idx//c
+            per_axis.append([ (chunk_id, np.flatnonzero(chunk_ids == chunk_id), idx[chunk_ids == chunk_id]%c) for chunk_id in np.unique(chunk_ids) ])
+
+        for blocks in itertools.product(*per_axis):
+            yield tuple(b[0] for b in blocks), [ b[1] for b in blocks ], [ b[2] for b in blocks ]
+
+
+    def __squeeze(self, out, idxs, keep):
+        squeeze = tuple(a for a, k in enumerate(keep) if not k)
+        coords  = { name : self.coords[name][idx] for name, idx, k in zip(self.axes, idxs, keep) if k }
+
+        return np.squeeze(out, axis=squeeze), coords
+
+
+    def __chunk_shape(self, chunk_id):
+        # Chunks at the end of an axis can be short
+        return tuple(min(c, n - i*c) for i, c, n in zip(chunk_id, self.chunks, self.shape))
+
+
+    def __chunk_path(self, metric, chunk_id):
+        return os.path.join(self.path, metric, '.'.join(str(i) for i in chunk_id) + '.npy')
+
+
+    def __load_chunk(self, metric, chunk_id):
+        if metric not in self.metrics:
+            raise KeyError(f'Unknown metric: {metric}')
+
+        key = (metric, chunk_id)
+        if key in self.__dirty:
+            return self.__dirty[key]
+
+        path = self.__chunk_path(metric, chunk_id)
+        if not os.path.exists(path):
+            return np.full(self.__chunk_shape(chunk_id), np.nan, dtype=self.dtype)
+
+        return np.load(path, mmap_mode='r')
+
+
+    def __save_chunk(self, key):
+        metric, chunk_id = key
+        path = self.__chunk_path(metric, chunk_id)
+
+        # Written to the side first so readers never see a partial chunk
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, self.__dirty.pop(key))
+
+        os.replace(path + '.tmp', path)
+        del self.__written[key]
+
+
+    @staticmethod
+    def __default_chunks(shape):
+        # Halve the longest axis until a chunk is small enough
+        chunks = list(shape)
+        while np.prod(chunks) > ResultCube.CHUNK_CELLS:
+            a = int(np.argmax(chunks))
+            chunks[a] = (chunks[a] + 1)//2
+
+        return chunks
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
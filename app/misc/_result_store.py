@@ -0,0 +1,183 @@
+import sqlite3
+import numpy as np
+
+from app._data_cor import DataDev
+
+
+class ResultStore():
+    """
+    SQLite store of sweep results.
+
+    Each row is one simulated pattern: its deviation and pattern parameters (the `DataDev`
+    columns) along with the cs, player parameters and seed it was simulated with. Every
+    parameter column is indexed, so filtering on any of them doesn't scan the table.
+    """
+
+    # DataDev columns, in column order
+    DEV_COLUMNS = [ 'dev', 'bpm', 'px', 'angle' ]
+
+    # Columns describing how the pattern was simulated
+    PARAM_COLUMNS = [ 'cs', 'hit_dev', 'avg_read_time', 'dev_read_time', 'player_vel_dev', 'seed' ]
+
+    COLUMNS = DEV_COLUMNS + PARAM_COLUMNS
+
+    def __init__(self, path):
+        self.path = path
+
+        self.__db = sqlite3.connect(path)
+        self.__db.execute('PRAGMA journal_mode=WAL')
+        self.__db.execute('PRAGMA synchronous=NORMAL')
+
+        self.__db.execute(f'''
+            CREATE TABLE IF NOT EXISTS results (
+                id    INTEGER PRIMARY KEY,
+                dev   REAL,
+                bpm   REAL,
+                px    REAL,
+                angle REAL,
+                {', '.join(f'{col} REAL' for col in ResultStore.PARAM_COLUMNS[:-1])},
+                seed  INTEGER
+            )
+        ''')
+
+        for col in ResultStore.COLUMNS[1:]:
+            self.__db.execute(f'CREATE INDEX IF NOT EXISTS idx_results_{col} ON results({col})')
+
+        self.__db.commit()
+
+
+    def insert(self, dev_data, player_data, seed=None):
+        """
+        Inserts `dev_data` (`DataDev` layout) simulated with `player_data` (the dict given
+        to `PlayerSimulator`, including cs) in one transaction. `seed` is one seed for
+        every row, or an array of each row's seed, e.g. `Sweep.seeds`.
+        Returns the number of rows inserted.
+        """
+        dev_data = np.asarray(dev_data, dtype=float)
+
+        params = tuple(float(player_data[col]) for col in ResultStore.PARAM_COLUMNS[:-1])
+
+        if np.ndim(seed) == 0:
+            seeds = [ None if seed is None else int(seed) ]*dev_data.shape[0]
+        else:
+            seeds = np.asarray(seed).tolist()
+            if len(seeds) != dev_data.shape[0]:
+                raise ValueError(f'Expected {dev_data.shape[0]} seeds, got {len(seeds)}')
+
+        # nan deviations are stored as NULL
+        devs = [ None if np.isnan(dev) else dev for dev in dev_data[:, DataDev.COL_DEV].tolist() ]
+
+        rows = (
+            (dev, bpm, px, angle) + params + (row_seed,)
+            for dev, bpm, px, angle, row_seed in zip(
+                devs,
+                dev_data[:, DataDev.COL_BPM].tolist(),
+                dev_data[:, DataDev.COL_PX].tolist(),
+                dev_data[:, DataDev.COL_ANGLE].tolist(),
+                seeds
+            )
+        )
+
+        with self.__db:
+            self.__db.executemany(
+                f'INSERT INTO results ({", ".join(ResultStore.COLUMNS)}) VALUES ({", ".join("?"*len(ResultStore.COLUMNS))})',
+                rows
+            )
+
+        return dev_data.shape[0]
+
+
+    def query(self, columns=None, **filters):
+        """
+        Returns rows matching `filters` as a float array.
+
+        By default the columns are in `DataDev` layout, so the result can be passed
+        straight to `DataGraph.plot_data` and `GraphSkill.plot_data`. Each filter is a
+        column name mapped to:
+            a value           column == value
+            (low, high)       low <= column <= high, either end can be None
+            a list or set     column is one of the values
+
+        e.g. store.query(hit_dev=10, angle=[ 0, 180 ], bpm=(200, None))
+        """
+        columns = ResultStore.DEV_COLUMNS if columns is None else columns
+        where, args = ResultStore.__where(filters)
+
+        for col in columns:
+            ResultStore.__check_column(col)
+
+        cursor = self.__db.execute(f'SELECT {", ".join(columns)} FROM results {where}', args)
+        rows = cursor.fetchall()
+
+        if len(rows) == 0:
+            return np.zeros((0, len(columns)))
+
+        return np.array(rows, dtype=float)
+
+
+    def count(self, **filters):
+        where, args = ResultStore.__where(filters)
+        return self.__db.execute(f'SELECT COUNT(*) FROM results {where}', args).fetchone()[0]
+
+
+    def distinct(self, column, **filters):
+        """
+        Sorted distinct values of `column` among rows matching `filters`.
+        """
+        ResultStore.__check_column(column)
+        where, args = ResultStore.__where(filters)
+
+        rows = self.__db.execute(f'SELECT DISTINCT {column} FROM results {where} ORDER BY {column}', args).fetchall()
+        return np.array([ row[0] for row in rows ], dtype=float)
+
+
+    def close(self):
+        self.__db.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    @staticmethod
+    def __check_column(col):
+        if col not in ResultStore.COLUMNS:
+            raise ValueError(f'Unknown result column: {col}')
+
+
+    @staticmethod
+    def __where(filters):
+        clauses = []
+        args    = []
+
+        for col, value in filters.items():
+            ResultStore.__check_column(col)
+
+            if isinstance(value, tuple):
+                low, high = value
+                if low is not None:
+                    clauses.append(f'{col} >= ?')
+                    args.append(low)
+                if high is not None:
+                    clauses.append(f'{col} <= ?')
+                    args.append(high)
+
+            elif isinstance(value, (list, set, np.ndarray)):
+                value = list(value)
+                clauses.append(f'{col} IN ({", ".join("?"*len(value))})')
+                args += value
+
+            else:
+                clauses.append(f'{col} = ?')
+                args.append(value)
+
+        args = [ arg.item() if isinstance(arg, np.generic) else arg for arg in args ]
+
+        if len(clauses) == 0:
+            return '', args
+
+        return 'WHERE ' + ' AND '.join(clauses), args
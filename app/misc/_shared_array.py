@@ -0,0 +1,68 @@
+import numpy as np
+
+from multiprocessing import shared_memory
+
+
+class SharedArray():
+    """
+    Numpy array backed by `multiprocessing.shared_memory`.
+
+    The process that creates it owns the memory and unlinks it on `close()`. Other
+    processes attach with `SharedArray.attach(spec)`, where `spec` is the small
+    (name, shape, dtype) tuple from `spec()`. It's the only thing that needs to be
+    pickled; the array data itself is never copied between processes.
+    """
+
+    def __init__(self, shm, shape, dtype, owner):
+        self.__shm   = shm
+        self.__owner = owner
+
+        self.array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+    @staticmethod
+    def create(shape, dtype=float):
+        dtype = np.dtype(dtype)
+        size  = max(int(np.prod(shape))*dtype.itemsize, 1)
+
+        return SharedArray(shared_memory.SharedMemory(create=True, size=size), shape, dtype, True)
+
+
+    @staticmethod
+    def from_array(array):
+        shared = SharedArray.create(array.shape, array.dtype)
+        shared.array[...] = array
+
+        return shared
+
+
+    @staticmethod
+    def attach(spec):
+        name, shape, dtype = spec
+        return SharedArray(shared_memory.SharedMemory(name=name), shape, np.dtype(dtype), False)
+
+
+    def spec(self):
+        return (self.__shm.name, self.array.shape, self.array.dtype.str)
+
+
+    def close(self):
+        if self.__shm is None:
+            return
+
+        # Views of the buffer have to be gone before it can be closed
+        self.array = None
+
+        self.__shm.close()
+        if self.__owner:
+            self.__shm.unlink()
+
+        self.__shm = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
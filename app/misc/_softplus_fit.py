@@ -0,0 +1,212 @@
+import numpy as np
+
+from app._data_cor import DataDev
+
+
+class SoftplusFit():
+    """
+    Least absolute error fit of the softplus model of `Utils.softplus_func`,
+
+        f(t) = log(exp(r*(t - t_min)) + exp(y))
+
+    which is flat at y for small t and rises with slope r past t_min. The error
+    is `Utils.calc_err`, the sum of absolute residuals.
+
+    Fitting is done in two vectorized stages:
+        1) The error of every point of a (r, t_min, y) grid spanning the data is
+           evaluated at once by broadcasting the grid against the data.
+        2) The `n_refine` best grid points are refined together with Nelder-Mead,
+           which copes with the kinks of the absolute error. Every candidate's
+           simplex is stepped at once, evaluating all the moves it could take.
+    r is searched in log space. Several groups of data are fit together by padding
+    them to the same length.
+    """
+
+    # Max number of model evaluations held in memory at once
+    CHUNK_SIZE = 1 << 22
+
+    # Points are capped this many 10-90 percentile spans above the 90th percentile
+    CAP_SPAN = 100
+
+    @staticmethod
+    def model(t, r, t_min, y):
+        # Same as `Utils.softplus_func`, computed without overflow for any input
+        return np.logaddexp(r*(t - t_min), y)
+
+
+    @staticmethod
+    def fit(x, y, n_grid=12, n_refine=4, n_iters=100):
+        """
+        Fits the model to one set of points. Returns a dict of:
+            'r', 't_min', 'y'   best fit parameters
+            'err'               sum of absolute residuals at the best fit
+            'residuals'         y - f(x) at the best fit
+        """
+        return SoftplusFit.fit_groups([ (x, y) ], n_grid, n_refine, n_iters)[0]
+
+
+    @staticmethod
+    def fit_groups(groups, n_grid=12, n_refine=4, n_iters=100):
+        """
+        `fit` of each (x, y) in `groups`, all in one batch. Groups with fewer than
+        3 points get None.
+        """
+        results = [ None ]*len(groups)
+
+        fit_idxs = [ i for i, (x, _) in enumerate(groups) if len(x) >= 3 ]
+        if len(fit_idxs) == 0:
+            return results
+
+        n_groups = len(fit_idxs)
+        n_points = max(len(groups[i][0]) for i in fit_idxs)
+
+        # Groups padded to the same length; padding is masked out of the error
+        xs   = np.zeros((n_groups, n_points))
+        ys   = np.zeros((n_groups, n_points))
+        mask = np.zeros((n_groups, n_points), dtype=bool)
+
+        for g, i in enumerate(fit_idxs):
+            x, y = groups[i]
+            xs[g, :len(x)]   = x
+            ys[g, :len(x)]   = y
+            mask[g, :len(x)] = True
+
+        # Bulk of the points of each group, ignoring a few runaway deviations
+        y_low, y_high = np.nanpercentile(np.where(mask, ys, np.nan), [ 10, 90 ], axis=1)
+
+        # Runaway points are capped far above the bulk. Their absolute error still pulls
+        # the fit up the same way as long as the curve stays under the cap, but their
+        # size no longer swamps the precision of the error sums
+        cap = y_high + SoftplusFit.CAP_SPAN*(y_high - y_low)
+        ys  = np.minimum(ys, cap[:, None])
+
+        # Search in (log r, t_min, y)
+        grids = SoftplusFit.__grids(xs, y_low, y_high, mask, n_grid)
+        params = np.stack(np.meshgrid(*[ np.arange(n_grid) ]*3, indexing='ij'), axis=-1).reshape(-1, 3)
+        params = np.stack([ grids[:, k, params[:, k]] for k in range(3) ], axis=-1)  # (n_groups, n_grid^3, 3)
+
+        # The grid only has to rank candidates, so float32 is enough for it
+        errs = SoftplusFit.__errors(xs.astype(np.float32), ys.astype(np.float32), mask, params.astype(np.float32))
+
+        n_refine = min(n_refine, params.shape[1])
+        best = np.argsort(errs, axis=1)[:, :n_refine]
+        params = np.take_along_axis(params, best[:, :, None], axis=1)
+
+        # Nelder-Mead simplex around each candidate, one grid step along each parameter
+        steps   = grids[:, :, 1] - grids[:, :, 0]
+        simplex = np.concatenate([ params[:, :, None, :], params[:, :, None, :] + np.eye(3)[None, None]*steps[:, None, None, :] ], axis=2)
+        f       = SoftplusFit.__simplex_errors(xs, ys, mask, simplex)
+
+        for _ in range(n_iters):
+            order   = np.argsort(f, axis=2)
+            simplex = np.take_along_axis(simplex, order[..., None], axis=2)
+            f       = np.take_along_axis(f, order, axis=2)
+
+            # Reflection, expansion, outside and inside contraction of the worst vertex, all
+            # evaluated at once. Each candidate then takes the one its case calls for
+            center = np.mean(simplex[:, :, :3], axis=2)
+            worst  = simplex[:, :, 3]
+            trials = center[:, :, None] + np.array([ 1, 2, 0.5, -0.5 ])[None, None, :, None]*(center - worst)[:, :, None]
+            f_r, f_e, f_oc, f_ic = np.moveaxis(SoftplusFit.__simplex_errors(xs, ys, mask, trials), 2, 0)
+
+            f_best, f_second, f_worst = f[:, :, 0], f[:, :, 2], f[:, :, 3]
+
+            take = np.full(f_r.shape, -1)
+            take[(f_best <= f_r) & (f_r < f_second)] = 0
+            take[(f_r < f_best)] = np.where(f_e < f_r, 1, 0)[(f_r < f_best)]
+            outside = (f_second <= f_r) & (f_r < f_worst) & (f_oc <= f_r)
+            inside  = (f_worst <= f_r) & (f_ic < f_worst)
+            take[outside] = 2
+            take[inside]  = 3
+
+            accept = take >= 0
+            pick   = np.maximum(take, 0)
+            simplex[:, :, 3] = np.where(accept[..., None], np.take_along_axis(trials, pick[:, :, None, None], axis=2)[:, :, 0], worst)
+            f[:, :, 3]       = np.where(accept, np.take_along_axis(np.stack([ f_r, f_e, f_oc, f_ic ], axis=2), pick[..., None], axis=2)[..., 0], f_worst)
+
+            # No better point; shrink towards the best vertex
+            shrink = ~accept
+            if np.any(shrink):
+                shrunk = simplex[:, :, :1] + 0.5*(simplex - simplex[:, :, :1])
+                simplex = np.where(shrink[:, :, None, None], shrunk, simplex)
+                f       = np.where(shrink[:, :, None], SoftplusFit.__simplex_errors(xs, ys, mask, simplex), f)
+
+        params = simplex.reshape(n_groups, -1, 3)
+        errs   = f.reshape(n_groups, -1)
+        best   = np.argmin(errs, axis=1)
+
+        for g, i in enumerate(fit_idxs):
+            log_r, t_min, y_min = params[g, best[g]]
+            x, y = groups[i]
+
+            results[i] = {
+                'r'         : np.exp(log_r),
+                't_min'     : t_min,
+                'y'         : y_min,
+                'residuals' : np.asarray(y) - SoftplusFit.model(np.asarray(x), np.exp(log_r), t_min, y_min),
+            }
+            results[i]['err'] = np.sum(np.abs(results[i]['residuals']))
+
+        return results
+
+
+    @staticmethod
+    def fit_dev_data(data, n_grid=12, n_refine=4, n_iters=100):
+        """
+        Fits deviation against velocity (osu!px/s) for each angle of `data` (`DataDev`
+        layout), all in one batch. Returns { angle : `fit` result }.
+        """
+        angles = np.unique(data[:, DataDev.COL_ANGLE])
+        groups = []
+
+        for angle in angles:
+            data_angle = data[data[:, DataDev.COL_ANGLE] == angle]
+            data_angle = data_angle[~np.isnan(data_angle[:, DataDev.COL_DEV])]
+
+            vels = data_angle[:, DataDev.COL_PX]*data_angle[:, DataDev.COL_BPM]/60
+            groups.append((vels, data_angle[:, DataDev.COL_DEV]))
+
+        results = SoftplusFit.fit_groups(groups, n_grid, n_refine, n_iters)
+        return { angle : result for angle, result in zip(angles, results) if result is not None }
+
+
+    @staticmethod
+    def __grids(xs, y_low, y_high, mask, n_grid):
+        # Per group (n_groups, 3, n_grid) grid of log r, t_min and y spanning its data
+        x_min = np.min(np.where(mask, xs, np.inf), axis=1)
+        x_max = np.max(np.where(mask, xs, -np.inf), axis=1)
+
+        # Slopes from 1/100 to 100 times the overall slope of the data
+        x_span = np.maximum(x_max - x_min, 1e-9)
+        y_span = np.maximum(y_high - y_low, 1e-9)
+        slope  = np.log(y_span/x_span)
+
+        steps = np.linspace(0, 1, n_grid)[None, :]
+
+        return np.stack([
+            (slope - np.log(100))[:, None] + steps*2*np.log(100),
+            x_min[:, None] + steps*(x_max - x_min)[:, None],
+            y_low[:, None] + steps*(y_high - y_low)[:, None],
+        ], axis=1)
+
+
+    @staticmethod
+    def __simplex_errors(xs, ys, mask, points):
+        # `__errors` of (n_groups, n_candidates, n_points, 3) points
+        return SoftplusFit.__errors(xs, ys, mask, points.reshape(points.shape[0], -1, 3)).reshape(points.shape[:3])
+
+
+    @staticmethod
+    def __errors(xs, ys, mask, params):
+        # Sum of absolute residuals of each (n_groups, n_params, 3) parameter set
+        n_groups, n_params, _ = params.shape
+        errs = np.empty((n_groups, n_params), dtype=xs.dtype)
+
+        chunk = max(1, SoftplusFit.CHUNK_SIZE//(n_groups*xs.shape[1]))
+
+        for start in range(0, n_params, chunk):
+            p = params[:, start:start + chunk, :, None]
+            model = np.logaddexp(np.exp(p[:, :, 0])*(xs[:, None, :] - p[:, :, 1]), p[:, :, 2])
+            errs[:, start:start + chunk] = np.sum(np.abs(ys[:, None, :] - model)*mask[:, None, :], axis=2)
+
+        return errs
@@ -93,4 +93,55 @@ class Utils():
         m = (p1y - p2y)/(p1x - p2x)
         b = p1y - m*p1x
 
-        return m, b
\ No newline at end of file
+        return m, b
+
+
+    @staticmethod
+    def linear_regresion_batch(x, y):
+        """
+        `linear_regresion` of every row of `x` and `y` (n_fits, n_points) at once.
+        Returns arrays of m and b, which are nan for rows `linear_regresion` would
+        return None for.
+        """
+        n_fits, n_points = y.shape
+        if n_points < 2:
+            return np.full(n_fits, np.nan), np.full(n_fits, np.nan)
+
+        def group_mean(values, select):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return np.sum(values*select, axis=1)/np.sum(select, axis=1)
+
+        # Split data in half on x-axis and figure out if the data is increasing or decreasing
+        left_half = x < np.median(x, axis=1, keepdims=True)
+        right_half = ~left_half
+
+        y_left_avg = group_mean(y, left_half)
+        y_right_avg = group_mean(y, right_half)
+
+        avg_x = np.mean(x, axis=1, keepdims=True)
+        avg_y = np.mean(y, axis=1, keepdims=True)
+
+        x_low = x < avg_x
+        y_low = y < avg_y
+
+        # Positive slope: low-low and high-high groups, negative slope: low-high and high-low
+        positive = (y_left_avg < y_right_avg)[:, None]
+        g1 = x_low & (y_low == positive)
+        g2 = ~x_low & (y_low != positive)
+
+        # Center of gravity of each group
+        p1x = group_mean(x, g1)
+        p1y = group_mean(y, g1)
+
+        p2x = group_mean(x, g2)
+        p2y = group_mean(y, g2)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            m = (p1y - p2y)/(p1x - p2x)
+            b = p1y - m*p1x
+
+        valid = np.any(left_half, axis=1) & np.any(right_half, axis=1) & np.any(g1, axis=1) & np.any(g2, axis=1)
+        m[~valid] = np.nan
+        b[~valid] = np.nan
+
+        return m, b
@@ -0,0 +1,80 @@
+import os
+import sys
+import json
+import time
+import platform
+import statistics
+
+import numpy as np
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def measure(func, repeats=5, min_time=0.0):
+    """
+    Times `func()` and returns wall time statistics in seconds.
+
+    The function is called at least `repeats` times, and keeps being called until
+    `min_time` seconds have been spent in total so very fast cases still get a
+    stable median. The first call is a warm-up and is not recorded.
+    """
+    func()
+
+    samples = []
+    t_total = 0
+
+    while len(samples) < repeats or t_total < min_time:
+        t_start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - t_start
+
+        samples.append(elapsed)
+        t_total += elapsed
+
+    return {
+        'median'  : statistics.median(samples),
+        'min'     : min(samples),
+        'max'     : max(samples),
+        'repeats' : len(samples),
+    }
+
+
+def new_results(suite):
+    return {
+        'suite'     : suite,
+        'timestamp' : time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python'    : platform.python_version(),
+        'numpy'     : np.__version__,
+        'machine'   : platform.machine(),
+        'cpu_count' : os.cpu_count(),
+        'results'   : {},
+    }
+
+
+def add_result(results, case_id, params, wall_s, throughput=None):
+    """
+    Records one benchmark case.
+
+    `throughput` maps a unit name to the amount of work done per call; it's
+    converted to work per wall second using the median time.
+    """
+    entry = { 'params' : params, 'wall_s' : wall_s, 'throughput' : {} }
+
+    for unit, work in (throughput or {}).items():
+        entry['throughput'][unit] = work/wall_s['median'] if wall_s['median'] > 0 else float('inf')
+
+    results['results'][case_id] = entry
+    return case_id
+
+
+def save_results(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=4)
+
+
+def load_results(path):
+    with open(path, 'r') as f:
+        return json.load(f)
@@ -0,0 +1,120 @@
+"""
+Measures time-to-first-window of the App.
+
+Each sample launches a fresh interpreter, so module import time is included.
+The clock stops once the event loop has processed the first round of events
+after `App()` returns, i.e. the window has been shown and painted. With
+--with-sim the time until the first simulation result is shown is reported
+separately as first_result.
+
+usage:
+    python benchmarks/bench_startup.py [--repeats N] [--with-sim] [--json PATH]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import statistics
+
+
+# Prefix of the child's result line; anything else the app prints is ignored
+RESULT_PREFIX = 'bench_startup: '
+
+
+def child(with_sim):
+    t_start = time.perf_counter()
+
+    from pyqtgraph.Qt import QtCore
+    from pyqtgraph.Qt import QtWidgets
+
+    qt_app = QtWidgets.QApplication(sys.argv)
+    t_qt = time.perf_counter()
+
+    from app import App
+    t_import = time.perf_counter()
+
+    window = App(startup_simulation=with_sim)
+    t_init = time.perf_counter()
+
+    sample = {
+        'qt_init'    : t_qt - t_start,
+        'app_import' : t_import - t_qt,
+        'app_init'   : t_init - t_import,
+    }
+
+    def done():
+        # Wait for the first result too if the startup simulation runs
+        if 'first_window' not in sample or (with_sim and 'first_result' not in sample):
+            return
+
+        print(RESULT_PREFIX + json.dumps(sample), flush=True)
+
+        window.close()
+        qt_app.quit()
+
+    def first_frame():
+        sample['first_window'] = time.perf_counter() - t_start
+        done()
+
+    def first_result(angle):
+        if 'first_result' not in sample:
+            sample['first_result'] = time.perf_counter() - t_start
+            done()
+
+    window.angle_shown.connect(first_result)
+
+    QtCore.QTimer.singleShot(0, first_frame)
+    qt_app.exec_()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='App time-to-first-window benchmark')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--with-sim', action='store_true', help='Also run the startup simulation')
+    parser.add_argument('--json', default=None, help='Write results to this file')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.with_sim)
+        return
+
+    # Not imported at module level so the child's clock also covers importing numpy
+    from _bench import ROOT, new_results, save_results
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    if 'DISPLAY' not in env and 'WAYLAND_DISPLAY' not in env:
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    cmd = [ sys.executable, os.path.abspath(__file__), '--child' ]
+    if args.with_sim:
+        cmd.append('--with-sim')
+
+    samples = []
+
+    for _ in range(args.repeats):
+        t_process = time.perf_counter()
+        out = subprocess.run(cmd, env=env, cwd=ROOT, capture_output=True, text=True, check=True)
+        line   = [ line for line in out.stdout.splitlines() if line.startswith(RESULT_PREFIX) ][-1]
+        sample = json.loads(line[len(RESULT_PREFIX):])
+        sample['process'] = time.perf_counter() - t_process
+        samples.append(sample)
+
+    results = new_results('startup')
+
+    for key in samples[0]:
+        vals = [ sample[key] for sample in samples ]
+        stat = { 'median' : statistics.median(vals), 'min' : min(vals), 'max' : max(vals), 'repeats' : len(vals) }
+        results['results'][f'startup/{key}'] = { 'params' : { 'with_sim' : args.with_sim }, 'wall_s' : stat, 'throughput' : {} }
+
+        print(f'{key:>14}: median={stat["median"]*1000:8.1f} ms  min={stat["min"]*1000:8.1f} ms  max={stat["max"]*1000:8.1f} ms')
+
+    if args.json is not None:
+        save_results(results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""
+Benchmarks for the simulation and analysis hot paths. Runs without Qt.
+
+Covers:
+    PlayerSimulator.run_simulation   across map lengths, read times and record modes
+    OsuUtils.generate_pattern        across pattern lengths and batch sizes
+    DataProc.process_data            across map lengths and batch sizes
+    Utils.linear_regresion           across point counts and batch sizes
+    PopulationSimulator              across map lengths and player batch sizes
+    ReplayArchiveWriter              across map lengths and batch sizes
+    HitJudge.score                   across map lengths and batch sizes
+    Bootstrap.slope_cis              across point counts and resample counts
+    SoftplusFit.fit_groups           across point counts and group counts
+    CursorQuery.at_batch             across map lengths and batch sizes
+
+usage:
+    python benchmarks/bench_suite.py [--quick] [--filter SUBSTR] [--json PATH]
+
+Compare two result files with `benchmarks/compare.py`.
+"""
+import math
+import argparse
+import itertools
+import contextlib
+import io
+import os
+import tempfile
+
+import numpy as np
+
+from _bench import measure, new_results, add_result, save_results
+
+from app._player_simulator import PlayerSimulator
+from app._population_simulator import PopulationSimulator
+from app._data_cor import DataOsu
+from app._data_proc import DataProc
+from app._hit_judge import HitJudge
+from app._cursor_query import CursorQuery
+from app.misc._osu_utils import OsuUtils
+from app.misc._utils import Utils
+from app.misc._bootstrap import Bootstrap
+from app.misc._softplus_fit import SoftplusFit
+from app.misc._replay_archive import ReplayArchiveWriter
+
+
+FULL = {
+    'map_lengths'  : [ 15, 200, 1000 ],
+    'read_times'   : [ 1, 50, 140 ],
+    'batch_sizes'  : [ 1, 100 ],
+    'reg_points'   : [ 50, 500, 5000 ],
+    'players'      : [ 100, 1000 ],
+}
+
+QUICK = {
+    'map_lengths'  : [ 15, 200 ],
+    'read_times'   : [ 1, 140 ],
+    'batch_sizes'  : [ 1, 10 ],
+    'reg_points'   : [ 50, 500 ],
+    'players'      : [ 100 ],
+}
+
+# Keep timing fast cases until at least this many seconds were spent on them
+MIN_TIME = 0.05
+
+MODES = {
+    'hits'     : PlayerSimulator.RECORD_HITS,
+    'replay'   : PlayerSimulator.RECORD_REPLAY,
+    'adaptive' : PlayerSimulator.RECORD_ADAPTIVE,
+}
+
+
+def new_simulator(avg_read_time):
+    # PlayerSimulator prints its parameters on construction
+    with contextlib.redirect_stdout(io.StringIO()):
+        return PlayerSimulator({
+            'cs'             : 4,
+            'hit_dev'        : 10,
+            'avg_read_time'  : avg_read_time,
+            'dev_read_time'  : 0 if avg_read_time <= 1 else 10,
+            'player_vel_dev' : 0,
+        })
+
+
+def new_pattern(n_points, angle=30):
+    return OsuUtils.generate_pattern(
+        initial_angle = 0,
+        distance      = 100,
+        time          = 60/200,
+        angle         = angle*math.pi/180,
+        n_points      = n_points,
+        n_repeats     = 1
+    )
+
+
+def bench_run_simulation(results, grid, repeats):
+    for n_notes, read_time, mode_name in itertools.product(grid['map_lengths'], grid['read_times'], MODES):
+        np.random.seed(0)
+        simulator = new_simulator(read_time)
+        map_data  = new_pattern(n_notes)
+
+        # Simulated span of the map, in ms
+        sim_ms = 1000*(map_data[-1, DataOsu.IDX_T] - map_data[0, DataOsu.IDX_T])
+
+        wall_s = measure(lambda: simulator.run_simulation(map_data, mode=MODES[mode_name]), repeats, MIN_TIME)
+        yield add_result(results, f'run_simulation/notes={n_notes}/read={read_time}/mode={mode_name}',
+            { 'notes' : n_notes, 'avg_read_time' : read_time, 'mode' : mode_name },
+            wall_s, { 'sim_ms_per_s' : sim_ms, 'notes_per_s' : n_notes }
+        )
+
+
+def bench_generate_pattern(results, grid, repeats):
+    for n_points, batch in itertools.product(grid['map_lengths'], grid['batch_sizes']):
+        angles = np.linspace(0, 180, batch)
+
+        def run():
+            for angle in angles:
+                new_pattern(n_points, angle)
+
+        wall_s = measure(run, repeats, MIN_TIME)
+        yield add_result(results, f'generate_pattern/points={n_points}/batch={batch}',
+            { 'points' : n_points, 'batch' : batch },
+            wall_s, { 'patterns_per_s' : batch }
+        )
+
+
+def bench_process_data(results, grid, repeats):
+    for n_notes, batch in itertools.product(grid['map_lengths'], grid['batch_sizes']):
+        np.random.seed(0)
+        simulator = new_simulator(1)
+        map_data  = new_pattern(n_notes)
+        replays   = [ simulator.run_simulation(map_data) for _ in range(min(batch, 10)) ]
+
+        def run():
+            for i in range(batch):
+                DataProc.process_data(map_data, replays[i % len(replays)])
+
+        wall_s = measure(run, repeats, MIN_TIME)
+        yield add_result(results, f'process_data/notes={n_notes}/batch={batch}',
+            { 'notes' : n_notes, 'batch' : batch },
+            wall_s, { 'replays_per_s' : batch, 'notes_per_s' : batch*n_notes }
+        )
+
+
+def bench_linear_regresion(results, grid, repeats):
+    rng = np.random.default_rng(0)
+
+    for n_points, batch in itertools.product(grid['reg_points'], grid['batch_sizes']):
+        xs = rng.uniform(0, 2000, (batch, n_points))
+        ys = 0.01*xs + rng.normal(0, 2, (batch, n_points))
+
+        def run():
+            for i in range(batch):
+                Utils.linear_regresion(xs[i], ys[i])
+
+        wall_s = measure(run, repeats, MIN_TIME)
+        yield add_result(results, f'linear_regresion/points={n_points}/batch={batch}',
+            { 'points' : n_points, 'batch' : batch },
+            wall_s, { 'fits_per_s' : batch }
+        )
+
+
+def bench_population(results, grid, repeats):
+    simulator = PopulationSimulator(4)
+    distributions = {
+        'hit_dev'        : ('normal', 15, 3),
+        'avg_read_time'  : ('uniform', 20, 150),
+        'dev_read_time'  : 10,
+        'player_vel_dev' : 0,
+    }
+
+    for n_notes, n_players in itertools.product(grid['map_lengths'], grid['players']):
+        map_data = new_pattern(n_notes)
+
+        wall_s = measure(lambda: simulator.run_population(map_data, distributions, n_players, seed=0), repeats)
+        yield add_result(results, f'population/notes={n_notes}/players={n_players}',
+            { 'notes' : n_notes, 'players' : n_players },
+            wall_s, { 'players_per_s' : n_players, 'notes_per_s' : n_players*n_notes }
+        )
+
+
+def bench_replay_archive(results, grid, repeats):
+    for n_notes, batch in itertools.product(grid['map_lengths'], grid['batch_sizes']):
+        np.random.seed(0)
+        simulator = new_simulator(50)
+        map_data  = new_pattern(n_notes)
+        replays   = [ simulator.run_simulation(map_data, mode=PlayerSimulator.RECORD_REPLAY) for _ in range(min(batch, 10)) ]
+        replays   = [ replays[i % len(replays)] for i in range(batch) ]
+        n_frames  = sum(replay.shape[0] for replay in replays)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            def run():
+                with ReplayArchiveWriter(os.path.join(tmp_dir, 'replays.bin')) as writer:
+                    writer.write_batch(replays)
+
+            wall_s = measure(run, repeats, MIN_TIME)
+
+        yield add_result(results, f'replay_archive/notes={n_notes}/batch={batch}',
+            { 'notes' : n_notes, 'batch' : batch },
+            wall_s, { 'replays_per_s' : batch, 'frames_per_s' : n_frames }
+        )
+
+
+def bench_hit_judge(results, grid, repeats):
+    simulator = PopulationSimulator(4)
+
+    for n_notes, batch in itertools.product(grid['map_lengths'], grid['batch_sizes']):
+        map_data = new_pattern(n_notes)
+        players  = np.tile([ 10, 50, 10, 0 ], (batch, 1)).astype(float)
+        hit_data = simulator.run_simulation(map_data, players, seeds=np.arange(batch))
+
+        wall_s = measure(lambda: HitJudge.score(map_data, hit_data, 4, 8), repeats, MIN_TIME)
+        yield add_result(results, f'hit_judge/notes={n_notes}/batch={batch}',
+            { 'notes' : n_notes, 'batch' : batch },
+            wall_s, { 'replays_per_s' : batch, 'notes_per_s' : batch*n_notes }
+        )
+
+
+def bench_bootstrap(results, grid, repeats):
+    rng = np.random.default_rng(0)
+
+    for n_points, n_resamples in itertools.product(grid['reg_points'], [ 1000 ]):
+        xs = rng.uniform(0, 2000, n_points)
+        ys = 0.01*xs + rng.normal(0, 2, n_points)
+
+        wall_s = measure(lambda: Bootstrap.slope_ci(xs, ys, n_resamples, seed=0), repeats)
+        yield add_result(results, f'bootstrap/points={n_points}/resamples={n_resamples}',
+            { 'points' : n_points, 'resamples' : n_resamples },
+            wall_s, { 'fits_per_s' : n_resamples }
+        )
+
+
+def bench_softplus_fit(results, grid, repeats):
+    rng = np.random.default_rng(0)
+
+    for n_points, n_groups in itertools.product(grid['reg_points'], [ 1, 5 ]):
+        groups = []
+        for _ in range(n_groups):
+            xs = rng.uniform(0, 4000, n_points)
+            ys = SoftplusFit.model(xs, 0.01, 1500, 2) + rng.normal(0, 0.5, n_points)
+            groups.append((xs, ys))
+
+        wall_s = measure(lambda: SoftplusFit.fit_groups(groups), repeats)
+        yield add_result(results, f'softplus_fit/points={n_points}/groups={n_groups}',
+            { 'points' : n_points, 'groups' : n_groups },
+            wall_s, { 'fits_per_s' : n_groups }
+        )
+
+
+def bench_cursor_query(results, grid, repeats):
+    for n_notes, batch in itertools.product(grid['map_lengths'], grid['batch_sizes']):
+        np.random.seed(0)
+        simulator = new_simulator(50)
+        map_data  = new_pattern(n_notes)
+        replays   = [ simulator.run_simulation(map_data, mode=PlayerSimulator.RECORD_REPLAY) for _ in range(min(batch, 10)) ]
+        replays   = [ replays[i % len(replays)] for i in range(batch) ]
+
+        # Cursor at every note plus 10 probes in between each pair of notes
+        times = np.linspace(map_data[0, DataOsu.IDX_T], map_data[-1, DataOsu.IDX_T], 11*n_notes)
+
+        wall_s = measure(lambda: CursorQuery.at_batch(replays, times), repeats, MIN_TIME)
+        yield add_result(results, f'cursor_query/notes={n_notes}/batch={batch}',
+            { 'notes' : n_notes, 'batch' : batch },
+            wall_s, { 'replays_per_s' : batch, 'queries_per_s' : batch*times.shape[0] }
+        )
+
+
+BENCHMARKS = {
+    'run_simulation'   : bench_run_simulation,
+    'generate_pattern' : bench_generate_pattern,
+    'process_data'     : bench_process_data,
+    'linear_regresion' : bench_linear_regresion,
+    'population'       : bench_population,
+    'replay_archive'   : bench_replay_archive,
+    'hit_judge'        : bench_hit_judge,
+    'bootstrap'        : bench_bootstrap,
+    'softplus_fit'     : bench_softplus_fit,
+    'cursor_query'     : bench_cursor_query,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulation and analysis benchmarks')
+    parser.add_argument('--quick', action='store_true', help='Smaller parameter grid')
+    parser.add_argument('--filter', default='', help='Only run benchmarks whose name contains this')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--json', default=None, help='Write results to this file')
+    args = parser.parse_args()
+
+    grid    = QUICK if args.quick else FULL
+    results = new_results('hot_paths')
+
+    for name, bench in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+
+        for case_id in bench(results, grid, args.repeats):
+            entry = results['results'][case_id]
+            rates = '  '.join(f'{unit}={rate:,.1f}' for unit, rate in entry['throughput'].items())
+            print(f'{case_id:<55} {entry["wall_s"]["median"]*1000:10.3f} ms  {rates}')
+
+    if args.json is not None:
+        save_results(results, args.json)
+
+
+if __name__ == '__main__':
+    main()
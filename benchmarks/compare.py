@@ -0,0 +1,73 @@
+"""
+Compares two benchmark result files and flags regressions.
+
+A case regresses when its median (or min, with `--stat min`) wall time grew by
+more than the threshold (default 10%). Exits with status 1 if any case regressed so it can gate CI.
+
+usage:
+    python benchmarks/compare.py BASELINE.json CANDIDATE.json [--threshold 0.1] [--stat median|min]
+"""
+import sys
+import argparse
+
+from _bench import load_results
+
+
+def compare(baseline, candidate, threshold, stat='median'):
+    rows = []
+
+    for case_id, new in candidate['results'].items():
+        old = baseline['results'].get(case_id)
+        if old is None:
+            rows.append((case_id, None, new['wall_s'][stat], None, 'new'))
+            continue
+
+        t_old = old['wall_s'][stat]
+        t_new = new['wall_s'][stat]
+        ratio = t_new/t_old if t_old > 0 else float('inf')
+
+        if ratio > 1 + threshold:
+            status = 'REGRESSION'
+        elif ratio < 1/(1 + threshold):
+            status = 'faster'
+        else:
+            status = 'ok'
+
+        rows.append((case_id, t_old, t_new, ratio, status))
+
+    for case_id in baseline['results']:
+        if case_id not in candidate['results']:
+            rows.append((case_id, baseline['results'][case_id]['wall_s'][stat], None, None, 'missing'))
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare benchmark results')
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Allowed relative slowdown (0.1 = 10%%)')
+    parser.add_argument('--stat', choices=[ 'median', 'min' ], default='median', help='Wall time statistic to compare')
+    args = parser.parse_args()
+
+    baseline  = load_results(args.baseline)
+    candidate = load_results(args.candidate)
+
+    if baseline['suite'] != candidate['suite']:
+        print(f'warning: comparing different suites ({baseline["suite"]} vs {candidate["suite"]})')
+
+    rows = compare(baseline, candidate, args.threshold, args.stat)
+
+    fmt_ms = lambda t: '-' if t is None else f'{t*1000:.3f}'
+    for case_id, t_old, t_new, ratio, status in rows:
+        ratio = '-' if ratio is None else f'{ratio:.2f}x'
+        print(f'{case_id:<55} {fmt_ms(t_old):>12} -> {fmt_ms(t_new):>12} ms  {ratio:>7}  {status}')
+
+    n_regressed = sum(1 for row in rows if row[4] == 'REGRESSION')
+    print(f'\n{n_regressed} regression(s) out of {len(rows)} case(s)')
+
+    sys.exit(1 if n_regressed > 0 else 0)
+
+
+if __name__ == '__main__':
+    main()
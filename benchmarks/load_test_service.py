@@ -0,0 +1,136 @@
+"""
+Load test for the simulation service.
+
+Starts a `SimService` on a Unix socket (or TCP with --tcp) and runs concurrent
+clients against it, each sending requests back to back. Requests are drawn from a
+pool of `--distinct` different ones spread over `--patterns` patterns. A smaller
+request pool means more cache hits and coalescing; fewer patterns mean larger
+simulation batches. Reports latency percentiles and throughput.
+
+usage:
+    python benchmarks/load_test_service.py [--clients N] [--requests N] [--distinct N] [--patterns N] [--workers N] [--json PATH]
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+
+import numpy as np
+
+
+def make_requests(n_distinct, n_patterns, cs, seed):
+    rng = np.random.default_rng(seed)
+    requests = []
+
+    patterns = [
+        (float(rng.choice(np.arange(120, 300, 20))), float(rng.choice(np.arange(50, 300, 50))), float(rng.choice([ 0, 30, 90, 180 ])))
+        for _ in range(n_patterns)
+    ]
+
+    for i in range(n_distinct):
+        bpm, px, angle = patterns[rng.integers(n_patterns)]
+        requests.append({
+            'cs'       : cs,
+            'bpm'      : bpm,
+            'px'       : px,
+            'angle'    : angle,
+            'n_points' : 15,
+            'seed'     : i,
+            'player'   : {
+                'hit_dev'        : float(rng.uniform(5, 30)),
+                'avg_read_time'  : float(rng.uniform(20, 200)),
+                'dev_read_time'  : float(rng.uniform(0, 20)),
+                'player_vel_dev' : float(rng.uniform(0, 5)),
+            },
+        })
+
+    return requests
+
+
+async def run_client(address, requests, order, latencies):
+    from app._sim_service import SimClient
+
+    client = await SimClient.connect(address)
+
+    for i in order:
+        t_start = time.perf_counter()
+        await client.simulate(**requests[i])
+        latencies.append(time.perf_counter() - t_start)
+
+    await client.close()
+
+
+async def run(args):
+    from app._sim_service import SimService
+
+    service = SimService(n_workers=args.workers, batch_window=args.batch_window/1000)
+
+    if args.tcp:
+        address = ('127.0.0.1', args.port)
+    else:
+        address = os.path.join(tempfile.mkdtemp(), 'osu_sim.sock')
+
+    await service.start(address)
+
+    requests = make_requests(args.distinct, args.patterns, args.cs, args.seed)
+    rng      = np.random.default_rng(args.seed)
+    orders   = [ rng.integers(0, len(requests), args.requests) for _ in range(args.clients) ]
+
+    # Warm up the worker processes so imports don't count against the first requests
+    await asyncio.gather(*[ service.simulate(dict(request, seed=args.distinct + i)) for i, request in enumerate(requests[:args.workers]) ])
+    warm_stats = service.stats()
+
+    latencies = []
+    t_start = time.perf_counter()
+    await asyncio.gather(*[ run_client(address, requests, order, latencies) for order in orders ])
+    wall = time.perf_counter() - t_start
+
+    stats = { key : value - warm_stats[key] for key, value in service.stats().items() }
+    service.close()
+
+    return latencies, wall, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulation service load test')
+    parser.add_argument('--clients', type=int, default=32, help='Concurrent client connections')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per client')
+    parser.add_argument('--distinct', type=int, default=2000, help='Number of different requests')
+    parser.add_argument('--patterns', type=int, default=8, help='Number of different patterns among the requests')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-window', type=float, default=5, help='Coalescing window (ms)')
+    parser.add_argument('--cs', type=float, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tcp', action='store_true', help='Use localhost TCP instead of a Unix socket')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--json', default=None, help='Write results to this file')
+    args = parser.parse_args()
+
+    from _bench import new_results, add_result, save_results
+
+    latencies, wall, stats = asyncio.run(run(args))
+    latencies = np.array(latencies)*1000
+
+    n_requests = latencies.shape[0]
+    p50, p99 = np.percentile(latencies, [ 50, 99 ])
+
+    print(f'requests     {n_requests}  ({args.clients} clients, {args.distinct} distinct, {args.patterns} patterns, {args.workers} workers)')
+    print(f'latency      p50 {p50:.2f} ms   p99 {p99:.2f} ms   max {latencies.max():.2f} ms')
+    print(f'throughput   {n_requests/wall:,.1f} req/s')
+    print(f'service      {stats["cache_hits"]} cache hits, {stats["coalesced"]} coalesced, {stats["simulated"]} simulated in {stats["batches"]} batches')
+
+    if args.json is not None:
+        results = new_results('service')
+        params  = { key : value for key, value in vars(args).items() if key != 'json' }
+        wall_s  = { 'median' : wall, 'min' : wall, 'max' : wall, 'repeats' : 1 }
+
+        case_id = add_result(results, 'service/load_test', params, wall_s, { 'requests' : n_requests })
+        results['results'][case_id]['latency_ms'] = { 'p50' : p50, 'p99' : p99, 'max' : float(latencies.max()) }
+        results['results'][case_id]['service'] = stats
+
+        save_results(results, args.json)
+
+
+if __name__ == '__main__':
+    main()